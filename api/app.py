@@ -13,18 +13,41 @@ if sys.stdout and hasattr(sys.stdout, 'buffer'):
 if sys.stderr and hasattr(sys.stderr, 'buffer'):
     sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
 
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, stream_with_context
 from flask_cors import CORS
 import os
 import abc
-import random
 import time
+import threading
+import multiprocessing
 import requests
-import csv
+import tempfile
 from datetime import datetime, timedelta
+import numpy as np
 from dotenv import load_dotenv
 import logging
 import yahoo_scraper  # Import the new scraper logic
+import payoff
+import pricing
+import expiry_calendar
+import upstream_http
+import vol_surface
+import strategy_search
+import monte_carlo
+import backtest
+import chain_format
+import scenario
+from portfolio import Portfolio, PortfolioStore
+from quote_fetcher import QuoteFetcher, is_valid_quote
+from quote_stream import FubonQuoteStream
+from chain_stream import ChainBroadcaster
+from refresh_scheduler import RefreshScheduler
+from singleflight import SingleFlight
+from response_cache import ResponseCache, etag_matches
+from provider_health import HealthRegistry
+from shared_cache import SharedSnapshotCache
+from taifex_parser import ChainIndex, parse_daily_report
+from taifex_archive import TaifexArchive
 
 load_dotenv()
 
@@ -37,6 +60,9 @@ CORS(app)  # 允許跨域請求
 
 # ============ 資料提供者基底類別 ============
 
+# 掛牌中的合約代稱 (週三週選 / 週五週選 / 月選)
+LISTED_CONTRACTS = ('current_week', 'next_week', 'current_fri', 'next_fri', 'current_month', 'next_month')
+
 class DataProvider(abc.ABC):
     """Abstract base class for data providers."""
 
@@ -50,30 +76,70 @@ class DataProvider(abc.ABC):
         """取得選擇權價格"""
         pass
 
+    @abc.abstractmethod
+    def get_option_chain(self, strikes: list, contract: str = None) -> dict:
+        """
+        批次取得多個履約價的選擇權價格
+        回傳格式: {strike: {"call": dict 或 None, "put": dict 或 None}}
+        """
+        pass
+
+    health = None       # 資料來源健康狀態 (HealthRegistry)，由 init_provider_health() 設定
+    blocking_io = False # 報價查詢是否會阻塞在上游 I/O (ASGI 模式據此決定是否交給執行緒池)
+
+    def snapshot_info(self) -> dict:
+        """資料快照資訊 (時間與資料年齡)，無快取的資料來源回傳 None"""
+        return None
+
+    def snapshot_version(self):
+        """報價快照的版本識別 (報價變動時改變)，用於衍生計算的快取；無法判斷時回傳 None"""
+        return None
+
+    def sync_shared(self):
+        """採用其他 worker 寫入的共用快照 (可能查詢 SQLite)；無共用快取的資料來源不動作"""
+
+    # 到期日曆 (所有資料來源共用，序列表與代號表在換倉時才重新計算)
+    calendar = expiry_calendar.default_calendar
+
     def get_contract_month_year(self) -> tuple:
         """
-        計算正確的合約月份和年份
-        如果今天在當月第三個週三之後，則使用下個月
+        近月合約的月份和年份
+        當月月選結算 (第三個週三 13:30，遇休市順延) 之後即為下個月
         """
-        now = datetime.now()
-        year = now.year
-        month = now.month
-        
-        # 計算當月第三個週三
-        first_day = now.replace(day=1)
-        first_day_weekday = first_day.weekday()
-        days_to_first_wed = (2 - first_day_weekday + 7) % 7
-        first_wed_date = 1 + days_to_first_wed
-        third_wed_date = first_wed_date + 14
-        
-        # 如果今天在第三個週三之後，移到下個月
-        if now.day > third_wed_date:
-            month += 1
-            if month > 12:
-                month = 1
-                year += 1
-                
-        return month, year
+        series = self.calendar.resolve('current_month')
+        return series.month, series.year
+
+    def contract_series(self, contract: str = None) -> expiry_calendar.Series:
+        """合約代稱對應的到期序列"""
+        return self.calendar.resolve(contract)
+
+    def resolve_contract(self, contract: str = None) -> tuple:
+        """
+        將合約代稱 (current_week / next_week / current_fri / next_fri / next_month / current_month)
+        轉換為 (root, month, year)
+        """
+        series = self.calendar.resolve(contract)
+        return series.root, series.month, series.year
+
+    def contract_expiry_code(self, contract: str = None) -> str:
+        """
+        合約代稱對應的期交所到期代碼
+        月選 YYYYMM、週三週選 (TX1/TX2/TX4/TX5) YYYYMMW{n}、週五週選 (TXU~TXZ) YYYYMMF{n}
+        """
+        return self.calendar.resolve(contract).code
+
+    def option_symbols(self, strikes, contract: str = None) -> dict:
+        """整條鏈的選擇權代號 {(strike, 'call'/'put'): symbol}，同一序列的代號只產生一次"""
+        return self.calendar.symbols(self.calendar.resolve(contract), strikes)
+
+    def listed_expiries(self) -> list:
+        """目前掛牌的到期代碼 (週三週選、週五週選、當月與次月月選，去除重複)"""
+        codes = []
+        for contract in LISTED_CONTRACTS:
+            code = self.contract_expiry_code(contract)
+            if code not in codes:
+                codes.append(code)
+        return codes
 
     def get_option_symbol(self, strike: int, option_type: str, target_month: int = None, target_year: int = None, root: str = "TXO") -> str:
         """產生選擇權代號"""
@@ -81,26 +147,249 @@ class DataProvider(abc.ABC):
             month, year = target_month, target_year
         else:
             month, year = self.get_contract_month_year()
-            
+
         year_digit = str(year)[-1]
-        
+
         # 買權 Call (A-L), 賣權 Put (M-X)
         if option_type.lower() in ['call', 'c', 'buy']:
-            codes = "ABCDEFGHIJKL"
+            codes = expiry_calendar.CALL_MONTH_CODES
         else:
-            codes = "MNOPQRSTUVWX"
-            
+            codes = expiry_calendar.PUT_MONTH_CODES
+
         month_code = codes[month - 1]
         return f"{root}{strike}{month_code}{year_digit}"
 
 
+class CachedDataProvider(DataProvider):
+    """
+    具快照快取的資料提供者 (stale-while-revalidate)
+    讀取一律回傳目前的快照；快照過期時交由背景排程更新，請求不會等待上游下載
+    """
+    scheduler = None    # 由 RefreshScheduler.register() 設定
+    name = None
+    last_access = None
+    _flight = SingleFlight()  # 所有快取型資料來源共用，以 provider 名稱與 key 區分
+    shared_cache = None       # 跨 worker 共用快照 (SharedSnapshotCache)
+    shared_fields = ('data',) # 寫入共用快取的欄位
+    shared_check_interval = 1.0
+
+    def __init__(self):
+        self._cache_lock = threading.Lock()
+        self._shared_version = 0
+        self._shared_checked = 0.0
+
+    @abc.abstractmethod
+    def _download(self) -> bool:
+        """實際向上游下載並更新快照，成功回傳 True"""
+        pass
+
+    def refresh(self, key: str = 'snapshot') -> bool:
+        """
+        更新快照
+        同一資料來源同一 key 同時只會有一個下載進行中，並行的呼叫者會等待並共用其結果
+        斷路器打開時直接略過，不向上游發出請求；結果記錄到健康狀態
+        """
+        name = self.name or type(self).__name__
+        status = self.health.get(name) if self.health else None
+        if status is not None and not status.allow():
+            return False
+
+        start = time.time()
+        try:
+            ok = self._flight.do((name, key), self._refresh_shared)
+        except upstream_http.UpstreamBackoff as e:
+            # 上游仍在本地退避期限內，沒有實際發出請求：不計入斷路器失敗
+            logger.info(f"⏳ {name}: {e}")
+            if status is not None:
+                status.record_skipped()
+            return False
+        except Exception as e:
+            if status is not None:
+                status.record_failure(str(e), time.time() - start, available=self.has_live_data())
+            raise
+        if status is not None:
+            if ok:
+                status.record_success(time.time() - start, available=self.has_live_data())
+            else:
+                status.record_failure("更新失敗", time.time() - start, available=self.has_live_data())
+        return ok
+
+    def has_data(self) -> bool:
+        data = self.cache.get('data')
+        return data is not None and len(data) > 0
+
+    def has_live_data(self) -> bool:
+        """快取中是否為上游的真實資料 (健康狀態只依此判斷可用，本地產生的模擬資料不算)"""
+        return self.has_data()
+
+    def is_available(self) -> bool:
+        """是否可用於路由：只讀取健康狀態 (O(1))，不會觸發下載"""
+        if self.health is None:
+            return self.has_live_data()
+        return self.health.is_available(self.name or type(self).__name__)
+
+    def request_refresh(self):
+        """要求背景更新 (不等待結果)；未註冊排程時不動作"""
+        if self.scheduler:
+            self.scheduler.trigger(self.name)
+
+    def _refresh_shared(self) -> bool:
+        """
+        跨 worker 更新：其他 worker 已寫入較新的快照時直接採用；
+        否則取得租約後才向上游下載，並把結果寫回共用快取
+        """
+        if not self.shared_cache:
+            return self._download()
+
+        name = self.name or type(self).__name__
+        try:
+            if self._adopt_shared(require_fresh=True):
+                return True
+            if not self.shared_cache.acquire(name):
+                # 其他 worker 正在下載，等待其結果 (新版本，或確認目前版本未變)
+                entry = self.shared_cache.wait_for_newer(name, self._shared_version, timeout=30,
+                                                         checked_after=self.fresh_time() or 0)
+                return bool(entry) and self._apply_shared(entry)
+        except Exception as e:
+            logger.warning(f"⚠️ 共用快取無法使用 ({name})，直接下載: {e}")
+            return self._download()
+
+        try:
+            before = self.snapshot_version()
+            ok = self._download()
+            if ok and self._shared_version and self.snapshot_version() == before:
+                # 上游內容未變 (304)：只延長共用快照的新鮮度，不重新編碼與發佈內容
+                self.shared_cache.touch(name, self._shared_version, self.fresh_time())
+            elif ok:
+                payload = self._encode_shared(dict(zip(self.shared_fields, self._snapshot(*self.shared_fields))))
+                self._shared_version = self.shared_cache.put(name, payload, self.snapshot_time())
+            return ok
+        except upstream_http.UpstreamBackoff:
+            raise
+        except Exception as e:
+            logger.warning(f"⚠️ 寫入共用快取失敗 ({name}): {e}")
+            return False
+        finally:
+            try:
+                self.shared_cache.release(name)
+            except Exception:
+                pass
+
+    def _adopt_shared(self, require_fresh: bool = False) -> bool:
+        """
+        若共用快取有較新的版本則載入
+        require_fresh 時只採用仍在有效期內的快照；手上的版本已被其他 worker 確認未變時只延長新鮮度
+        """
+        name = self.name or type(self).__name__
+        entry = self.shared_cache.get(name, newer_than=self._shared_version)
+        if not entry:
+            if not (require_fresh and self._shared_version):
+                return False
+            checked = self.shared_cache.checked_at(name, self._shared_version)
+            if checked is None or time.time() - checked >= self.cache['ttl'] or checked <= (self.fresh_time() or 0):
+                return False
+            return self._apply_shared((None, checked, self._shared_version))
+        checked = self.shared_cache.checked_at(name, entry[2])
+        if require_fresh and time.time() - max(entry[1], checked or 0) >= self.cache['ttl']:
+            return False
+        return self._apply_shared(entry, checked)
+
+    def _apply_shared(self, entry, checked_at: float = None) -> bool:
+        """載入共用快照；payload 為 None 表示目前版本已確認未變，只延長新鮮度"""
+        payload, updated_at, version = entry
+        if payload is None:
+            self._mark_fresh(datetime.fromtimestamp(updated_at))
+            return True
+        self._store(timestamp=datetime.fromtimestamp(updated_at), **self._decode_shared(payload))
+        if checked_at is not None and checked_at > updated_at:
+            self._mark_fresh(datetime.fromtimestamp(checked_at))
+        self._shared_version = version
+        return True
+
+    def _encode_shared(self, payload: dict) -> dict:
+        """寫入共用快取前轉為可 JSON 序列化的格式"""
+        return payload
+
+    def _decode_shared(self, payload: dict) -> dict:
+        return payload
+
+    def _store(self, timestamp: datetime = None, **fields):
+        """原子性地更新快取欄位與時間戳記"""
+        with self._cache_lock:
+            self.cache.update(fields)
+            self.cache['timestamp'] = timestamp or datetime.now()
+            self.cache['checked_at'] = None
+
+    def _mark_fresh(self, checked_at: datetime = None):
+        """上游確認內容未變 (304)：只延長新鮮度，快照內容與版本 (timestamp) 不變"""
+        with self._cache_lock:
+            self.cache['checked_at'] = checked_at or datetime.now()
+
+    def _snapshot(self, *fields) -> tuple:
+        """原子性地讀取多個快取欄位"""
+        with self._cache_lock:
+            return tuple(self.cache.get(f) for f in fields)
+
+    def snapshot_time(self):
+        """目前快照的時間 (epoch 秒)"""
+        ts = self.cache.get('timestamp')
+        return ts.timestamp() if ts else None
+
+    def fresh_time(self):
+        """快照最近一次被確認為最新的時間 (epoch 秒)：取得新快照或上游回應 304 的時間"""
+        ts = self.cache.get('checked_at') or self.cache.get('timestamp')
+        return ts.timestamp() if ts else None
+
+    def snapshot_version(self):
+        return self.snapshot_time()
+
+    def is_stale(self) -> bool:
+        fresh_time = self.fresh_time()
+        return fresh_time is None or time.time() - fresh_time >= self.cache['ttl']
+
+    def snapshot_info(self) -> dict:
+        snapshot_time = self.snapshot_time()
+        if snapshot_time is None:
+            return None
+        return {
+            "timestamp": self.cache['timestamp'].isoformat(),
+            "age": round(time.time() - snapshot_time, 1),
+            "stale": self.is_stale()
+        }
+
+    def sync_shared(self):
+        """定期檢查其他 worker 是否已寫入較新的快照 (只比對版本號，較新時採用)"""
+        now = time.time()
+        if not self.shared_cache or now - self._shared_checked < self.shared_check_interval:
+            return
+        self._shared_checked = now
+        try:
+            if self.shared_cache.version(self.name or type(self).__name__)[0] > self._shared_version:
+                self._adopt_shared()
+        except Exception as e:
+            logger.debug(f"共用快取版本檢查失敗: {e}")
+
+    def _touch(self):
+        """記錄讀取時間；快照過期或尚未建立時要求背景更新"""
+        self.last_access = time.time()
+        self.sync_shared()
+        if not self.cache.get('data') or self.is_stale():
+            if self.scheduler:
+                self.scheduler.trigger(self.name)
+            else:
+                # 未註冊排程 (例如獨立腳本) 時維持同步更新
+                self.refresh()
+
+
 # ============ Mock 資料提供者 ============
 
 class MockDataProvider(DataProvider):
     """模擬資料提供者（用於測試或降級）"""
     
-    def __init__(self, initial_tx_price: float = 23000.0):
+    def __init__(self, initial_tx_price: float = 23000.0, vol: float = 0.2, rate: float = 0.015):
         self.current_tx_price = initial_tx_price
+        self.vol = vol
+        self.rate = rate
         self.is_logged_in = True
         
     def set_tx_price(self, price: float):
@@ -115,68 +404,75 @@ class MockDataProvider(DataProvider):
         }
     
     def get_option_price(self, strike: int, option_type: str, contract: str = None) -> dict:
+        return self.get_option_chain([strike], contract)[strike][option_type.lower()]
+
+    def get_option_chain(self, strikes: list, contract: str = None) -> dict:
         """
-        模擬選擇權價格（基於 Time Value 的邏輯）
-        
-        公式：
-        - 內含價值 = max(0, 現價-履約價) for Call / max(0, 履約價-現價) for Put
-        - 時間價值 = max(0, 100 - distance * 0.2) + random(-2, 2)
-        - 總價 = 內含價值 + 時間價值
+        以 Black-Scholes 理論價模擬整條選擇權鏈 (所有履約價一次計算)
+        剩餘時間依合約實際到期日計算，同一參數下結果固定
         """
-        tx_price = self.current_tx_price
-        
-        if option_type.lower() == 'call':
-            intrinsic = max(0, tx_price - strike)
-        else:
-            intrinsic = max(0, strike - tx_price)
-        
-        distance = abs(tx_price - strike)
-        
-        # 時間價值公式 (根據 Time Value 邏輯調整)
-        # ATM 時間價值約 250-300 點
-        base_time_value = 280
-        decay_rate = 0.5  # 每 100 點距離減少 50 點時間價值
-        time_value = max(5, base_time_value - distance * decay_rate / 100)
-        
-        # 加入輕微隨機性
-        random.seed(strike + (1 if option_type.lower() == 'call' else 0))
-        time_value += random.uniform(-5, 5)
-        
-        price = intrinsic + time_value
-        price = round(max(1.0, price), 0)
-        
-        return {
-            "strike": strike,
-            "type": option_type.capitalize(),
-            "symbol": self.get_option_symbol(strike, option_type),
-            "price": price,
-            "bid": round(price * 0.97),
-            "ask": round(price * 1.03),
-            "source": "mock"
-        }
+        expiry = self.contract_expiry_code(contract)
+        symbols = self.option_symbols(strikes, contract)
+        quotes = pricing.price_chain(self.current_tx_price, strikes, [expiry], self.vol, self.rate)
+
+        chain = {strike: {} for strike in strikes}
+        for option_type in ('call', 'put'):
+            prices = np.maximum(np.round(quotes[option_type]['price'][0]), 1.0)
+            for strike, price in zip(strikes, prices.tolist()):
+                chain[strike][option_type] = {
+                    "strike": strike,
+                    "type": option_type.capitalize(),
+                    "symbol": symbols[(strike, option_type)],
+                    "price": price,
+                    "bid": round(price * 0.97),
+                    "ask": round(price * 1.03),
+                    "source": "mock"
+                }
+        return chain
 
 
 # ============ 期交所 TAIFEX 資料提供者 ============
 
-class TaifexDataProvider(DataProvider):
+class TaifexDataProvider(CachedDataProvider):
     """期交所 OpenAPI 資料提供者"""
+    shared_fields = ('data', 'source')
+    archive = None      # 歷史行情封存 (TaifexArchive)，由 init_taifex_archive() 設定
+
+    def _encode_shared(self, payload: dict) -> dict:
+        return dict(payload, data=payload['data'].to_dict() if payload.get('data') is not None else None)
+
+    def _decode_shared(self, payload: dict) -> dict:
+        return dict(payload, data=ChainIndex.from_dict(payload['data']) if payload.get('data') else None)
     
     def __init__(self):
+        super().__init__()
         self.cache = {
             'data': None,
+            'source': None,     # taifex / taifex_mock
             'timestamp': None,
             'ttl': 300  # 快取 5 分鐘
         }
         self.is_logged_in = True
-    
-    def _fetch_data(self):
-        """從期交所 OpenAPI 取得選擇權每日行情"""
-        # 檢查快取是否有效
-        if self.cache['data'] and self.cache['timestamp']:
-            elapsed = (datetime.now() - self.cache['timestamp']).total_seconds()
-            if elapsed < self.cache['ttl']:
-                return self.cache['data']
 
+    def has_live_data(self) -> bool:
+        # 下載失敗時填入的 taifex_mock 模擬資料不代表期交所可用
+        return self.has_data() and self.cache.get('source') == 'taifex'
+    
+    def _fetch_data(self) -> ChainIndex:
+        """回傳目前的期交所快照 ChainIndex（過期時由背景排程更新）"""
+        self._touch()
+        return self.cache['data']
+
+    def _fallback_to_mock(self) -> bool:
+        """下載失敗：保留上一份成功的快照；從未成功過才改用模擬資料"""
+        if self.cache['data'] and self.cache.get('source') == 'taifex':
+            logger.warning("⚠️ 期交所更新失敗，沿用上一份快照")
+            return False
+        self._store(data=self._generate_mock_data(), source='taifex_mock')
+        return False
+
+    def _download(self) -> bool:
+        """從期交所 OpenAPI 取得選擇權每日行情並更新快取"""
         url = "https://openapi.taifex.com.tw/v1/DailyMarketReportOpt"
         headers = {
             'Accept': 'application/json',
@@ -185,245 +481,54 @@ class TaifexDataProvider(DataProvider):
 
         logger.info("📡 正在從期交所取得選擇權資料...")
 
-        # 簡單重試機制以應對暫時性網路或伺服器錯誤
-        retries = 3
-        response = None
-        for attempt in range(1, retries + 1):
-            try:
-                response = requests.get(url, headers=headers, timeout=10)
-                logger.info(f"📶 Taifex fetch attempt {attempt}, status={getattr(response, 'status_code', 'no-response')}")
-                if response is not None and response.status_code == 200:
-                    break
-                else:
-                    snippet = response.text[:500] if response is not None else ''
-                    logger.warning(f"⚠️ Taifex returned status {getattr(response, 'status_code', 'N/A')}: {snippet}")
-            except requests.exceptions.RequestException as e:
-                logger.error(f"❌ Taifex request exception (attempt {attempt}): {e}")
-            time.sleep(1)
-
-        if response is None:
-            logger.error("❌ 無法向期交所發出請求 (response is None), 轉為模擬資料")
-            mock = self._generate_mock_data()
-            self.cache['data'] = mock
-            self.cache['timestamp'] = datetime.now()
-            return mock
+        # 共用連線池；失敗不在此重試 (上游用戶端記錄退避期限，由背景排程稍後重試)
+        # 手上仍是期交所真實快照時以 ETag / Last-Modified 條件式請求，內容未變只收到 304
+        client = upstream_http.get_client()
+        revalidate = self.cache.get('source') == 'taifex' and self.cache.get('data') is not None
+        try:
+            response = client.get(url, headers=headers, revalidate=revalidate)
+        except upstream_http.UpstreamBackoff:
+            # 從未成功過時仍先填入模擬資料，再交由 refresh() 記錄為略過 (不計入斷路器失敗)
+            self._fallback_to_mock()
+            raise
+        except requests.exceptions.RequestException as e:
+            logger.error(f"❌ 無法向期交所發出請求: {e}，轉為模擬資料")
+            return self._fallback_to_mock()
+
+        if response.status_code == 304:
+            # 行情未變：沿用目前的索引，只延長新鮮度 (快照版本不變，回應快取與其他 worker 不需重建)
+            self._mark_fresh()
+            logger.info("✅ 期交所資料未變更 (304)，沿用目前快照")
+            return True
 
         if response.status_code != 200:
             logger.error(f"❌ 期交所 API 回應錯誤: {response.status_code}, 轉為模擬資料")
-            mock = self._generate_mock_data()
-            self.cache['data'] = mock
-            self.cache['timestamp'] = datetime.now()
-            return mock
+            return self._fallback_to_mock()
 
-        text = response.text
+        # 解析 CSV / JSON，建立涵蓋所有到期序列 (月選/週選) 的索引
+        result = parse_daily_report(response.text)
+        if result is None:
+            return False
 
-        # 嘗試以 CSV 解析（期交所 DailyMarketReportOpt 可能回傳 CSV）
-        data = None
-        try:
-            sample_head = text.strip()[:200]
-            is_csv = False
-            # 偵測常見 CSV 標頭（中文或英文）
-            csv_indicators = ['履約價', '到期', 'Contract', 'StrikePrice', '履約價', '買賣權', 'CallPut']
-            for ind in csv_indicators:
-                if ind in sample_head:
-                    is_csv = True
-                    break
-
-            if is_csv:
-                f = io.StringIO(text)
-                reader = csv.DictReader(f)
-                rows = []
-                # 將 CSV 欄位（可能為中文）映射到預期欄位名稱
-
-                # 精準 Mapping（依據你提供的 CSV header）
-                header_map = {
-                    '契約': 'Contract',
-                    'Contract': 'Contract',
-                    '到期月份(週別)': 'ContractMonth',
-                    '到期月份': 'ContractMonth',
-                    '履約價': 'StrikePrice',
-                    'StrikePrice': 'StrikePrice',
-                    '買賣權': 'CallPut',
-                    'CallPut': 'CallPut',
-                    '最後成交價': 'Close',
-                    'Close': 'Close',
-                    '結算價': 'SettlementPrice',
-                    'SettlementPrice': 'SettlementPrice',
-                    '買價': 'BestBid',
-                    'BestBid': 'BestBid',
-                    '賣價': 'BestAsk',
-                    'BestAsk': 'BestAsk'
-                }
-
-                for r in reader:
-                    norm = {}
-                    for k, v in r.items():
-                        if v is None:
-                            continue
-                        key = k.strip()
-                        mapped = header_map.get(key, None)
-                        val = v.strip()
-                        if mapped:
-                            # 轉換特定欄位格式
-                            if mapped == 'StrikePrice':
-                                try:
-                                    norm[mapped] = float(val) if val not in ('', '-') else 0.0
-                                except Exception:
-                                    # 嘗試移除逗號再轉
-                                    try:
-                                        norm[mapped] = float(val.replace(',', ''))
-                                    except Exception:
-                                        norm[mapped] = 0.0
-                            elif mapped == 'Close' or mapped == 'SettlementPrice' or mapped in ('BestBid', 'BestAsk'):
-                                try:
-                                    norm[mapped] = float(val) if val not in ('', '-') else 0.0
-                                except Exception:
-                                    try:
-                                        norm[mapped] = float(val.replace(',', ''))
-                                    except Exception:
-                                        norm[mapped] = 0.0
-                            elif mapped == 'ContractMonth':
-                                norm[mapped] = val.replace(' ', '')
-                            elif mapped == 'CallPut':
-                                # Map Chinese values to Call/Put
-                                if val == '買權':
-                                    norm[mapped] = 'Call'
-                                elif val == '賣權':
-                                    norm[mapped] = 'Put'
-                                else:
-                                    # 可能已是英文 Call/Put
-                                    norm[mapped] = 'Call' if val.lower().startswith('c') else 'Put'
-                            else:
-                                norm[mapped] = val
-                        else:
-                            norm[key] = val
-                    rows.append(norm)
-
-                data = rows
-        except Exception as e:
-            logger.warning(f"⚠️ CSV 解析失敗，將嘗試 JSON 解析: {e}")
+        # 更新快取
+        self._store(data=result, source='taifex')
 
-        # 如果不是 CSV 或 CSV 解析失敗，嘗試 JSON
-        if data is None:
+        # 封存歷史行情 (只有取得更新租約、實際下載的 worker 會執行)
+        if self.archive is not None and len(result):
             try:
-                data = response.json()
+                self.archive.store(result)
             except Exception as e:
-                text_snippet = text[:2000]
-                logger.error(f"❌ 解析 Taifex JSON 失敗: {e} / response text snippet: {text_snippet}")
-                return None
-
-            # 如果回傳是一個物件（dict），嘗試取出內層 list
-            if isinstance(data, dict):
-                for candidate in ('data', 'Data', 'result', 'items'):
-                    if candidate in data and isinstance(data[candidate], list):
-                        data = data[candidate]
-                        break
-
-            if not isinstance(data, list):
-                logger.error(f"❌ Taifex 回傳格式非清單，keys={list(data.keys()) if isinstance(data, dict) else type(data)}")
-                return None
-
-        # 輔助函式：從多個可能的欄位名稱中取值
-        def get_field(item, candidates):
-            for k in candidates:
-                if k in item and item[k] not in (None, ''):
-                    return item[k]
-            # 嘗試不區分大小寫的鍵
-            lower_map = {kk.lower(): vv for kk, vv in item.items()}
-            for k in candidates:
-                if k.lower() in lower_map and lower_map[k.lower()] not in (None, ''):
-                    return lower_map[k.lower()]
-            return None
-
-        # 過濾出 TXO (臺指選擇權) 資料，容錯檢查 Contract 欄位
-        txo_data = []
-        for item in data:
-            contract = get_field(item, ['Contract', 'contract', 'ContractName'])
-            if contract and str(contract).upper().startswith('TXO'):
-                txo_data.append(item)
+                logger.warning(f"⚠️ 期交所行情封存失敗: {e}")
 
-        if not txo_data:
-            logger.warning(f"⚠️ 未找到 TXO 資料，原始回傳樣本 keys: {[list(d.keys()) for d in data[:3]]}")
-
-        # 轉換為字典格式方便查詢
-        result = {}
-        month, year = self.get_contract_month_year()
-        target_month = f"{year}{month:02d}"
-
-        for item in txo_data:
-            contract_month = get_field(item, ['ContractMonth(Week)', 'ContractMonth', 'ContractMonthWeek', 'Contract Month']) or ''
-            # 只取當月合約（比對前 6 碼 YYYYMM，且排除週選 'W'）
-            # 修正：避免週選與月選 Strike Key 衝突
-            s_month = str(contract_month).strip()
-            if not s_month.startswith(str(target_month)[:6]) or 'W' in s_month:
-                continue
-
-            strike_val = get_field(item, ['StrikePrice', 'Strike', 'StrikePrice '])
-            callput = get_field(item, ['CallPut', 'Call/Put', 'Type', 'BuySell'])
-
-            if not strike_val or not callput:
-                logger.debug(f"跳過不完整項目 keys={list(item.keys())}")
-                continue
-
-            try:
-                strike_int = int(float(strike_val))
-            except (ValueError, TypeError):
-                logger.debug(f"無法解析 strike: {strike_val} in item keys={list(item.keys())}")
-                continue
-
-            # 支援各種表示法
-            cp = str(callput).strip().lower()
-            is_call = cp in ('c', 'call', '買權', 'buy')
-            normalized_cp = 'C' if is_call else 'P'
-
-            key = f"{strike_int}_{normalized_cp}"
-
-            settlement = get_field(item, ['SettlementPrice', 'Settlement', 'Settle']) or '0'
-            close = get_field(item, ['Close', 'ClosingPrice']) or '0'
-            best_bid = get_field(item, ['BestBid', 'Bid']) or '0'
-            best_ask = get_field(item, ['BestAsk', 'Ask']) or '0'
-
-            try:
-                bid = float(best_bid) if best_bid and best_bid != '-' else 0
-                ask = float(best_ask) if best_ask and best_ask != '-' else 0
-                close_p = float(close) if close and close != '-' else 0
-                settle_p = float(settlement) if settlement and settlement != '-' else 0
-                
-                # 價格優先順序: 最新成交 > (買+賣)/2 > 買價 > 賣價 > 結算價
-                if close_p > 0:
-                    price = close_p
-                elif bid > 0 and ask > 0:
-                    price = (bid + ask) / 2
-                elif bid > 0:
-                    price = bid
-                elif ask > 0:
-                    price = ask
-                else:
-                    price = settle_p
-            except Exception:
-                price = 0
-
-            result[key] = {
-                'strike': strike_int,
-                'type': 'Call' if is_call else 'Put',
-                'price': price,
-                'bid': bid,
-                'ask': ask,
-                'source': 'taifex'
-            }
-
-        # 更新快取
-        self.cache['data'] = result
-        self.cache['timestamp'] = datetime.now()
-
-        logger.info(f"✅ 期交所資料取得成功，共 {len(result)} 筆")
-        return result
+        logger.info(f"✅ 期交所資料取得成功，共 {len(result)} 筆，到期序列: {result.expiries}")
+        return True
 
     def _generate_mock_data(self):
-        """當無法從期交所取得資料時，產生模擬選擇權資料。輸出格式與真實解析後的 result 相同。
+        """當無法從期交所取得資料時，以 Black-Scholes 產生所有掛牌到期序列的模擬資料。輸出格式與真實解析後的 result 相同。
 
         模擬參數可透過環境變數覆寫：
-        TAIFEX_MOCK_INDEX, TAIFEX_MOCK_VOL, TAIFEX_MOCK_DTE, TAIFEX_MOCK_R
+        TAIFEX_MOCK_INDEX, TAIFEX_MOCK_VOL, TAIFEX_MOCK_R, TAIFEX_MOCK_SPAN, TAIFEX_MOCK_STEP
+        剩餘天數由各到期序列的實際結算日計算
         """
         # 讀取模擬參數
         try:
@@ -434,10 +539,6 @@ class TaifexDataProvider(DataProvider):
             vol = float(os.getenv('TAIFEX_MOCK_VOL', '0.2'))
         except Exception:
             vol = 0.2
-        try:
-            dte = int(os.getenv('TAIFEX_MOCK_DTE', '14'))
-        except Exception:
-            dte = 14
         try:
             r = float(os.getenv('TAIFEX_MOCK_R', '0.015'))
         except Exception:
@@ -448,78 +549,62 @@ class TaifexDataProvider(DataProvider):
         step = int(os.getenv('TAIFEX_MOCK_STEP', '100'))
         strikes = list(range(int(index) - span, int(index) + span + 1, step))
 
-        result = {}
-        # base time value: 估算 ATM 時間價值，與波動率與到期日相關
-        import math
-        T = max(1, dte) / 365.0
-        base_time_value = max(5.0, index * vol * math.sqrt(T) * 0.2)
-
-        for s in strikes:
-            distance = abs(index - s)
-            # 時間價值簡單衰減模型
-            time_value = max(1.0, base_time_value * math.exp(-distance / 800.0))
-
-            # Call and Put
-            call_price = max(0.0, index - s) + time_value
-            put_price = max(0.0, s - index) + time_value
-
-            # 建立 key 與條目
-            for is_call, price in ((True, call_price), (False, put_price)):
-                cp = 'C' if is_call else 'P'
-                strike_int = int(s)
-                key = f"{strike_int}_{cp}"
-                bid = round(price * 0.97, 2)
-                ask = round(price * 1.03, 2)
-
-                result[key] = {
-                    'strike': strike_int,
-                    'type': 'Call' if is_call else 'Put',
-                    'price': round(price, 2),
-                    'bid': bid,
-                    'ask': ask,
-                    'source': 'taifex_mock'
-                }
+        expiries = self.listed_expiries()
+        quotes = pricing.price_chain(index, strikes, expiries, vol, r)
+
+        result = ChainIndex(source='taifex_mock')
+        for e, expiry in enumerate(expiries):
+            for is_call, option_type in ((True, 'call'), (False, 'put')):
+                prices = np.maximum(np.round(quotes[option_type]['price'][e], 2), 0.01)
+                for s, price in zip(strikes, prices.tolist()):
+                    result.add(expiry, s, is_call, price, round(price * 0.97, 2), round(price * 1.03, 2), price)
 
-        logger.info(f"🔧 已產生模擬期交所資料，共 {len(result)} 筆 (index={index}, vol={vol}, dte={dte})")
+        logger.info(f"🔧 已產生模擬期交所資料，共 {len(result)} 筆 (index={index}, vol={vol}, 到期序列={expiries})")
         return result
-    
+
     def get_tx_price(self) -> dict:
         """期交所無提供即時價格，回傳空值"""
         return {"price": 0, "change": 0, "change_percent": 0}
     
     def get_option_price(self, strike: int, option_type: str, contract: str = None) -> dict:
-        data = self._fetch_data()
-        
-        call_put = 'C' if option_type.lower() == 'call' else 'P'
-        key = f"{strike}_{call_put}"
-        
-        if data and key in data:
-            item = data[key]
-            return {
-                "strike": strike,
-                "type": option_type.capitalize(),
-                "symbol": self.get_option_symbol(strike, option_type),
-                "price": item['price'],
-                "bid": item['bid'],
-                "ask": item['ask'],
-                "source": "taifex"
-            }
-        
-        # 找不到資料
-        return None
+        return self.get_option_chain([strike], contract)[strike][option_type.lower()]
+
+    def get_option_chain(self, strikes: list, contract: str = None) -> dict:
+        """整條選擇權鏈只讀取一次快取，依 (到期代碼, 履約價, C/P) 查索引"""
+        index = self._fetch_data()
+        expiry = self.contract_expiry_code(contract)
+        symbols = self.option_symbols(strikes, contract)
+
+        chain = {}
+        for strike in strikes:
+            row = {}
+            for option_type, call_put in (('call', 'C'), ('put', 'P')):
+                item = index.get(expiry, strike, call_put) if index is not None else None
+                row[option_type] = {
+                    "strike": strike,
+                    "type": option_type.capitalize(),
+                    "symbol": symbols[(strike, option_type)],
+                    "price": item['price'],
+                    "bid": item['bid'],
+                    "ask": item['ask'],
+                    "source": "taifex"
+                } if item else None
+            chain[strike] = row
+        return chain
     
-    def is_available(self) -> bool:
-        """檢查期交所資料是否可用"""
-        data = self._fetch_data()
-        return data is not None and len(data) > 0
-
 
 # ============ 富邦證券資料提供者 ============
 
 class FubonDataProvider(DataProvider):
     """富邦證券 SDK 資料提供者"""
+
+    @property
+    def blocking_io(self) -> bool:
+        """串流模式只讀取記憶體報價簿；REST 模式每次查詢都會等待上游"""
+        return self.stream is None
     
-    def __init__(self, user_id, password, cert_path, cert_password, api_url=None):
+    def __init__(self, user_id, password, cert_path, cert_password, api_url=None,
+                 quote_workers: int = 16, quote_timeout: float = 3.0):
         self.user_id = user_id
         self.password = password
         self.cert_path = cert_path
@@ -528,9 +613,22 @@ class FubonDataProvider(DataProvider):
         self.api = None
         self.is_logged_in = False
         self.login_error_message = None
+        # 並行報價查詢 (日夜盤同時查詢，每次請求有整體期限)
+        self._fetcher = QuoteFetcher(self._quote, max_workers=quote_workers, timeout=quote_timeout)
+        # websocket 串流模式 (啟用後報價改由記憶體報價簿提供)
+        self.stream = None
         self._login()
     
     def _login(self):
+        start = time.time()
+        self._login_once()
+        if self.health is not None:
+            if self.is_logged_in:
+                self.health.record_success('fubon', time.time() - start)
+            else:
+                self.health.record_failure('fubon', self.login_error_message, time.time() - start, available=False)
+
+    def _login_once(self):
         try:
             from fubon_neo.sdk import FubonSDK
             
@@ -575,53 +673,89 @@ class FubonDataProvider(DataProvider):
         hour = datetime.now().hour
         return hour >= 15 or hour < 5
     
+    def _sessions(self) -> tuple:
+        """查詢盤別順序：主要盤別在前"""
+        if self._is_night_session():
+            return ('afterhours', None)
+        return (None, 'afterhours')
+
+    def _quote(self, symbol: str, session: str = None) -> dict:
+        """單一盤別報價查詢 (session=None 為一般盤，'afterhours' 為夜盤)"""
+        if session:
+            return self.api.marketdata.rest_client.futopt.intraday.quote(symbol=symbol, session=session)
+        return self.api.marketdata.rest_client.futopt.intraday.quote(symbol=symbol)
+
     def _get_quote_safe(self, symbol: str) -> dict:
-        """安全取得報價（自動處理日夜盤）"""
+        """安全取得報價（日夜盤同時查詢，先回傳有效價格者勝出）"""
         if not self.is_logged_in:
             return {}
-        
-        is_night = self._is_night_session()
-        
-        # 嘗試主要盤別
-        try:
-            if is_night:
-                quote = self.api.marketdata.rest_client.futopt.intraday.quote(
-                    symbol=symbol, session='afterhours'
-                )
-            else:
-                quote = self.api.marketdata.rest_client.futopt.intraday.quote(symbol=symbol)
-            
-            if quote and 'lastPrice' in quote and quote['lastPrice'] > 0:
-                return quote
-        except Exception:
-            pass
-        
-        # 嘗試次要盤別
+        if self.stream:
+            return self._stream_quotes([symbol]).get(symbol, {})
+        return self._fetcher.fetch(symbol, self._sessions())
+
+    def _stream_quotes(self, symbols: list) -> dict:
+        """
+        串流模式：直接讀取記憶體報價簿，不發出任何網路查詢
+        尚無報價的代號會補訂閱，下次讀取即可命中
+        """
+        self.stream.switch_session(self._is_night_session())
+        quotes = self.stream.book.get_many(symbols)
+        missing = [s for s in symbols if not is_valid_quote(quotes.get(s))]
+        if missing:
+            self.stream.subscribe(missing)
+        return {s: q for s, q in quotes.items() if is_valid_quote(q)}
+
+    def _tx_symbol(self) -> str:
+        """台指期近月代號"""
+        month_codes = "ABCDEFGHIJKL"
+        month, year = self.get_contract_month_year()
+        year_digit = str(year)[-1]
+        month_code = month_codes[month - 1]
+        return f"TXF{month_code}{year_digit}"
+
+    def start_streaming(self, center: int = None, span: int = 1500, step: int = 100,
+                        contracts: tuple = ('current_month', 'current_week')) -> bool:
+        """
+        啟用 websocket 串流模式
+        訂閱台指期近月與價平附近 (center ± span) 的選擇權代號，之後的報價查詢只讀取記憶體報價簿
+        """
+        if not self.is_logged_in:
+            return False
+
         try:
-            if is_night:
-                quote = self.api.marketdata.rest_client.futopt.intraday.quote(symbol=symbol)
-            else:
-                quote = self.api.marketdata.rest_client.futopt.intraday.quote(
-                    symbol=symbol, session='afterhours'
-                )
-            
-            if quote and 'lastPrice' in quote and quote['lastPrice'] > 0:
-                return quote
-        except Exception:
-            pass
-        
-        return {}
+            self.api.init_realtime()
+            stream = FubonQuoteStream(
+                self.api.marketdata.websocket_client.futopt,
+                after_hours=self._is_night_session()
+            )
+            stream.start()
+        except Exception as e:
+            logger.error(f"❌ 啟用富邦即時行情串流失敗，維持 REST 查詢: {e}")
+            return False
+
+        tx_symbol = self._tx_symbol()
+        if not center:
+            # 以 REST 查詢一次期貨價格作為價平中心
+            quote = self._fetcher.fetch(tx_symbol, self._sessions())
+            center = quote.get('lastPrice') if quote else None
+
+        symbols = [tx_symbol]
+        if center:
+            atm = int(round(center / step) * step)
+            for contract in contracts:
+                symbols.extend(self.option_symbols(range(atm - span, atm + span + 1, step), contract).values())
+
+        self.stream = stream
+        stream.subscribe(symbols)
+        logger.info(f"✅ 富邦串流模式啟用，訂閱 {len(symbols)} 檔 (center={center})")
+        return True
     
     def get_tx_price(self) -> dict:
         if not self.is_logged_in:
             return {"price": 0, "change": 0, "change_percent": 0}
         
         try:
-            month_codes = "ABCDEFGHIJKL"
-            month, year = self.get_contract_month_year()
-            year_digit = str(year)[-1]
-            month_code = month_codes[month - 1]
-            symbol = f"TXF{month_code}{year_digit}"
+            symbol = self._tx_symbol()
             
             quote = self._get_quote_safe(symbol)
             
@@ -647,116 +781,75 @@ class FubonDataProvider(DataProvider):
             return None
         
         try:
-            # Default values
-            root = "TXO"
-            month, year = self.get_contract_month_year()
-
-            # Handle Contract Selection
-            if contract:
-                now = datetime.now()
-                target_date = None
-
-                if contract == "current_week" or contract == "next_week":
-                    # Calc Target Wednesday
-                    # 0=Mon, 2=Wed
-                    days_to_wed = (2 - now.weekday() + 7) % 7
-                    target_date = now + timedelta(days=days_to_wed)
-                    
-                    if contract == "next_week":
-                        target_date += timedelta(days=7)
-                    
-                    # Determine Month/Year based on Target Date
-                    year = target_date.year
-                    month = target_date.month
-                    
-                    # Determine Root (TX1, TX2, TXO, TX4, TX5)
-                    first_day = target_date.replace(day=1)
-                    days_to_first_wed = (2 - first_day.weekday() + 7) % 7
-                    first_wed = first_day + timedelta(days=days_to_first_wed)
-                    
-                    day_diff = (target_date - first_wed).days
-                    week_num = (day_diff // 7) + 1
-                    
-                    if week_num == 3:
-                        root = "TXO" # Monthly contract
-                    else:
-                        root = f"TX{week_num}" # TX1, TX2, TX4, TX5
-                
-                elif contract == "current_fri" or contract == "next_fri":
-                    # Calc Target Friday
-                    # 4=Fri
-                    days_to_fri = (4 - now.weekday() + 7) % 7
-                    target_date = now + timedelta(days=days_to_fri)
-                    
-                    if contract == "next_fri":
-                        target_date += timedelta(days=7)
-                        
-                    year = target_date.year
-                    month = target_date.month
-                    
-                    # Determine Root (TXU, TXV, TXX, TXY, TXZ)
-                    first_day = target_date.replace(day=1)
-                    days_to_first_fri = (4 - first_day.weekday() + 7) % 7
-                    first_fri = first_day + timedelta(days=days_to_first_fri)
-                    
-                    day_diff = (target_date - first_fri).days
-                    week_num = (day_diff // 7) + 1
-                    
-                    roots = ['TXU', 'TXV', 'TXX', 'TXY', 'TXZ']
-                    if 1 <= week_num <= 5:
-                        root = roots[week_num - 1]
-                    else:
-                        root = "TXU" # Fallback
-
-                elif contract == "next_month":
-                    # Monthly logic override
-                    month += 1
-                    if month > 12:
-                         month = 1
-                         year += 1
-                    root = "TXO"
-                else: 
-                     # current_month (default)
-                     # Already set by get_contract_month_year()
-                     root = "TXO"
-
-            # Generate Symbol
-            symbol = self.get_option_symbol(strike, option_type, target_month=month, target_year=year, root=root)
+            symbol = self.calendar.symbol(self.contract_series(contract), strike, option_type)
             
             quote = self._get_quote_safe(symbol)
-            
-            if quote and 'lastPrice' in quote and quote['lastPrice'] > 0:
-                return {
-                    "strike": strike,
-                    "type": option_type.capitalize(),
-                    "symbol": symbol,
-                    "price": float(quote['lastPrice']),
-                    "bid": float(quote.get('bidPrice', 0)),
-                    "ask": float(quote.get('askPrice', 0)),
-                    "source": "fubon"
-                }
-            elif quote and 'referencePrice' in quote:
-                return {
-                    "strike": strike,
-                    "type": option_type.capitalize(),
-                    "symbol": symbol,
-                    "price": float(quote.get('referencePrice', 0)),
-                    "bid": 0,
-                    "ask": 0,
-                    "source": "fubon"
-                }
-            return None
+            return self._quote_to_option(strike, option_type, symbol, quote)
         except Exception as e:
             logger.error(f"❌ 取得選擇權價格失敗 ({strike} {option_type} {contract}): {e}")
             return None
 
+    def get_option_chain(self, strikes: list, contract: str = None) -> dict:
+        """
+        批次取得選擇權鏈
+        合約代號只解析一次，各履約價的報價以執行緒池並行查詢，
+        整條鏈的等待時間約等於單次最慢的查詢，而非所有查詢的總和
+        """
+        chain = {strike: {"call": None, "put": None} for strike in strikes}
+        if not self.is_logged_in:
+            return chain
+
+        symbols = self.option_symbols(strikes, contract)
+
+        if self.stream:
+            quotes = self._stream_quotes(list(symbols.values()))
+        else:
+            quotes = self._fetcher.fetch_many(list(symbols.values()), self._sessions())
+
+        for (strike, option_type), symbol in symbols.items():
+            try:
+                chain[strike][option_type] = self._quote_to_option(strike, option_type, symbol, quotes.get(symbol))
+            except Exception as e:
+                logger.error(f"❌ 取得選擇權價格失敗 ({strike} {option_type} {contract}): {e}")
+        return chain
+
+    def snapshot_version(self):
+        """串流模式以報價簿版本識別；輪詢模式每次都是新報價，不快取"""
+        return ('stream', self.stream.book.version) if self.stream else None
+
+    def _quote_to_option(self, strike: int, option_type: str, symbol: str, quote: dict) -> dict:
+        """將富邦報價轉換為統一的選擇權格式"""
+        if quote and 'lastPrice' in quote and quote['lastPrice'] > 0:
+            return {
+                "strike": strike,
+                "type": option_type.capitalize(),
+                "symbol": symbol,
+                "price": float(quote['lastPrice']),
+                "bid": float(quote.get('bidPrice', 0)),
+                "ask": float(quote.get('askPrice', 0)),
+                "source": "fubon"
+            }
+        elif quote and 'referencePrice' in quote:
+            return {
+                "strike": strike,
+                "type": option_type.capitalize(),
+                "symbol": symbol,
+                "price": float(quote.get('referencePrice', 0)),
+                "bid": 0,
+                "ask": 0,
+                "source": "fubon"
+            }
+        return None
+
 
 # ============ Yahoo 奇摩資料提供者 ============
 
-class YahooDataProvider(DataProvider):
+class YahooDataProvider(CachedDataProvider):
     """Yahoo 奇摩股市資料 scraper"""
+    shared_fields = ('data', 'index_price')
     
     def __init__(self):
+        super().__init__()
         self.cache = {
             'data': None,
             'index_price': None,
@@ -765,27 +858,26 @@ class YahooDataProvider(DataProvider):
         }
         
     def _fetch_data(self):
-        # 檢查快取
-        if self.cache['data'] and self.cache['timestamp']:
-            elapsed = (datetime.now() - self.cache['timestamp']).total_seconds()
-            if elapsed < self.cache['ttl']:
-                return self.cache['data'], self.cache['index_price']
-                
+        """回傳目前的 Yahoo 快照 (data, index_price)，過期時由背景排程更新"""
+        self._touch()
+        return self._snapshot('data', 'index_price')
+
+    def _download(self) -> bool:
         logger.info("📡 正在從 Yahoo 奇摩抓取選擇權資料...")
         try:
             index_price, data = yahoo_scraper.scrape_yahoo_option_chain()
             if data:
-                self.cache['data'] = data
-                self.cache['index_price'] = index_price
-                self.cache['timestamp'] = datetime.now()
+                self._store(data=data, index_price=index_price)
                 logger.info(f"✅ Yahoo 抓取成功，共 {len(data)} 筆，指數: {index_price}")
-                return data, index_price
+                return True
             else:
                 logger.warning("⚠️ Yahoo 抓取回傳空資料")
-                return None, None
+                return False
+        except upstream_http.UpstreamBackoff:
+            raise
         except Exception as e:
             logger.error(f"❌ Yahoo 抓取失敗: {e}")
-            return None, None
+            return False
 
     def get_tx_price(self) -> dict:
         _, index_price = self._fetch_data()
@@ -796,7 +888,7 @@ class YahooDataProvider(DataProvider):
             "change_percent": 0
         }
 
-    def get_option_price(self, strike: int, option_type: str) -> dict:
+    def get_option_price(self, strike: int, option_type: str, contract: str = None) -> dict:
         data, _ = self._fetch_data()
         if not data:
             return None
@@ -807,10 +899,18 @@ class YahooDataProvider(DataProvider):
         if key in data:
             return data[key]
         return None
-        
-    def is_available(self) -> bool:
+
+    def get_option_chain(self, strikes: list, contract: str = None) -> dict:
+        """Yahoo 頁面只有近月資料，整條鏈共用同一次抓取結果"""
         data, _ = self._fetch_data()
-        return data is not None and len(data) > 0
+        data = data or {}
+        return {
+            strike: {
+                "call": data.get(f"{strike}_C"),
+                "put": data.get(f"{strike}_P")
+            }
+            for strike in strikes
+        }
 
 
 # ============ 全域資料提供者管理 ============
@@ -821,6 +921,78 @@ taifex_provider = TaifexDataProvider()
 yahoo_provider = YahooDataProvider() # Initialize Yahoo Provider
 fubon_provider = None
 
+# 伺服器端投資組合 (/api/portfolio/risk)
+try:
+    portfolio_store = PortfolioStore(max_portfolios=int(os.getenv('PORTFOLIO_MAX', '1000')))
+except Exception:
+    portfolio_store = PortfolioStore()
+
+def init_shared_cache():
+    """
+    初始化跨 worker 共用快照快取 (SHARED_CACHE_PATH，設為 off 可停用)
+    多個 gunicorn worker 只會有一個向上游下載，其餘讀取同一份快照
+    """
+    path = os.getenv('SHARED_CACHE_PATH', os.path.join(tempfile.gettempdir(), 'option_api_snapshots.sqlite3'))
+    if not path or path.lower() == 'off':
+        return None
+    try:
+        cache = SharedSnapshotCache(path)
+    except Exception as e:
+        logger.warning(f"⚠️ 無法建立共用快取 ({path})，各 worker 將獨立更新: {e}")
+        return None
+    CachedDataProvider.shared_cache = cache
+    logger.info(f"✅ 共用快照快取: {path}")
+    return cache
+
+init_shared_cache()
+
+# 未設定 TAIFEX_ARCHIVE_DIR 時的封存目錄 (應用程式目錄下，不會因系統暫存目錄被清除而遺失)
+DEFAULT_ARCHIVE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'taifex_archive')
+
+def init_taifex_archive():
+    """初始化期交所歷史行情封存 (TAIFEX_ARCHIVE_DIR，設為 off 可停用)"""
+    path = os.getenv('TAIFEX_ARCHIVE_DIR')
+    if path is None:
+        path = DEFAULT_ARCHIVE_DIR
+        logger.warning(f"⚠️ 未設定 TAIFEX_ARCHIVE_DIR，期交所行情封存於 {path}；"
+                       f"若部署環境的檔案系統不會保留 (例如重新部署)，請指向持久化磁碟，否則回測與歷史查詢的資料會遺失")
+    if not path or path.lower() == 'off':
+        return None
+    try:
+        archive = TaifexArchive(path)
+    except Exception as e:
+        logger.warning(f"⚠️ 無法建立期交所行情封存目錄 ({path}): {e}")
+        return None
+    TaifexDataProvider.archive = archive
+    logger.info(f"✅ 期交所行情封存: {path}")
+    return archive
+
+init_taifex_archive()
+
+# 背景更新排程：在快取到期前預先更新期交所與 Yahoo 快照
+refresh_scheduler = RefreshScheduler()
+def init_provider_health():
+    """
+    初始化資料來源健康狀態
+    PROVIDER_FAILURE_THRESHOLD 次連續失敗後打開斷路器，PROVIDER_RESET_TIMEOUT 秒後放行一次試探
+    """
+    try:
+        threshold = int(os.getenv('PROVIDER_FAILURE_THRESHOLD', '3'))
+    except ValueError:
+        threshold = 3
+    try:
+        reset_timeout = float(os.getenv('PROVIDER_RESET_TIMEOUT', '60'))
+    except ValueError:
+        reset_timeout = 60.0
+    registry = HealthRegistry(failure_threshold=max(1, threshold), reset_timeout=reset_timeout)
+    DataProvider.health = registry
+    return registry
+
+provider_health = init_provider_health()
+
+refresh_scheduler.register('taifex', taifex_provider)
+refresh_scheduler.register('yahoo', yahoo_provider)
+
 def init_fubon_provider():
     """初始化富邦 API Provider"""
     global fubon_provider
@@ -859,6 +1031,16 @@ def init_fubon_provider():
 
     # 使用解析後的絕對路徑
     cert_path = cert_abs
+
+    # 並行報價查詢設定
+    try:
+        quote_workers = max(1, int(os.getenv('FUBON_QUOTE_WORKERS', '16')))
+    except Exception:
+        quote_workers = 16
+    try:
+        quote_timeout = float(os.getenv('FUBON_QUOTE_TIMEOUT', '3'))
+    except Exception:
+        quote_timeout = 3.0
     
     try:
         fubon_provider = FubonDataProvider(
@@ -866,8 +1048,20 @@ def init_fubon_provider():
             password=password,
             cert_path=cert_path,
             cert_password=cert_password.strip(),
-            api_url=api_url
+            api_url=api_url,
+            quote_workers=quote_workers,
+            quote_timeout=quote_timeout
         )
+        # 可選：改用 websocket 串流行情
+        if fubon_provider.is_logged_in and os.getenv('FUBON_STREAMING', '').lower() in ('1', 'true', 'yes'):
+            try:
+                span = int(os.getenv('FUBON_STREAM_SPAN', '1500'))
+            except Exception:
+                span = 1500
+            if fubon_provider.start_streaming(span=span):
+                # 串流報價直接推送給持有該合約的投資組合
+                portfolio_store.index_symbol = fubon_provider._tx_symbol()
+                fubon_provider.stream.book.add_listener(portfolio_store.on_quote)
         return fubon_provider if fubon_provider.is_logged_in else None
     except BaseException as e:
         logger.error(f"❌ 初始化富邦 API 失敗 (嚴重錯誤): {e}")
@@ -883,26 +1077,35 @@ def get_provider(source: str, center: int = None) -> DataProvider:
     
     if source == 'fubon' and fubon_provider and fubon_provider.is_logged_in:
         return fubon_provider
-    elif source == 'taifex' and taifex_provider.is_available():
-        return taifex_provider
-    elif source == 'yahoo' and yahoo_provider.is_available(): # Add Yahoo source check
-        return yahoo_provider
-    else:
+
+    # 只讀取健康狀態；尚無可用快照時要求背景更新 (斷路器打開時由 refresh 直接略過)，本次先以 mock 回應
+    provider = {'taifex': taifex_provider, 'yahoo': yahoo_provider}.get(source)
+    if provider is None:
         return mock_provider
+    if provider.is_available():
+        return provider
+    provider.request_refresh()
+    return mock_provider
 
 
 # ============ API 路由 ============
 
 @app.route('/api/health', methods=['GET'])
 def health():
-    """健康檢查"""
-    return jsonify({
+    """健康檢查 (只讀取健康狀態，不會觸發上游下載)"""
+    return jsonify(health_payload())
+
+
+def health_payload() -> dict:
+    return {
         "status": "ok",
         "fubon_connected": fubon_provider is not None and fubon_provider.is_logged_in,
         "taifex_available": taifex_provider.is_available(),
         "yahoo_available": yahoo_provider.is_available(), # Expose Yahoo status
+        "providers": provider_health.snapshot(),
+        "response_cache": response_cache.stats(),
         "timestamp": datetime.now().isoformat()
-    })
+    }
 
 @app.route('/api/option-price', methods=['GET'])
 def get_option_price():
@@ -919,76 +1122,90 @@ def get_option_price():
     option_type = request.args.get('type', default='call', type=str)
     source = request.args.get('source', default='taifex', type=str)
     center = request.args.get('center', type=int)
-    
-    if not strike:
-        return jsonify({"error": "請提供履約價 (strike)"}), 400
-    
-    if option_type.lower() not in ['call', 'put']:
-        return jsonify({"error": "type 必須是 call 或 put"}), 400
+
+    error = validate_option_price_params(strike, option_type)
+    if error:
+        return jsonify({"error": error}), 400
     
     provider = get_provider(source, center)
+    # 主要來源無此履約價時降級為依 center 計算的 mock 報價，center 也要列入 key
+    key = response_cache_key(provider, 'price', source, strike, option_type.lower(), center)
+    return cached_json_response(key, lambda: build_option_price(provider, strike, option_type))
+
+
+def build_option_price(provider: DataProvider, strike: int, option_type: str) -> dict:
     result = provider.get_option_price(strike, option_type)
-    
     # 如果主要來源無資料，降級到 mock
     if result is None:
         result = mock_provider.get_option_price(strike, option_type)
-    
-    return jsonify(result)
+    return result
 
-@app.route('/api/option-chain', methods=['GET'])
-def get_option_chain():
+def chain_strikes(center: int, price_range: int, step: int) -> list:
+    return [center + (i * step) for i in range(-price_range, price_range + 1)]
+
+
+def provider_tx_price(provider: DataProvider) -> float:
+    """資料提供者的最新指數價格，取不到時為 0"""
+    try:
+        tx_data = provider.get_tx_price()
+        if tx_data and 'price' in tx_data:
+            return tx_data['price']
+    except Exception:
+        pass
+    return 0
+
+
+def validate_option_price_params(strike: int, option_type: str) -> str:
+    """/api/option-price 參數檢查，回傳錯誤訊息或 None"""
+    if not strike:
+        return "請提供履約價 (strike)"
+    if option_type.lower() not in ['call', 'put']:
+        return "type 必須是 call 或 put"
+    return None
+
+
+def build_option_chain(source: str, center: int, price_range: int, step: int, contract_code: str = None,
+                       provider: DataProvider = None) -> dict:
+    """組出選擇權鏈回應內容（/api/option-chain 與串流端點共用）"""
+    strikes = chain_strikes(center, price_range, step)
+    provider = provider or get_provider(source, center)
+
+    # 一次取得整條選擇權鏈
+    quotes = provider.get_option_chain(strikes, contract_code)
+    return assemble_option_chain(provider, source, center, price_range, step, strikes, quotes,
+                                 provider_tx_price(provider), contract_code)
+
+
+def assemble_option_chain(provider: DataProvider, source: str, center: int, price_range: int, step: int,
+                          strikes: list, quotes: dict, current_index_price: float, contract: str = None) -> dict:
     """
-    取得選擇權鏈（多個履約價的報價）
-    
-    Parameters:
-        center (int): 中心履約價（預設 23000）
-        range (int): 上下範圍的檔數（預設 10）
-        step (int): 每檔間距（預設 100）
-        source (str): 資料來源 (taifex/fubon/mock)，預設 taifex
+    由已取得的報價組出選擇權鏈回應 (不做 I/O，同步與 ASGI 版本共用)
+    缺少報價的履約價降級為 mock (同一合約，一次以向量化 BS 計算所有缺價的履約價)
     """
-    center = request.args.get('center', default=23000, type=int)
-    price_range = request.args.get('range', default=10, type=int)
-    step = request.args.get('step', default=100, type=int)
-    source = request.args.get('source', default='taifex', type=str)
-    contract_code = request.args.get('contract', default=None, type=str) # e.g. "202401" or "202401W1"
-    
-    # 計算履約價列表
-    strikes = [center + (i * step) for i in range(-price_range, price_range + 1)]
-    
-    # 取得資料提供者
-    provider = get_provider(source, center)
-    actual_source = source
-    
+    # get_provider 在資料來源不可用時改用 mock_provider，此時整條鏈都是模擬資料
+    actual_source = 'mock' if provider is mock_provider else source
+    rows = [(strike, quotes.get(strike) or {}) for strike in strikes]
+    missing = [strike for strike, row in rows if row.get('call') is None or row.get('put') is None]
+    fallback = mock_provider.get_option_chain(missing, contract) if missing else {}
+    if missing:
+        actual_source = 'mock'
+
     chain = []
-    for strike in strikes:
-        # Pass contract_code to get_option_price
-        call_data = provider.get_option_price(strike, 'call', contract_code)
-        put_data = provider.get_option_price(strike, 'put', contract_code)
-        
+    for strike, row in rows:
+        call_data = row.get('call')
+        put_data = row.get('put')
         # 如果主要來源無資料，降級到 mock
         if call_data is None:
-            call_data = mock_provider.get_option_price(strike, 'call')
-            actual_source = 'mock'
+            call_data = fallback[strike]['call']
         if put_data is None:
-            put_data = mock_provider.get_option_price(strike, 'put')
-            actual_source = 'mock'
-        
+            put_data = fallback[strike]['put']
         chain.append({
             "strike": strike,
             "call": call_data,
             "put": put_data
         })
     
-    # 嘗試取得供應商的最新指數價格
-    current_index_price = 0
-    try:
-        tx_data = provider.get_tx_price()
-        if tx_data and 'price' in tx_data:
-            current_index_price = tx_data['price']
-    except Exception:
-        pass
-
-    return jsonify({
+    payload = {
         "center_price": current_index_price,
         "center": center,
         "range": price_range,
@@ -996,32 +1213,636 @@ def get_option_chain():
         "chain": chain,
         "source": actual_source,
         "timestamp": datetime.now().isoformat()
-    })
+    }
+
+    # 標示快照資料年齡 (背景更新期間可能回傳稍舊的快照)
+    snapshot = provider.snapshot_info()
+    if snapshot:
+        payload["data_timestamp"] = snapshot["timestamp"]
+        payload["data_age"] = snapshot["age"]
+        payload["data_stale"] = snapshot["stale"]
+    return payload
+
+
+def _chain_request_params() -> tuple:
+    """讀取選擇權鏈查詢參數 (source, center, range, step, contract)"""
+    return (
+        request.args.get('source', default='taifex', type=str),
+        request.args.get('center', default=23000, type=int),
+        request.args.get('range', default=10, type=int),
+        request.args.get('step', default=100, type=int),
+        request.args.get('contract', default=None, type=str)  # e.g. "current_week" / "next_month"
+    )
+
+
+def build_iv_surface(provider: DataProvider, strikes: list, rate: float, spot: float = None) -> dict:
+    """讀取所有掛牌到期序列的選擇權鏈並反推 IV 曲面"""
+    expiries, chains = [], []
+    for contract in LISTED_CONTRACTS:
+        expiry = provider.contract_expiry_code(contract)
+        if expiry in expiries:
+            continue
+        expiries.append(expiry)
+        chains.append(provider.get_option_chain(strikes, contract))
+    return vol_surface.to_json(vol_surface.build_surface(strikes, expiries, chains, r=rate, spot=spot))
+
+
+# IV 曲面快取 (依資料來源快照版本與掛牌到期代碼，報價未更新時不重算；剩餘天數隨時間變動，每筆最多保留 ttl 秒)
+try:
+    iv_surface_cache = vol_surface.SurfaceCache(ttl=float(os.getenv('IV_SURFACE_CACHE_TTL', '60')))
+except Exception:
+    iv_surface_cache = vol_surface.SurfaceCache()
+
+# 選擇權鏈 / 單一報價的回應快取 (依資料來源快照版本，ETag 未變時回 304)
+try:
+    response_cache = ResponseCache(
+        max_entries=int(os.getenv('RESPONSE_CACHE_ENTRIES', '256')),
+        max_bytes=int(os.getenv('RESPONSE_CACHE_BYTES', str(16 * 1024 * 1024))),
+        ttl=float(os.getenv('RESPONSE_CACHE_TTL', '30')),
+    )
+except Exception:
+    response_cache = ResponseCache()
+
+
+def response_cache_key(provider: DataProvider, route: str, *params, contract: str = None):
+    """
+    回應快取的 key：(資料來源類別, 快照版本, 是否過期, 到期代碼, 路由, 查詢參數)
+    合約代稱先解析為到期代碼，換倉後不會沿用舊序列的回應；資料來源無快照版本時回傳 None (不快取)
+    """
+    version = provider.snapshot_version()
+    if version is None:
+        return None
+    snapshot = provider.snapshot_info()
+    return (type(provider).__name__, version, bool(snapshot and snapshot['stale']),
+            provider.contract_expiry_code(contract), route) + params
+
+
+def encode_json(payload) -> bytes:
+    """與 jsonify 相同的 JSON 編碼 (Flask 與 ASGI 模式的回應內容一致)"""
+    return app.json.response(payload).get_data()
+
+
+def cached_response(entry) -> Response:
+    """回傳快取的回應；If-None-Match 符合 ETag 時回 304"""
+    if etag_matches(request.headers.get('If-None-Match'), entry.etag):
+        response = Response(status=304)
+    else:
+        response = Response(entry.body, content_type=entry.content_type)
+        if entry.content_encoding:
+            response.headers['Content-Encoding'] = entry.content_encoding
+    response.headers['ETag'] = entry.etag
+    # 允許瀏覽器保存，但每次都需以 ETag 重新驗證
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def cached_json_response(key, build) -> Response:
+    if key is None:
+        return jsonify(build())
+    return cached_response(response_cache.get(key, lambda: encode_json(build())))
+
+# 損益曲線最多價格點數 (例如 1 點間距 ±5000 點為 10001 點)
+PNL_MAX_POINTS = 200001
+
+# 情境網格格數上限 (指數 × 天數 × 波動率) 與倉位數上限
+SCENARIO_MAX_CELLS = 2000000
+SCENARIO_MAX_POSITIONS = 200
+
+# 蒙地卡羅模擬路徑數上限
+try:
+    MC_MAX_PATHS = int(os.getenv('MC_MAX_PATHS', '1000000'))
+except Exception:
+    MC_MAX_PATHS = 1000000
+
+# 歷史行情查詢單次回傳筆數上限
+HISTORY_MAX_ROWS = 200000
+
+# 回測參數組合數上限 (換倉規則 × 履約價偏移 × 避險比例)
+try:
+    BACKTEST_MAX_COMBOS = int(os.getenv('BACKTEST_MAX_COMBOS', '2000'))
+except Exception:
+    BACKTEST_MAX_COMBOS = 2000
+
+# 選擇權鏈推播 (同一組參數的所有連線共用一個更新執行緒)
+try:
+    _stream_interval = float(os.getenv('CHAIN_STREAM_INTERVAL', '5'))
+except Exception:
+    _stream_interval = 5.0
+chain_broadcaster = ChainBroadcaster(build_option_chain, interval=_stream_interval)
+
+# gthread worker 中每條 SSE 連線會佔住一個執行緒直到斷線，保留其餘執行緒給一般 REST 請求
+# (大量推播連線請改用 ASGI 模式的 /api/stream/chain，所有連線共用一個事件迴圈)
+try:
+    SSE_MAX_CONNECTIONS = int(os.getenv('SSE_MAX_CONNECTIONS', '50'))
+except Exception:
+    SSE_MAX_CONNECTIONS = 50
+_sse_slots = threading.BoundedSemaphore(max(SSE_MAX_CONNECTIONS, 1))
+
+
+@app.route('/api/option-chain', methods=['GET'])
+def get_option_chain():
+    """
+    取得選擇權鏈（多個履約價的報價）
+    
+    Parameters:
+        center (int): 中心履約價（預設 23000）
+        range (int): 上下範圍的檔數（預設 10）
+        step (int): 每檔間距（預設 100）
+        source (str): 資料來源 (taifex/fubon/mock)，預設 taifex
+        contract (str): 合約 (current_week/next_week/current_fri/next_fri/current_month/next_month)
+        format (str): json (預設巢狀) / columnar (欄式 JSON) / msgpack，未指定時依 Accept 標頭協商
+    """
+    source, center, price_range, step, contract_code = _chain_request_params()
+    try:
+        fmt = chain_format.negotiate(request.args.get('format'), request.headers.get('Accept'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    provider = get_provider(source, center)
+    key = response_cache_key(provider, 'chain', source, center, price_range, step, contract=contract_code)
+    build = lambda: build_option_chain(source, center, price_range, step, contract_code, provider)
+    if fmt == 'json':
+        response = cached_json_response(key, build)
+    else:
+        # 精簡格式依 Accept-Encoding 壓縮，快取的是壓縮後的內容
+        encoding = chain_format.accept_encoding(request.headers.get('Accept-Encoding'))
+        if key is not None:
+            key += (fmt, encoding)
+        response = cached_response(response_cache.get(
+            key, lambda: chain_format.encode(build(), fmt, encoding),
+            content_type=chain_format.CONTENT_TYPES[fmt], content_encoding=encoding
+        ))
+    response.vary.add('Accept')
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+@app.route('/api/stream/chain', methods=['GET'])
+def stream_option_chain():
+    """
+    選擇權鏈 Server-Sent Events 推播
+    連線後先送一次完整 snapshot，之後只推送有變動的 {strike, side, price, bid, ask}
+    參數與 /api/option-chain 相同
+    同時連線數上限為 SSE_MAX_CONNECTIONS (超過時回 503)，避免推播連線佔滿 worker 的執行緒
+    """
+    if not _sse_slots.acquire(blocking=False):
+        response = jsonify({"error": "推播連線數已達上限，請稍後再試"})
+        response.status_code = 503
+        response.headers['Retry-After'] = '30'
+        return response
+
+    try:
+        key = _chain_request_params()
+        subscription = chain_broadcaster.subscribe(key)
+    except Exception:
+        _sse_slots.release()
+        raise
+
+    def events():
+        yield 'retry: 5000\n\n'
+        while True:
+            message = subscription.next_message(timeout=15)
+            # 無更新時送出註解行維持連線
+            yield message if message is not None else ': keepalive\n\n'
+
+    closed = []
+
+    def close():
+        # 連線結束 (含尚未開始送出內容就斷線) 時釋放名額
+        if not closed:
+            closed.append(True)
+            chain_broadcaster.unsubscribe(subscription)
+            _sse_slots.release()
+
+    response = Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    response.call_on_close(close)
+    return response
+
+@app.route('/api/iv-surface', methods=['GET'])
+def get_iv_surface():
+    """
+    隱含波動率曲面 (到期序列 × 履約價)
+
+    Parameters:
+        center / range / step / source: 同 /api/option-chain
+        rate (float): 無風險利率 (預設 0.015)
+        spot (float): 標的價格；未提供時以買賣權平價逐到期序列反推
+    """
+    source, center, price_range, step, _ = _chain_request_params()
+    rate = request.args.get('rate', default=0.015, type=float)
+    spot = request.args.get('spot', default=None, type=float)
+    if step <= 0 or price_range < 0:
+        return jsonify({"error": "step 必須大於 0，range 不可為負"}), 400
+
+    strikes = [center + (i * step) for i in range(-price_range, price_range + 1)]
+    provider = get_provider(source, center)
+    version = provider.snapshot_version()
+    # 換倉後掛牌序列改變，即使快照版本相同 (上游回 304) 也不沿用舊曲面
+    key = None if version is None else (type(provider).__name__, version, tuple(provider.listed_expiries()),
+                                        center, price_range, step, rate, spot)
+
+    surface = iv_surface_cache.get(key, lambda: build_iv_surface(provider, strikes, rate, spot))
+    payload = dict(surface, source='mock' if provider is mock_provider else source,
+                   rate=rate, timestamp=datetime.now().isoformat())
+
+    snapshot = provider.snapshot_info()
+    if snapshot:
+        payload["data_timestamp"] = snapshot["timestamp"]
+        payload["data_age"] = snapshot["age"]
+        payload["data_stale"] = snapshot["stale"]
+    return jsonify(payload)
+
+
+@app.route('/api/pnl-curve', methods=['POST'])
+def pnl_curve():
+    """
+    到期損益曲線 (伺服器端 NumPy 計算，對應前端 calculatePnLCurve / compareStrategies)
+
+    JSON Body:
+        centerPrice (float): 模擬中心指數
+        referenceIndex (float): 00631L 損益的基準指數 (預設 centerPrice)
+        priceRange (float): 上下模擬範圍 (點)
+        step (float): 價格間距 (預設 100，可細到 1 點)
+        etfLots / etfCost / etfCurrent: 00631L 張數、成本、現價
+        positions (list): 選擇權/期貨倉位 (格式同前端)
+        strategies (list): 可選，[{name, positions}]，每組策略各自計算並回傳指標
+        includeCurves (bool): strategies 模式下是否回傳各策略完整曲線 (預設 false)
+    """
+    body = request.get_json(silent=True) or {}
+    try:
+        center = float(body.get('centerPrice', 23000))
+        price_range = float(body.get('priceRange', 2000))
+        step = float(body.get('step', payoff.PRICE_STEP))
+        etf_lots = float(body.get('etfLots', 0) or 0)
+        etf_cost = float(body.get('etfCost', 0) or 0)
+        etf_current = float(body.get('etfCurrent', 0) or 0)
+        reference_index = float(body['referenceIndex']) if body.get('referenceIndex') else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "參數格式錯誤"}), 400
+
+    if step <= 0 or price_range < 0:
+        return jsonify({"error": "step 必須大於 0，priceRange 不可為負"}), 400
+    if price_range * 2 / step + 1 > PNL_MAX_POINTS:
+        return jsonify({"error": f"價格點數超過上限 {PNL_MAX_POINTS}"}), 400
+
+    positions = body.get('positions') or []
+    strategies = body.get('strategies')
+
+    result = payoff.calculate_pnl_curve(
+        center, price_range, etf_lots, etf_cost, etf_current, positions,
+        reference_index=reference_index, step=step
+    )
+    response = {k: (v.tolist() if hasattr(v, 'tolist') else v) for k, v in result.items()}
+    response['analysis'] = payoff.analyze(result['prices'], result['combinedProfits'])[0]
+
+    if strategies:
+        combined = payoff.evaluate_strategies(result['prices'], strategies, result['etfProfits'])
+        analysis = payoff.analyze(result['prices'], combined)
+        include_curves = bool(body.get('includeCurves'))
+        response['strategies'] = [
+            dict(
+                {"name": strategy.get('name', f"策略 {i + 1}"), "analysis": analysis[i]},
+                **({"combinedProfits": combined[i].tolist()} if include_curves else {})
+            )
+            for i, strategy in enumerate(strategies)
+        ]
+
+    return jsonify(response)
+
+
+@app.route('/api/recommend', methods=['POST'])
+def recommend():
+    """
+    避險策略搜尋 (伺服器端版 recommendStrategies)
+    列舉整條選擇權鏈的 買賣權 / 賣權價差 / 領口 / 掩護性買權 組合，回傳 Pareto 最適避險
+
+    JSON Body:
+        currentIndex (float): 目前指數 (預設取資料來源的指數)
+        etfLots / etfCost / etfCurrent: 00631L 張數、成本、現價
+        hedgeRatio (float): 避險比例，口數 = round(etfLots × hedgeRatio) (預設 0.2)
+        source (str): 選擇權資料來源 (預設 taifex)
+        contract (str): 合約 (同 /api/option-chain)
+        strikeStep (int): 履約價間距 (預設 100)
+        limit (int): 回傳組合數上限 (預設 20)
+    """
+    body = request.get_json(silent=True) or {}
+    try:
+        index = float(body.get('currentIndex') or 0)
+        etf_lots = float(body.get('etfLots', 0) or 0)
+        etf_cost = float(body.get('etfCost', 0) or 0)
+        etf_current = float(body.get('etfCurrent', 0) or 0)
+        hedge_ratio = float(body.get('hedgeRatio', 0.2))
+        strike_step = int(body.get('strikeStep', 100))
+        limit = int(body.get('limit', 20))
+    except (TypeError, ValueError):
+        return jsonify({"error": "參數格式錯誤"}), 400
+    if strike_step <= 0 or limit <= 0:
+        return jsonify({"error": "strikeStep 與 limit 必須大於 0"}), 400
+
+    source = body.get('source', 'taifex')
+    contract = body.get('contract')
+    if not index:
+        index = float(get_provider(source).get_tx_price().get('price') or 0)
+    if index <= 0:
+        return jsonify({"error": "無法取得目前指數，請提供 currentIndex"}), 400
+
+    center = int(round(index / strike_step) * strike_step)
+    low = int(index * strategy_search.PUT_MONEYNESS[0] // strike_step) * strike_step
+    high = int(index * strategy_search.CALL_MONEYNESS[1] // strike_step + 1) * strike_step
+    strikes = list(range(low, high + 1, strike_step))
+
+    provider = get_provider(source, center)
+    quotes = provider.get_option_chain(strikes, contract)
+    chain = [{"strike": k, **(quotes.get(k) or {})} for k in strikes]
+
+    result = strategy_search.search(chain, index, etf_lots, etf_cost, etf_current, hedge_ratio, limit=limit)
+    result.update(
+        source='mock' if provider is mock_provider else source,
+        currentIndex=index,
+        timestamp=datetime.now().isoformat()
+    )
+    return jsonify(result)
+
+
+@app.route('/api/scenario', methods=['POST'])
+def scenario_cube():
+    """
+    情境分析：組合損益在 (指數 × 剩餘天數 × 波動率平移) 網格上的立方體 (Black-Scholes 重新評價)
+
+    JSON Body:
+        centerPrice / priceRange / step: 指數軸 (同 /api/pnl-curve)
+        referenceIndex (float): 00631L 損益的基準指數 (預設 centerPrice)
+        daysToExpiry (float): 目前剩餘天數 (日曆日)；天數軸由此遞減到 0
+        dayStep (float): 天數軸間距 (預設 1)
+        volShifts (list): 波動率平移 (預設 -0.10 ~ +0.10，每 0.02 一格)
+        vol / rate: 基準波動率 (預設 0.2)、無風險利率 (預設 0.015)
+        etfLots / etfCost / etfCurrent / positions: 同 /api/pnl-curve；倉位可另帶 iv、daysToExpiry (最多 SCENARIO_MAX_POSITIONS 筆)
+        format (str): base64 (預設，float32) / binary (application/octet-stream) / json
+    """
+    body = request.get_json(silent=True) or {}
+    fmt = request.args.get('format', body.get('format', 'base64'))
+    try:
+        center = float(body.get('centerPrice', 23000))
+        price_range = float(body.get('priceRange', 2000))
+        step = float(body.get('step', payoff.PRICE_STEP))
+        days_to_expiry = float(body.get('daysToExpiry', 30))
+        day_step = float(body.get('dayStep', 1))
+        vol_shifts = [float(v) for v in body.get('volShifts', scenario.DEFAULT_VOL_SHIFTS)]
+        vol = float(body.get('vol', 0.2))
+        rate = float(body.get('rate', 0.015))
+        etf_lots = float(body.get('etfLots', 0) or 0)
+        etf_cost = float(body.get('etfCost', 0) or 0)
+        etf_current = float(body.get('etfCurrent', 0) or 0)
+        reference_index = float(body['referenceIndex']) if body.get('referenceIndex') else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "參數格式錯誤"}), 400
+
+    if fmt not in ('base64', 'binary', 'json'):
+        return jsonify({"error": "format 必須為 base64 / binary / json"}), 400
+    if step <= 0 or day_step <= 0 or price_range < 0 or days_to_expiry < 0 or not vol_shifts:
+        return jsonify({"error": "step、dayStep 必須大於 0，priceRange、daysToExpiry 不可為負，volShifts 不可為空"}), 400
+
+    positions = body.get('positions') or []
+    if not isinstance(positions, list) or len(positions) > SCENARIO_MAX_POSITIONS:
+        return jsonify({"error": f"positions 必須為倉位清單，且不可超過 {SCENARIO_MAX_POSITIONS} 筆"}), 400
+
+    prices = payoff.price_grid(center, price_range, step)
+    days = scenario.day_axis(days_to_expiry, day_step)
+    if len(prices) * len(days) * len(vol_shifts) > SCENARIO_MAX_CELLS:
+        return jsonify({"error": f"網格格數超過上限 {SCENARIO_MAX_CELLS}"}), 400
+
+    cube = scenario.scenario_grid(
+        prices, days, vol_shifts, positions, etf_lots, etf_cost, etf_current,
+        reference_index=reference_index or center, days_to_expiry=days_to_expiry, vol=vol, rate=rate
+    )
+    encoded = scenario.encode(prices, days, np.asarray(vol_shifts), cube, fmt)
+    if fmt == 'binary':
+        return Response(encoded, mimetype='application/octet-stream', headers={
+            'X-Scenario-Shape': ','.join(str(n) for n in cube.shape),
+            'X-Scenario-Layout': 'prices,days,volShifts,pnl;float32-le'
+        })
+    return jsonify(encoded)
+
+
+def _resolve_position(pos: dict) -> tuple:
+    """倉位對應的 (選擇權代號, 結算時間)；期貨與微台選擇權不追蹤報價"""
+    contract = pos.get('contract') or 'current_month'
+    expiry = pricing.expiry_datetime(mock_provider.contract_expiry_code(contract))
+    if pos.get('type') not in ('Call', 'Put') or pos.get('product', '台指') != '台指':
+        return None, expiry
+    symbol = mock_provider.calendar.symbol(
+        mock_provider.contract_series(contract), int(payoff.num(pos.get('strike'))), pos['type']
+    )
+    return symbol, expiry
+
+
+@app.route('/api/portfolio/risk', methods=['GET', 'POST'])
+def portfolio_risk():
+    """
+    伺服器端投資組合風險 (淨 Delta / Gamma / Vega / Theta 與避險比例，新台幣計)
+
+    POST 建立或取代投資組合，JSON Body:
+        id (str): 要取代的組合代號 (省略則建立新組合；代號由伺服器產生，不存在時回 404)
+        currentIndex (float): 目前指數
+        etfLots / etfCost / etfCurrent: 00631L 張數、成本、現價 (對應 currentIndex)
+        positions (list): 倉位 (格式同前端，可另帶 contract、markPrice)
+        vol / rate: 無市價時的波動率 (預設 0.2)、無風險利率 (預設 0.015)
+    GET 參數: id、detail (1 時附上各倉位貢獻)
+    富邦串流模式下，持有合約的報價跳動會自動遞增更新，不需重新上傳
+    組合只保存在處理請求的行程中，需以單一 worker 部署 (見 render.yaml)
+    """
+    if request.method == 'GET':
+        portfolio = portfolio_store.get(request.args.get('id', ''))
+        if portfolio is None:
+            return jsonify({"error": "找不到投資組合"}), 404
+        return jsonify(portfolio.risk(detail=request.args.get('detail') == '1'))
+
+    body = request.get_json(silent=True) or {}
+    try:
+        index = float(body.get('currentIndex') or 0)
+        etf_lots = float(body.get('etfLots', 0) or 0)
+        etf_cost = float(body.get('etfCost', 0) or 0)
+        etf_current = float(body.get('etfCurrent', 0) or 0)
+        vol = float(body.get('vol', 0.2))
+        rate = float(body.get('rate', 0.015))
+    except (TypeError, ValueError):
+        return jsonify({"error": "參數格式錯誤"}), 400
+    if index <= 0:
+        return jsonify({"error": "請提供 currentIndex"}), 400
+    portfolio_id = str(body.get('id') or '')
+    if portfolio_id and portfolio_store.get(portfolio_id) is None:
+        return jsonify({"error": "找不到投資組合"}), 404
+
+    portfolio = Portfolio(
+        portfolio_id or portfolio_store.new_id(), body.get('positions') or [], _resolve_position,
+        etf_lots=etf_lots, etf_cost=etf_cost, etf_current=etf_current, index=index, vol=vol, rate=rate
+    )
+    portfolio_store.put(portfolio)
+    if fubon_provider and fubon_provider.stream:
+        fubon_provider.stream.subscribe(list(portfolio.by_symbol))
+    return jsonify(portfolio.risk(detail=bool(body.get('detail'))))
+
+
+@app.route('/api/portfolio/quote', methods=['POST'])
+def portfolio_quote():
+    """
+    手動推送報價 (非串流資料來源或測試用)，只重新評價持有該合約的倉位
+
+    JSON Body:
+        ticks (list): [{symbol, price}]
+        id (str) + currentIndex (float): 更新單一組合的指數 (整體重新評價)
+    """
+    body = request.get_json(silent=True) or {}
+    repriced = 0
+    try:
+        for tick in body.get('ticks') or []:
+            repriced += portfolio_store.on_quote(str(tick['symbol']), {'lastPrice': float(tick['price'])})
+        if body.get('currentIndex'):
+            portfolio = portfolio_store.get(str(body.get('id', '')))
+            if portfolio is None:
+                return jsonify({"error": "找不到投資組合"}), 404
+            portfolio.set_index(float(body['currentIndex']))
+            repriced += len(portfolio.positions)
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"error": "參數格式錯誤"}), 400
+    return jsonify({"repriced": repriced, "portfolios": len(portfolio_store)})
+
+
+@app.route('/api/simulate', methods=['POST'])
+def simulate():
+    """
+    蒙地卡羅避險結果模擬 (路徑相依，00631L 每日再平衡)
+
+    JSON Body:
+        currentIndex (float): 目前指數
+        days (int): 模擬交易日數；未提供時由 contract 的結算日推算
+        contract (str): 合約 (同 /api/option-chain，預設當月)
+        vol (float): 指數年化波動率 (預設 0.2)
+        drift (float): 指數年化漂移 (預設 0)
+        fee (float): 00631L 年化費用率 (預設 0)
+        paths (int): 路徑數 (預設 100000，上限 MC_MAX_PATHS)
+        seed (int): 亂數種子 (可重現結果)
+        etfLots / etfCost / etfCurrent / positions: 同 /api/pnl-curve
+    """
+    body = request.get_json(silent=True) or {}
+    try:
+        index = float(body.get('currentIndex') or 0)
+        vol = float(body.get('vol', 0.2))
+        drift = float(body.get('drift', 0) or 0)
+        fee = float(body.get('fee', 0) or 0)
+        paths = int(body.get('paths', 100000))
+        seed = int(body['seed']) if body.get('seed') is not None else None
+        etf_lots = float(body.get('etfLots', 0) or 0)
+        etf_cost = float(body.get('etfCost', 0) or 0)
+        etf_current = float(body.get('etfCurrent', 0) or 0)
+        days = int(body['days']) if body.get('days') else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "參數格式錯誤"}), 400
+
+    if index <= 0 or vol <= 0:
+        return jsonify({"error": "currentIndex 與 vol 必須大於 0"}), 400
+    if not 0 < paths <= MC_MAX_PATHS:
+        return jsonify({"error": f"paths 必須介於 1 與 {MC_MAX_PATHS}"}), 400
+
+    if days is None:
+        expiry = mock_provider.contract_expiry_code(body.get('contract'))
+        calendar_days = float(pricing.years_to_expiry([expiry])[0]) * pricing.DAYS_PER_YEAR
+        days = round(calendar_days * monte_carlo.TRADING_DAYS / pricing.DAYS_PER_YEAR)
+    days = max(1, days)
+
+    start = time.time()
+    result = monte_carlo.run(
+        index, days, vol, etf_lots, etf_cost, etf_current, body.get('positions') or [],
+        paths=paths, drift=drift, fee=fee, seed=seed
+    )
+    result.update(days=days, vol=vol, elapsed=round(time.time() - start, 3))
+    return jsonify(result)
+
+
+@app.route('/api/backtest', methods=['POST'])
+def run_backtest():
+    """
+    以封存的期交所歷史行情回測 00631L + 賣權避險
+
+    JSON Body:
+        start / end (str): 交易日區間 YYYYMMDD (含)
+        etfLots (float): 00631L 張數 (預設 1)
+        etfPrice (float): 期初 00631L 價格 (預設 100)
+        hedgeRatios (list): 避險比例 (口數 = round(etfLots × 比例)，預設 [0, 0.5, 1])
+        strikeOffsets (list): 履約價相對指數的偏移 (預設 [-0.05])
+        rollRules (list): 換倉規則 weekly / monthly / next_month (預設 ["monthly"])
+        strikeStep (int): 履約價間距 (預設 100)
+        fee (float): 00631L 年化費用率 (預設 0)
+        curves (bool): 是否回傳每日淨值曲線與換倉紀錄
+    """
+    archive = TaifexDataProvider.archive
+    if archive is None:
+        return jsonify({"error": "未啟用歷史行情封存"}), 400
+
+    body = request.get_json(silent=True) or {}
+    try:
+        ratios = [float(x) for x in body.get('hedgeRatios') or (0.0, 0.5, 1.0)]
+        offsets = [float(x) for x in body.get('strikeOffsets') or (-0.05,)]
+        rules = [str(x) for x in body.get('rollRules') or ('monthly',)]
+        etf_lots = float(body.get('etfLots', 1) or 0)
+        etf_price = float(body.get('etfPrice', 100) or 0)
+        strike_step = int(body.get('strikeStep', payoff.PRICE_STEP) or payoff.PRICE_STEP)
+        fee = float(body.get('fee', 0) or 0)
+    except (TypeError, ValueError):
+        return jsonify({"error": "參數格式錯誤"}), 400
+
+    if etf_lots <= 0 or etf_price <= 0 or strike_step <= 0:
+        return jsonify({"error": "etfLots、etfPrice 與 strikeStep 必須大於 0"}), 400
+    if any(rule not in backtest.ROLL_RULES for rule in rules):
+        return jsonify({"error": f"rollRules 只支援 {', '.join(backtest.ROLL_RULES)}"}), 400
+    if len(ratios) * len(offsets) * len(rules) > BACKTEST_MAX_COMBOS:
+        return jsonify({"error": f"參數組合數不可超過 {BACKTEST_MAX_COMBOS}"}), 400
+
+    start = time.time()
+    try:
+        result = backtest.run(
+            archive, body.get('start'), body.get('end'), etf_lots=etf_lots, etf_price=etf_price,
+            hedge_ratios=ratios, strike_offsets=offsets, roll_rules=rules, strike_step=strike_step,
+            fee=fee, curves=bool(body.get('curves'))
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    result['elapsed'] = round(time.time() - start, 3)
+    return jsonify(result)
+
 
 @app.route('/api/sources', methods=['GET'])
 def get_available_sources():
-    """取得可用的資料來源列表"""
+    """取得可用的資料來源列表 (只讀取健康狀態，不會觸發上游下載)"""
+    return jsonify(sources_payload())
+
+
+def sources_payload() -> dict:
+    taifex_available = taifex_provider.is_available()
+    yahoo_available = yahoo_provider.is_available()
+    fubon_available = fubon_provider is not None and fubon_provider.is_logged_in
+
     sources = ['mock']  # mock 永遠可用
-    
-    # 檢查期交所
-    if taifex_provider.is_available():
+    if taifex_available:
         sources.insert(0, 'taifex')
-    
-    # 檢查富邦
-    if fubon_provider and fubon_provider.is_logged_in:
+    if fubon_available:
         sources.append('fubon')
-    
-    # 檢查 Yahoo
-    if yahoo_provider.is_available():
+    if yahoo_available:
         sources.append('yahoo')
-    
-    return jsonify({
+
+    return {
         "sources": sources,
         "default": sources[0] if sources else 'mock',
-        "fubon_available": fubon_provider is not None and fubon_provider.is_logged_in,
-        "taifex_available": taifex_provider.is_available(),
-        "yahoo_available": yahoo_provider.is_available()
-    })
+        "fubon_available": fubon_available,
+        "taifex_available": taifex_available,
+        "yahoo_available": yahoo_available,
+        "providers": provider_health.snapshot(),
+        "chain_formats": chain_format.available_formats()   # /api/option-chain 可用的 format
+    }
 
 
 @app.route('/api/taifex-debug', methods=['GET'])
@@ -1033,12 +1854,14 @@ def taifex_debug():
         'User-Agent': 'Mozilla/5.0'
     }
     try:
-        resp = requests.get(url, headers=headers, timeout=10)
+        # 共用連線池，但不受退避期限限制 (除錯時需要實際發出請求)
+        resp = upstream_http.get_client().get(url, headers=headers, timeout=10, honor_backoff=False)
         snippet = resp.text[:4000]
         return jsonify({
             'status_code': resp.status_code,
             'text_snippet': snippet,
-            'headers': {k: v for k, v in resp.headers.items()}
+            'headers': {k: v for k, v in resp.headers.items()},
+            'backoff': upstream_http.get_client().status()
         })
     except Exception as e:
         logger.error(f"❌ Taifex debug request failed: {e}")
@@ -1053,17 +1876,57 @@ def taifex_cache():
         return jsonify({'available': False, 'message': 'no cache'}), 200
 
     data = cache.get('data')
-    keys = list(data.keys())[:20]
-    sample = {k: data[k] for k in keys}
+    sample = [data.item(row) for row in range(min(20, len(data)))]
     return jsonify({
         'available': True,
         'cached_count': len(data),
+        'source': cache.get('source'),
+        'expiries': data.expiries,
         'timestamp': cache.get('timestamp').isoformat() if cache.get('timestamp') else None,
-        'sample_keys': keys,
         'sample': sample
     })
 
 
+@app.route('/api/taifex-history', methods=['GET'])
+def taifex_history():
+    """
+    查詢封存的期交所歷史行情 (欄式回應)
+
+    Parameters:
+        start / end (str): 交易日區間 YYYYMMDD (含)
+        expiry (str): 到期代碼 (例如 202610、202610W4)
+        strike (int): 履約價
+        type (str): call / put
+        limit (int): 最多回傳筆數 (預設 5000，上限 HISTORY_MAX_ROWS)
+    """
+    archive = TaifexDataProvider.archive
+    if archive is None:
+        return jsonify({"error": "未啟用歷史行情封存"}), 400
+
+    option_type = request.args.get('type', default=None, type=str)
+    if option_type and option_type.lower() not in ('call', 'put'):
+        return jsonify({"error": "type 必須是 call 或 put"}), 400
+    limit = request.args.get('limit', default=5000, type=int)
+    if not 0 < limit <= HISTORY_MAX_ROWS:
+        return jsonify({"error": f"limit 必須介於 1 與 {HISTORY_MAX_ROWS}"}), 400
+
+    result = archive.query(
+        start=request.args.get('start'),
+        end=request.args.get('end'),
+        expiry=request.args.get('expiry'),
+        strike=request.args.get('strike', default=None, type=int),
+        call_put=option_type[0].upper() if option_type else None
+    )
+    count = len(result['strike'])
+    payload = {'expiry': result.pop('expiry')[:limit], 'is_call': result.pop('is_call')[:limit].astype(bool).tolist()}
+    for name, values in result.items():
+        values = values[:limit]
+        # 價格欄位以 float32 儲存，輸出時還原為兩位小數
+        payload[name] = np.round(values.astype(float), 2).tolist() if values.dtype.kind == 'f' else values.tolist()
+    payload.update(count=count, truncated=count > limit, dates=archive.dates(request.args.get('start'), request.args.get('end')))
+    return jsonify(payload)
+
+
 @app.route('/api/fubon-debug', methods=['GET'])
 def fubon_debug():
     """回傳富邦 Provider 的狀態與相關環境變數（敏感資訊會遮蔽）。"""
@@ -1077,19 +1940,23 @@ def fubon_debug():
         'env': env,
         'fubon_provider_exists': fubon_provider is not None,
         'fubon_logged_in': getattr(fubon_provider, 'is_logged_in', False) if fubon_provider else False,
-        'fubon_login_error': getattr(fubon_provider, 'login_error_message', None) if fubon_provider else None
+        'fubon_login_error': getattr(fubon_provider, 'login_error_message', None) if fubon_provider else None,
+        'fubon_streaming': bool(fubon_provider and fubon_provider.stream),
+        'fubon_stream_symbols': len(fubon_provider.stream.subscribed) if fubon_provider and fubon_provider.stream else 0
     }
 
     return jsonify(info)
 
-# 應用程式啟動時初始化
-with app.app_context():
-    # 嘗試初始化富邦 API (可選)
-    init_fubon_provider()
-    
-    # 預先載入期交所資料
-    logger.info("🚀 正在預載期交所資料...")
-    taifex_provider._fetch_data()
+# 應用程式啟動時初始化 (蒙地卡羅 process pool 的子行程重新載入主模組時略過)
+if multiprocessing.parent_process() is None:
+    with app.app_context():
+        # 嘗試初始化富邦 API (可選)
+        init_fubon_provider()
+
+        # 預先載入期交所資料 (啟動時同步載入一次，之後由背景排程更新)
+        logger.info("🚀 正在預載期交所資料...")
+        taifex_provider.refresh()
+        refresh_scheduler.start()
 
 if __name__ == '__main__':
     # 嘗試綁定 PORT（如果被占用則自動嘗試下一個埠），避免需要手動 kill
@@ -0,0 +1,329 @@
+"""
+選擇權報價 API 的 ASGI (asyncio) 服務模式
+提供與 Flask 版相同的 /api/option-chain、/api/option-price、/api/health、/api/sources 與
+/api/stream/chain (SSE 推播，每條連線只是一個 coroutine，不佔用執行緒)，
+資料提供者、健康狀態與背景更新排程皆與 app.py 共用 (匯入 app 時完成初始化)
+
+快照型資料來源 (期交所、Yahoo、mock) 與富邦串流模式的查詢只讀取記憶體，直接在事件迴圈中完成
+(選擇資料來源與比對 SQLite 共用快照則在執行緒池中進行)；
+富邦 REST 模式會阻塞在上游，交給執行緒池並把同一條鏈的並行請求合併成一次查詢，
+上游變慢時只佔用一個執行緒，單一行程可同時掛著數千個等待中的請求
+
+啟動方式 (Flask 入口 app.py 仍可照常使用):
+    uvicorn asgi_app:application --app-dir api --host 0.0.0.0 --port 5000
+"""
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+import app as api
+import chain_format
+from response_cache import CachedResponse, etag_matches
+
+logger = logging.getLogger(__name__)
+
+try:
+    BLOCKING_WORKERS = int(os.getenv('ASGI_BLOCKING_WORKERS', '32'))
+except Exception:
+    BLOCKING_WORKERS = 32
+
+SSE_KEEPALIVE = 15   # 推播無更新時送出 keepalive 的間隔 (秒)
+
+CORS_HEADERS = [
+    (b'access-control-allow-origin', b'*'),
+    (b'access-control-allow-methods', b'GET, OPTIONS'),
+    (b'access-control-allow-headers', b'Content-Type'),
+]
+
+
+class AsyncSingleFlight:
+    """同一 key 的並行 coroutine 共用同一次執行結果 (asyncio 版 SingleFlight)"""
+
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key, fn):
+        future = self._calls.get(key)
+        if future is None:
+            future = asyncio.ensure_future(fn())
+            self._calls[key] = future
+            future.add_done_callback(lambda _: self._calls.pop(key, None))
+        # 個別請求被取消 (用戶端斷線) 時不影響其他等待同一結果的請求
+        return await asyncio.shield(future)
+
+
+class AsyncProvider:
+    """以 asyncio 介面包裝 DataProvider"""
+
+    def __init__(self, provider: api.DataProvider, executor: ThreadPoolExecutor, flight: AsyncSingleFlight):
+        self.provider = provider
+        self._executor = executor
+        self._flight = flight
+
+    async def _call(self, key: tuple, fn, *args):
+        if not self.provider.blocking_io:
+            return fn(*args)
+        loop = asyncio.get_running_loop()
+        return await self._flight.do(
+            (id(self.provider),) + key,
+            lambda: loop.run_in_executor(self._executor, fn, *args)
+        )
+
+    async def get_option_chain(self, strikes: list, contract: str = None) -> dict:
+        return await self._call(('chain', tuple(strikes), contract), self.provider.get_option_chain, strikes, contract)
+
+    async def get_option_price(self, strike: int, option_type: str, contract: str = None) -> dict:
+        return await self._call(('price', strike, option_type.lower(), contract),
+                                self.provider.get_option_price, strike, option_type, contract)
+
+    async def get_tx_price(self) -> float:
+        return await self._call(('tx',), api.provider_tx_price, self.provider)
+
+
+_executor = ThreadPoolExecutor(max_workers=BLOCKING_WORKERS, thread_name_prefix='asgi-upstream')
+_flight = AsyncSingleFlight()
+
+
+def _select_provider(source: str, center: int = None) -> api.DataProvider:
+    """選擇資料提供者並先比對共用快照 (SQLite 查詢與採用新快照會阻塞，在執行緒池中執行)"""
+    provider = api.get_provider(source, center)
+    provider.sync_shared()
+    return provider
+
+
+async def async_provider(source: str, center: int = None) -> AsyncProvider:
+    loop = asyncio.get_running_loop()
+    provider = await loop.run_in_executor(_executor, _select_provider, source, center)
+    return AsyncProvider(provider, _executor, _flight)
+
+
+# ============ 請求處理 ============
+
+def _arg(query: dict, name: str, default=None, type=str):
+    """與 Flask request.args.get(name, default, type) 相同：缺少或轉換失敗時回傳 default"""
+    values = query.get(name)
+    if not values:
+        return default
+    try:
+        return type(values[0])
+    except (TypeError, ValueError):
+        return default
+
+
+async def _cached(key, build, encode=None, content_type: str = 'application/json', content_encoding: str = None):
+    """
+    與 Flask 版共用回應快取；未命中時同一 key 的並行請求只建立一次
+    key 為 None 且未指定 encode 時直接回傳回應內容 (不快取)
+    """
+    if key is None and encode is None:
+        return await build()
+    entry = api.response_cache.peek(key)
+    if entry is not None:
+        return entry
+
+    async def fill():
+        body = (encode or api.encode_json)(await build())
+        return api.response_cache.put(key, body, content_type, content_encoding)
+    if key is None:
+        return await fill()
+    return await _flight.do(('response',) + key, fill)
+
+
+async def option_chain(query: dict, headers: dict):
+    source = _arg(query, 'source', 'taifex')
+    center = _arg(query, 'center', 23000, int)
+    price_range = _arg(query, 'range', 10, int)
+    step = _arg(query, 'step', 100, int)
+    contract = _arg(query, 'contract')
+    try:
+        fmt = chain_format.negotiate(_arg(query, 'format'), headers.get('accept'))
+    except ValueError as e:
+        return 400, {"error": str(e)}
+
+    strikes = api.chain_strikes(center, price_range, step)
+    provider = await async_provider(source, center)
+
+    async def build():
+        quotes, index_price = await asyncio.gather(provider.get_option_chain(strikes, contract),
+                                                   provider.get_tx_price())
+        return api.assemble_option_chain(provider.provider, source, center, price_range, step, strikes,
+                                         quotes, index_price, contract)
+    key = api.response_cache_key(provider.provider, 'chain', source, center, price_range, step, contract=contract)
+    if fmt == 'json':
+        return 200, await _cached(key, build)
+    encoding = chain_format.accept_encoding(headers.get('accept-encoding'))
+    if key is not None:
+        key += (fmt, encoding)
+    return 200, await _cached(key, build, lambda payload: chain_format.encode(payload, fmt, encoding),
+                              chain_format.CONTENT_TYPES[fmt], encoding)
+
+
+async def option_price(query: dict, headers: dict):
+    strike = _arg(query, 'strike', None, int)
+    option_type = _arg(query, 'type', 'call')
+    error = api.validate_option_price_params(strike, option_type)
+    if error:
+        return 400, {"error": error}
+
+    source = _arg(query, 'source', 'taifex')
+    center = _arg(query, 'center', None, int)
+    provider = await async_provider(source, center)
+
+    async def build():
+        result = await provider.get_option_price(strike, option_type)
+        # 如果主要來源無資料，降級到 mock
+        if result is None:
+            result = api.mock_provider.get_option_price(strike, option_type)
+        return result
+    key = api.response_cache_key(provider.provider, 'price', source, strike, option_type.lower(), center)
+    return 200, await _cached(key, build)
+
+
+async def health(query: dict, headers: dict):
+    return 200, api.health_payload()
+
+
+async def sources(query: dict, headers: dict):
+    return 200, api.sources_payload()
+
+
+async def _wait_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def stream_chain(query: dict, receive, send):
+    """
+    選擇權鏈 Server-Sent Events 推播 (與 Flask 版 /api/stream/chain 共用 ChainBroadcaster)
+    連線只是事件迴圈上的一個 coroutine，不佔用執行緒；推播執行緒有新訊息時喚醒對應的連線
+    """
+    key = (_arg(query, 'source', 'taifex'), _arg(query, 'center', 23000, int), _arg(query, 'range', 10, int),
+           _arg(query, 'step', 100, int), _arg(query, 'contract'))
+    loop = asyncio.get_running_loop()
+    wake = asyncio.Event()
+    # 第一個訂閱者會同步組第一次選擇權鏈，交給執行緒池
+    subscription = await loop.run_in_executor(
+        _executor, api.chain_broadcaster.subscribe, key, lambda: loop.call_soon_threadsafe(wake.set)
+    )
+    disconnected = asyncio.ensure_future(_wait_disconnect(receive))
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [(b'content-type', b'text/event-stream'), (b'cache-control', b'no-cache'),
+                        (b'x-accel-buffering', b'no')] + CORS_HEADERS,
+        })
+        await send({'type': 'http.response.body', 'body': b'retry: 5000\n\n', 'more_body': True})
+        while not disconnected.done():
+            # 先清除再取訊息，取完之後才推送的訊息會再次喚醒
+            wake.clear()
+            message = subscription.poll()
+            if message is None:
+                waiter = asyncio.ensure_future(wake.wait())
+                done, _ = await asyncio.wait((waiter, disconnected), timeout=SSE_KEEPALIVE,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                waiter.cancel()
+                if not done:
+                    # 無更新時送出註解行維持連線
+                    await send({'type': 'http.response.body', 'body': b': keepalive\n\n', 'more_body': True})
+                continue
+            await send({'type': 'http.response.body', 'body': message.encode('utf-8'), 'more_body': True})
+    except OSError:
+        pass
+    finally:
+        disconnected.cancel()
+        api.chain_broadcaster.unsubscribe(subscription)
+
+
+STREAM_ROUTES = {
+    '/api/stream/chain': stream_chain,
+}
+
+ROUTES = {
+    '/api/option-chain': option_chain,
+    '/api/option-price': option_price,
+    '/api/health': health,
+    '/api/sources': sources,
+}
+
+
+async def _send_json(send, status: int, payload, head: bool = False):
+    """回傳 JSON；HEAD 請求只送標頭 (content-length 仍為完整內容的長度)"""
+    body = api.encode_json(payload)
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'),
+                    (b'content-length', str(len(body)).encode())] + CORS_HEADERS,
+    })
+    await send({'type': 'http.response.body', 'body': b'' if head else body})
+
+
+async def _send_cached(send, request_headers: dict, entry: CachedResponse, head: bool = False):
+    """回傳快取的回應；If-None-Match 符合 ETag 時回 304，HEAD 請求只送標頭"""
+    not_modified = etag_matches(request_headers.get('if-none-match'), entry.etag)
+    headers = [(b'etag', entry.etag.encode()), (b'cache-control', b'no-cache'),
+               (b'vary', b'Accept, Accept-Encoding')] + CORS_HEADERS
+    if not not_modified:
+        headers += [(b'content-type', entry.content_type.encode()),
+                    (b'content-length', str(len(entry.body)).encode())]
+        if entry.content_encoding:
+            headers.append((b'content-encoding', entry.content_encoding.encode()))
+    await send({'type': 'http.response.start', 'status': 304 if not_modified else 200, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': b'' if not_modified or head else entry.body})
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            logger.info(f"🚀 ASGI 模式啟動 (阻塞查詢執行緒池 {BLOCKING_WORKERS})")
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            _executor.shutdown(wait=False, cancel_futures=True)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    """ASGI 進入點"""
+    if scope['type'] == 'lifespan':
+        return await _lifespan(receive, send)
+    if scope['type'] != 'http':
+        return
+
+    method = scope['method']
+    if method == 'OPTIONS':
+        await send({'type': 'http.response.start', 'status': 204, 'headers': CORS_HEADERS})
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+
+    path = scope['path'].rstrip('/') or '/'
+    if path in STREAM_ROUTES and method == 'GET':
+        query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+        return await STREAM_ROUTES[path](query, receive, send)
+
+    head = method == 'HEAD'
+    handler = ROUTES.get(path)
+    if handler is None:
+        return await _send_json(send, 404, {"error": "Not Found"}, head)
+    if method not in ('GET', 'HEAD'):
+        return await _send_json(send, 405, {"error": "Method Not Allowed"})
+
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    headers = {k.decode('latin-1').lower(): v.decode('latin-1') for k, v in scope.get('headers', ())}
+    try:
+        status, payload = await handler(query, headers)
+    except Exception as e:
+        logger.error(f"❌ ASGI 請求處理失敗 ({scope['path']}): {e}")
+        status, payload = 500, {"error": str(e)}
+    if isinstance(payload, CachedResponse):
+        return await _send_cached(send, headers, payload, head)
+    await _send_json(send, status, payload, head)
+
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(application, host='0.0.0.0', port=int(os.getenv('PORT', 5000)))
@@ -0,0 +1,227 @@
+"""
+避險策略歷史回測
+讀取 TaifexArchive 封存的每日行情 (與期交所 Provider 相同的欄式格式)，
+以買賣權平價還原每日指數，00631L 以 2 倍槓桿逐日複利追蹤；
+避險部位為賣權，每次結算時換倉到下一個序列，逐日以歷史結算價評價
+
+參數掃描：每組 (換倉規則, 履約價偏移) 只需一條「每口」避險淨值路徑 (分散到 process pool 計算)，
+避險比例只影響口數，以廣播一次算出所有比例的淨值曲線與績效指標
+"""
+from datetime import datetime
+
+import numpy as np
+
+import payoff
+import pricing
+import process_pool
+import vol_surface
+from taifex_archive import TaifexArchive
+
+TRADING_DAYS = 252
+# 換倉規則：(序列類型, 第幾近的序列)；到期序列結算當日換到下一個符合條件的序列
+ROLL_RULES = {
+    'weekly': ('wednesday', 0),     # 最近的週三結算序列 (週選或月選)
+    'monthly': ('monthly', 0),      # 近月
+    'next_month': ('monthly', 1),   # 次月 (持有至到期)
+}
+
+
+def _date(value: str):
+    return datetime.strptime(str(value), '%Y%m%d').date()
+
+
+def _expiry_date(code: str):
+    return pricing.expiry_datetime(code).date()
+
+
+def select_expiry(expiries: list, date: str, rule: str):
+    """依換倉規則從當日掛牌的到期序列中挑選要持有的序列 (只考慮結算日在當日之後者)"""
+    kind, rank = ROLL_RULES[rule]
+    today = _date(date)
+    candidates = []
+    for code in expiries:
+        if kind == 'monthly' and len(code) != 6:
+            continue
+        if kind == 'wednesday' and len(code) > 6 and code[6] != 'W':
+            continue
+        try:
+            settle = _expiry_date(code)
+        except ValueError:
+            continue
+        if settle > today:
+            candidates.append((settle, code))
+    candidates.sort()
+    return candidates[rank][1] if len(candidates) > rank else None
+
+
+def _day_sides(day, expiry: str) -> tuple:
+    """某到期序列當日的 (履約價, 買權結算價, 賣權結算價)，缺價為 NaN"""
+    rows = np.flatnonzero(day.mask(expiry))
+    strike = np.asarray(day.columns['strike'][rows])
+    settle = np.asarray(day.columns['settle'][rows], dtype=float)
+    is_call = np.asarray(day.columns['is_call'][rows]) == 1
+    strikes = np.unique(strike)
+    calls = np.full(len(strikes), np.nan)
+    puts = np.full(len(strikes), np.nan)
+    pos = np.searchsorted(strikes, strike)
+    valid = settle > 0
+    calls[pos[is_call & valid]] = settle[is_call & valid]
+    puts[pos[~is_call & valid]] = settle[~is_call & valid]
+    return strikes, calls, puts
+
+
+def market_series(archive: TaifexArchive, start: str = None, end: str = None) -> tuple:
+    """
+    回測期間的交易日與每日指數 (近月序列結算價的買賣權平價)
+    無法還原指數的交易日會被略過
+    """
+    dates, spots = [], []
+    for date in archive.dates(start, end):
+        day = archive.load(date)
+        expiry = select_expiry(day.expiries, date, 'monthly')
+        # 結算日當天近月已不在候選內，但仍掛牌，優先使用以貼近結算指數
+        today = [code for code in day.expiries if len(code) == 6 and _expiry_date(code) == _date(date)]
+        expiry = today[0] if today else expiry
+        if expiry is None:
+            continue
+        strikes, calls, puts = _day_sides(day, expiry)
+        if not len(strikes):
+            continue
+        spot = vol_surface.parity_spot(strikes.astype(float), calls[None, :], puts[None, :], np.zeros(1), 0.0)[0]
+        if np.isfinite(spot) and spot > 0:
+            dates.append(date)
+            spots.append(float(spot))
+    return dates, np.asarray(spots)
+
+
+def etf_curve(spot: np.ndarray, etf_price: float, leverage: float = payoff.LEVERAGE_00631L,
+              fee: float = 0.0) -> np.ndarray:
+    """00631L 每日再平衡淨值：每日報酬 = 槓桿 × 指數報酬 - 每日費用，單日最多歸零"""
+    daily = 1.0 + leverage * (spot[1:] / spot[:-1] - 1.0) - fee / TRADING_DAYS
+    return etf_price * np.concatenate([[1.0], np.cumprod(np.maximum(daily, 0.0))])
+
+
+def hedge_path(root: str, dates: list, spot: np.ndarray, rule: str, offset: float,
+               strike_step: int = payoff.PRICE_STEP) -> dict:
+    """
+    單一 (換倉規則, 履約價偏移) 的每口賣權避險淨值路徑 (在子行程執行)
+    履約價 = 指數 × (1 + offset) 取最接近的掛牌履約價；結算日以結算價平倉並同日換倉，
+    封存缺少結算日資料時以最後一筆結算價出場、於下一個交易日換倉；缺價日沿用前一日結算價
+    回傳 equity (每口累計損益，新台幣) 與累計支付的權利金
+    """
+    archive = TaifexArchive(root)
+    n = len(dates)
+    value = np.zeros(n)       # 持有合約的每口市值 (點)
+    flow = np.zeros(n)        # 每日權利金收支 (點)
+    rolls = []
+    i = 0
+    while i < n:
+        day = archive.load(dates[i])
+        expiry = select_expiry(day.expiries, dates[i], rule)
+        if expiry is None:
+            i += 1
+            continue
+        strikes, _, puts = _day_sides(day, expiry)
+        listed = strikes[np.isfinite(puts)]
+        if not listed.size:
+            i += 1
+            continue
+        target = round(spot[i] * (1 + offset) / strike_step) * strike_step
+        strike = int(listed[np.abs(listed - target).argmin()])
+
+        settle_date = _expiry_date(expiry).strftime('%Y%m%d')
+        j = int(np.searchsorted(dates, settle_date, side='right')) - 1
+        history = archive.query(dates[i], dates[j], expiry=expiry, strike=strike, call_put='P')
+        marks = np.full(j - i + 1, np.nan)
+        pos = np.searchsorted(dates[i:j + 1], history['date'].astype(str))
+        marks[pos] = history['settle'].astype(float)
+        # 缺價日沿用前一日結算價
+        filled = np.where(np.isfinite(marks), np.arange(len(marks)), 0)
+        np.maximum.accumulate(filled, out=filled)
+        marks = marks[filled]
+
+        value[i:j + 1] = marks
+        flow[i] -= marks[0]
+        rolled = dates[j] == settle_date
+        if rolled or j < n - 1:
+            flow[j] += marks[-1]
+            value[j] = 0.0
+        rolls.append({'date': dates[i], 'expiry': expiry, 'strike': strike, 'premium': float(marks[0])})
+        i = j if rolled else j + 1
+
+    equity = (np.cumsum(flow) + value) * payoff.OPTION_MULTIPLIER
+    premium = sum(r['premium'] for r in rolls) * payoff.OPTION_MULTIPLIER
+    return {'rule': rule, 'offset': offset, 'equity': equity, 'premium': premium, 'rolls': rolls}
+
+
+def performance(curves: np.ndarray) -> dict:
+    """淨值曲線 (..., 日數) 的績效指標，沿最後一軸向量化計算"""
+    start = curves[..., :1]
+    total = curves[..., -1] / start[..., 0] - 1.0
+    peak = np.maximum.accumulate(curves, axis=-1)
+    drawdown = (1.0 - curves / np.where(peak > 0, peak, 1.0)).max(axis=-1)
+    daily = np.diff(curves, axis=-1) / np.where(curves[..., :-1] > 0, curves[..., :-1], 1.0)
+    vol = daily.std(axis=-1) * np.sqrt(TRADING_DAYS) if daily.shape[-1] > 1 else np.zeros(total.shape)
+    return {'totalReturn': total, 'maxDrawdown': drawdown, 'volatility': vol}
+
+
+def run(archive: TaifexArchive, start: str = None, end: str = None, etf_lots: float = 1.0,
+        etf_price: float = 100.0, hedge_ratios=(0.0, 0.5, 1.0), strike_offsets=(-0.05,),
+        roll_rules=('monthly',), strike_step: int = payoff.PRICE_STEP, fee: float = 0.0,
+        curves: bool = False, parallel: bool = True) -> dict:
+    """
+    以封存行情回測 00631L + 賣權避險 (換倉規則 × 履約價偏移 × 避險比例 的所有組合)
+    避險口數 = round(etfLots × 避險比例)；淨值 = 00631L 市值 + 避險累計損益
+    """
+    dates, spot = market_series(archive, start, end)
+    if len(dates) < 2:
+        raise ValueError("回測期間的封存行情不足兩個交易日")
+    for rule in roll_rules:
+        if rule not in ROLL_RULES:
+            raise ValueError(f"不支援的換倉規則: {rule}")
+
+    etf_value = etf_curve(spot, etf_price, fee=fee) * etf_lots * payoff.ETF_SHARES_PER_LOT
+    combos = [(rule, float(offset)) for rule in roll_rules for offset in strike_offsets]
+    args = ([archive.root] * len(combos), [dates] * len(combos), [spot] * len(combos),
+            [c[0] for c in combos], [c[1] for c in combos], [strike_step] * len(combos))
+    if parallel and len(combos) > 1:
+        paths = list(process_pool.get_pool().map(hedge_path, *args))
+    else:
+        paths = list(map(hedge_path, *args))
+
+    # (組合, 避險比例, 日數) 一次廣播
+    lots = np.array([round(etf_lots * ratio) for ratio in hedge_ratios], dtype=float)
+    unit = np.stack([p['equity'] for p in paths])
+    equity = etf_value[None, None, :] + lots[None, :, None] * unit[:, None, :]
+    stats = performance(equity)
+    base = performance(etf_value[None, :])
+
+    results = []
+    for c, path in enumerate(paths):
+        for h, ratio in enumerate(hedge_ratios):
+            item = {
+                'rollRule': path['rule'],
+                'strikeOffset': path['offset'],
+                'hedgeRatio': float(ratio),
+                'lots': int(lots[h]),
+                'finalEquity': float(equity[c, h, -1]),
+                'premiumPaid': float(path['premium'] * lots[h]),
+                'rolls': len(path['rolls']),
+            }
+            item.update({name: float(values[c, h]) for name, values in stats.items()})
+            if curves:
+                item['equity'] = np.round(equity[c, h], 0).tolist()
+            results.append(item)
+    results.sort(key=lambda r: (r['maxDrawdown'], -r['totalReturn']))
+
+    return {
+        'dates': dates,
+        'index': np.round(spot, 2).tolist(),
+        'unhedged': dict(
+            {name: float(values[0]) for name, values in base.items()},
+            finalEquity=float(etf_value[-1]),
+            equity=np.round(etf_value, 0).tolist() if curves else None,
+        ),
+        'rolls': {f"{p['rule']}:{p['offset']}": p['rolls'] for p in paths} if curves else None,
+        'results': results,
+    }
@@ -0,0 +1,51 @@
+"""
+選擇權鏈回應格式比較
+以 mock 資料組出寬幅選擇權鏈，比較原本的巢狀 JSON (jsonify) 與欄式 JSON / MessagePack
+(未安裝時略過) 在不同壓縮方式下的回應大小與編碼耗時
+
+使用方式: python bench_chain_format.py [上下檔數 (預設 100)]
+"""
+import sys
+import time
+
+import app
+import chain_format
+
+
+def measure(fn, repeat: int = 20) -> tuple:
+    """回傳 (最佳耗時秒數, 結果)"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    price_range = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    payload = app.build_option_chain('mock', 23000, price_range, 50)
+    print(f"履約價 {len(payload['chain'])} 檔")
+
+    cases = [('巢狀 JSON', lambda: app.encode_json(payload))]
+    cases.append(('巢狀 JSON + gzip', lambda: chain_format.compress(app.encode_json(payload), 'gzip')))
+    for fmt in chain_format.available_formats():
+        if fmt == 'json':
+            continue
+        for encoding in (None, 'gzip', 'br'):
+            if encoding == 'br' and chain_format.brotli is None:
+                continue
+            label = fmt + (f' + {encoding}' if encoding else '')
+            cases.append((label, lambda fmt=fmt, encoding=encoding: chain_format.encode(payload, fmt, encoding)))
+
+    results = [(label,) + measure(fn) for label, fn in cases]
+
+    _, base_time, base = results[0]
+    print(f"{'':22}{'大小 (KB)':>12}{'編碼 (ms)':>12}{'縮小':>8}{'加速':>8}")
+    for label, elapsed, body in results:
+        print(f"{label:22}{len(body) / 1024:>12.1f}{elapsed * 1000:>12.2f}"
+              f"{len(base) / len(body):>7.1f}x{base_time / elapsed:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
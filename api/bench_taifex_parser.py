@@ -0,0 +1,190 @@
+"""
+期交所 DailyMarketReportOpt 解析效能比較
+以合成的整日行情 (數萬列，含 TXO 月選/週選與其他契約) 比較舊版逐欄解析 (只保留當月月選)
+與 taifex_parser (建立所有到期序列的索引) 的解析時間與記憶體峰值
+
+使用方式: python bench_taifex_parser.py [資料列數]
+"""
+import csv
+import io
+import json
+import random
+import sys
+import time
+import tracemalloc
+
+from taifex_parser import parse_daily_report
+
+CSV_HEADER = ['交易日期', '契約', '到期月份(週別)', '履約價', '買賣權', '開盤價', '最高價', '最低價',
+              '最後成交價', '結算價', '未沖銷契約數', '買價', '賣價', '交易時段']
+OTHER_CONTRACTS = ['TEO', 'TFO', 'CAO', 'CBO', 'CCO', 'DCO', 'GTO', 'XIO']
+
+
+def make_report(rows: int, target_month: str) -> str:
+    """產生合成的整日行情 CSV (約 1/4 為 TXO)"""
+    rnd = random.Random(0)
+    # 舊版會把週五週選 (F) 誤當成月選，為了比對結果一致，合成資料只含月選與週三週選
+    series = [target_month, f"{target_month}W1", f"{target_month}W2", f"{target_month}W4", f"{target_month}W5",
+              str(int(target_month) + 1)]
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(CSV_HEADER)
+    for i in range(rows):
+        j = i // 4
+        contract = 'TXO' if i % 4 == 0 else OTHER_CONTRACTS[i % len(OTHER_CONTRACTS)]
+        strike = 18000 + (j // (2 * len(series)) % 120) * 100
+        price = round(rnd.uniform(1, 800), 1)
+        writer.writerow([
+            '2026/10/16', contract, series[j % len(series)], strike, '買權' if j // len(series) % 2 else '賣權',
+            price, price, price, price if i % 3 else '-', price, rnd.randint(0, 5000),
+            round(price * 0.98, 1), round(price * 1.02, 1), '一般' if i % 5 else '盤後'
+        ])
+    return out.getvalue()
+
+
+def legacy_parse(text: str, target_month: str) -> dict:
+    """舊版 TaifexDataProvider._fetch_data 的解析流程 (逐欄查 header_map、每次查詢重建 lower_map)"""
+    data = None
+    sample_head = text.strip()[:200]
+    csv_indicators = ['履約價', '到期', 'Contract', 'StrikePrice', '履約價', '買賣權', 'CallPut']
+    if any(ind in sample_head for ind in csv_indicators):
+        header_map = {
+            '契約': 'Contract', 'Contract': 'Contract', '到期月份(週別)': 'ContractMonth', '到期月份': 'ContractMonth',
+            '履約價': 'StrikePrice', 'StrikePrice': 'StrikePrice', '買賣權': 'CallPut', 'CallPut': 'CallPut',
+            '最後成交價': 'Close', 'Close': 'Close', '結算價': 'SettlementPrice', 'SettlementPrice': 'SettlementPrice',
+            '買價': 'BestBid', 'BestBid': 'BestBid', '賣價': 'BestAsk', 'BestAsk': 'BestAsk'
+        }
+        rows = []
+        for r in csv.DictReader(io.StringIO(text)):
+            norm = {}
+            for k, v in r.items():
+                if v is None:
+                    continue
+                key = k.strip()
+                mapped = header_map.get(key, None)
+                val = v.strip()
+                if mapped:
+                    if mapped in ('StrikePrice', 'Close', 'SettlementPrice', 'BestBid', 'BestAsk'):
+                        try:
+                            norm[mapped] = float(val) if val not in ('', '-') else 0.0
+                        except Exception:
+                            try:
+                                norm[mapped] = float(val.replace(',', ''))
+                            except Exception:
+                                norm[mapped] = 0.0
+                    elif mapped == 'ContractMonth':
+                        norm[mapped] = val.replace(' ', '')
+                    elif mapped == 'CallPut':
+                        if val == '買權':
+                            norm[mapped] = 'Call'
+                        elif val == '賣權':
+                            norm[mapped] = 'Put'
+                        else:
+                            norm[mapped] = 'Call' if val.lower().startswith('c') else 'Put'
+                    else:
+                        norm[mapped] = val
+                else:
+                    norm[key] = val
+            rows.append(norm)
+        data = rows
+    if data is None:
+        data = json.loads(text)
+
+    def get_field(item, candidates):
+        for k in candidates:
+            if k in item and item[k] not in (None, ''):
+                return item[k]
+        lower_map = {kk.lower(): vv for kk, vv in item.items()}
+        for k in candidates:
+            if k.lower() in lower_map and lower_map[k.lower()] not in (None, ''):
+                return lower_map[k.lower()]
+        return None
+
+    txo_data = []
+    for item in data:
+        contract = get_field(item, ['Contract', 'contract', 'ContractName'])
+        if contract and str(contract).upper().startswith('TXO'):
+            txo_data.append(item)
+
+    result = {}
+    for item in txo_data:
+        contract_month = get_field(item, ['ContractMonth(Week)', 'ContractMonth', 'ContractMonthWeek', 'Contract Month']) or ''
+        s_month = str(contract_month).strip()
+        if not s_month.startswith(str(target_month)[:6]) or 'W' in s_month:
+            continue
+        strike_val = get_field(item, ['StrikePrice', 'Strike', 'StrikePrice '])
+        callput = get_field(item, ['CallPut', 'Call/Put', 'Type', 'BuySell'])
+        if not strike_val or not callput:
+            continue
+        strike_int = int(float(strike_val))
+        is_call = str(callput).strip().lower() in ('c', 'call', '買權', 'buy')
+        settlement = get_field(item, ['SettlementPrice', 'Settlement', 'Settle']) or '0'
+        close = get_field(item, ['Close', 'ClosingPrice']) or '0'
+        best_bid = get_field(item, ['BestBid', 'Bid']) or '0'
+        best_ask = get_field(item, ['BestAsk', 'Ask']) or '0'
+        bid = float(best_bid) if best_bid and best_bid != '-' else 0
+        ask = float(best_ask) if best_ask and best_ask != '-' else 0
+        close_p = float(close) if close and close != '-' else 0
+        settle_p = float(settlement) if settlement and settlement != '-' else 0
+        if close_p > 0:
+            price = close_p
+        elif bid > 0 and ask > 0:
+            price = (bid + ask) / 2
+        elif bid > 0:
+            price = bid
+        elif ask > 0:
+            price = ask
+        else:
+            price = settle_p
+        result[f"{strike_int}_{'C' if is_call else 'P'}"] = {
+            'strike': strike_int, 'type': 'Call' if is_call else 'Put',
+            'price': price, 'bid': bid, 'ask': ask, 'source': 'taifex'
+        }
+    return result
+
+
+def monthly_view(index, target_month: str) -> dict:
+    """由 ChainIndex 取出舊版格式的當月月選結果，用來比對新舊解析一致"""
+    result = {}
+    for row in range(len(index)):
+        item = index.item(row)
+        if item.pop('expiry') == target_month:
+            item.pop('settle')
+            result[f"{item['strike']}_{item['type'][0]}"] = item
+    return result
+
+
+def measure(fn, *args, repeat: int = 3):
+    """回傳 (最佳耗時秒數, 記憶體峰值 bytes, 結果)"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, result
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    target_month = '202610'
+    text = make_report(rows, target_month)
+    print(f"資料列數: {rows:,}  CSV 大小: {len(text.encode('utf-8')) / 1024:,.0f} KB")
+
+    old_t, old_peak, old_result = measure(legacy_parse, text, target_month)
+    new_t, new_peak, index = measure(parse_daily_report, text)
+    new_result = monthly_view(index, target_month)
+    assert old_result == new_result, "解析結果不一致"
+
+    print(f"{'':10}{'耗時 (ms)':>12}{'記憶體峰值 (MB)':>18}")
+    print(f"{'舊版':10}{old_t * 1000:>12.1f}{old_peak / 1e6:>18.2f}")
+    print(f"{'新版':10}{new_t * 1000:>12.1f}{new_peak / 1e6:>18.2f}")
+    print(f"加速 {old_t / new_t:.1f}x，記憶體峰值降低 {old_peak / new_peak:.1f}x，當月月選 {len(new_result)} 筆一致")
+    print(f"新版索引涵蓋 {len(index.expiries)} 個到期序列共 {len(index)} 筆: {index.expiries}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""
+Yahoo 期貨頁面解析效能比較
+以合成的期貨頁面 (大量 script / 版面元素 + 多個月份的選擇權報價表) 或存下來的 HTML 檔，
+比較舊版流程 (指數與選擇權鏈各建立一次 BeautifulSoup DOM) 與單次掃描解析的耗時與記憶體峰值
+
+另外逐一檢查 fixtures/yahoo_*.html (保存的頁面)，兩種解析結果必須一致
+
+使用方式:
+    python bench_yahoo_scraper.py [HTML 檔路徑 | 履約價數]
+    python bench_yahoo_scraper.py --save [輸出路徑]    # 下載目前的 Yahoo 期貨頁面並精簡後存為 fixture
+"""
+import glob
+import os
+import random
+import re
+import sys
+import time
+import tracemalloc
+
+from bs4 import BeautifulSoup
+
+import yahoo_scraper
+
+MONTH_CODES = ('2F6', '3F6', '4F6')
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+SCRIPT_KEEP = 2000   # 保存頁面時每段 script 保留的字元數
+_SCRIPT_BODY = re.compile(r'(<script\b[^>]*>)(.*?)(</script\s*>)', re.DOTALL | re.IGNORECASE)
+
+
+def make_page(strikes: int = 120) -> str:
+    """產生合成的 Yahoo 期貨頁面 (結構仿照 tw.stock.yahoo.com/future)"""
+    rnd = random.Random(0)
+    parts = ['<!DOCTYPE html><html lang="zh-Hant-TW"><head><meta charset="utf-8"><title>期貨 - Yahoo股市</title>']
+    # 頁面前段的大量 script 與樣式 (實際頁面約數百 KB)
+    for i in range(40):
+        parts.append(f'<script>window.__chunk{i}=' + '"' + 'x' * 4000 + '";</script>')
+    parts.append('</head><body><div id="app"><nav>')
+    for i in range(200):
+        parts.append(f'<a href="/quote/{2300 + i}.TW" class="Fz(14px) C($c-link-text)">個股 {i}</a>')
+    parts.append('</nav><ul class="futures-list">')
+    parts.append('<li><a href="https://tw.stock.yahoo.com/future/WTX%26" class="Fw(600)">台指期近一</a>'
+                 '<span>WTX&amp;</span><span class="Fw(600)">23,015.00</span><span>+125.00</span></li>')
+    parts.append('<li><a href="/quote/%5ETWII">加權指數</a><span>22,980.55</span></li></ul>')
+    base = 23000 - strikes // 2 * 100
+    for code in MONTH_CODES:
+        parts.append(f'<table class="option-table" data-month="{code}"><thead><tr><th>買權 Call</th>'
+                     '<th>履約價</th><th>賣權 Put</th></tr></thead><tbody>')
+        for k in range(strikes):
+            strike = base + k * 100
+            call = max(1.0, 23000 - strike + rnd.uniform(50, 300))
+            put = max(1.0, strike - 23000 + rnd.uniform(50, 300))
+            parts.append(
+                f'<tr class="Bdb(s) Bdc($bd-primary-divider)">'
+                f'<td><div class="D(f)"><span class="C($c-trend-up)">'
+                f'<a href="https://tw.stock.yahoo.com/future/WTX{code};{strike}C" class="Fz(16px)">{call:,.1f}</a>'
+                f'</span></div></td><td><span class="Fw(b)">{strike:,}</span></td>'
+                f'<td><div class="D(f)"><span class="C($c-trend-down)">'
+                f'<a href="https://tw.stock.yahoo.com/future/WTX{code};{strike}P" class="Fz(16px)">'
+                f'<span>{put:,.1f}</span></a></span></div></td></tr>'
+            )
+        parts.append('</tbody></table>')
+    parts.append('<footer>' + '<p>免責聲明</p>' * 200 + '</footer></div></body></html>')
+    return ''.join(parts)
+
+
+def legacy_scrape(html_content: str) -> tuple:
+    """舊版 scrape_yahoo_option_chain 的解析流程 (取指數時額外建立一次未使用的 DOM)"""
+    soup = BeautifulSoup(html_content, 'html.parser')
+    soup.find('a', href=re.compile(r'WTX%26')) or soup.find('a', href=re.compile(r'WTX&'))
+    match = re.search(r'WTX(?:&|&amp;).*?([\d,]+\.\d{2})', html_content, re.DOTALL)
+    index_price = float(match.group(1).replace(',', '')) if match else None
+    return index_price, yahoo_scraper.parse_option_chain(html_content)
+
+
+def fast_scrape(html_content: str) -> tuple:
+    return yahoo_scraper.get_yahoo_index_price(html_content), yahoo_scraper.parse_option_chain_fast(html_content)
+
+
+def measure(fn, *args, repeat: int = 3):
+    """回傳 (最佳耗時秒數, CPU 秒數, 記憶體峰值 bytes, 結果)"""
+    best, cpu = float('inf'), float('inf')
+    for _ in range(repeat):
+        start, start_cpu = time.perf_counter(), time.process_time()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+        cpu = min(cpu, time.process_time() - start_cpu)
+    tracemalloc.start()
+    fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, cpu, peak, result
+
+
+def trim_page(page: str) -> str:
+    """精簡下載的頁面：只截短過長的 script 內容，其餘標記原樣保留"""
+    return _SCRIPT_BODY.sub(
+        lambda m: m.group(1) + (m.group(2) if len(m.group(2)) <= SCRIPT_KEEP else m.group(2)[:SCRIPT_KEEP] + '/*…*/')
+        + m.group(3), page
+    )
+
+
+def save_fixture(path: str = None) -> str:
+    page = yahoo_scraper.fetch_yahoo_futures_page()
+    if not page:
+        raise SystemExit("無法下載 Yahoo 期貨頁面")
+    path = path or os.path.join(FIXTURE_DIR, f"yahoo_future_{time.strftime('%Y%m%d')}.html")
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(trim_page(page))
+    return path
+
+
+def check_fixtures(paths: list = None) -> int:
+    """保存的頁面上兩種解析結果必須一致 (不一致時拋出 AssertionError)"""
+    paths = paths or sorted(glob.glob(os.path.join(FIXTURE_DIR, 'yahoo_*.html')))
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            page = f.read()
+        legacy, fast = legacy_scrape(page), fast_scrape(page)
+        assert legacy == fast, f"{os.path.basename(path)}: 解析結果不一致\n舊版 {legacy}\n新版 {fast}"
+        print(f"✅ {os.path.basename(path)}: 指數 {fast[0]}、選擇權 {len(fast[1])} 筆一致")
+    return len(paths)
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--save':
+        path = save_fixture(sys.argv[2] if len(sys.argv) > 2 else None)
+        print(f"已保存 {path}")
+        check_fixtures([path])
+        return
+
+    check_fixtures()
+    arg = sys.argv[1] if len(sys.argv) > 1 else '120'
+    if os.path.isfile(arg):
+        with open(arg, encoding='utf-8') as f:
+            page = f.read()
+        print(f"HTML 檔: {arg}")
+    else:
+        page = make_page(int(arg))
+    print(f"頁面大小: {len(page.encode('utf-8')) / 1024:,.0f} KB")
+
+    old_t, old_cpu, old_peak, old_result = measure(legacy_scrape, page)
+    new_t, new_cpu, new_peak, new_result = measure(fast_scrape, page)
+    assert old_result == new_result, "解析結果不一致"
+
+    print(f"{'':10}{'耗時 (ms)':>12}{'CPU (ms)':>12}{'記憶體峰值 (MB)':>18}")
+    print(f"{'舊版':10}{old_t * 1000:>12.1f}{old_cpu * 1000:>12.1f}{old_peak / 1e6:>18.2f}")
+    print(f"{'新版':10}{new_t * 1000:>12.1f}{new_cpu * 1000:>12.1f}{new_peak / 1e6:>18.2f}")
+    print(f"加速 {old_t / new_t:.1f}x，記憶體峰值降低 {old_peak / max(new_peak, 1):.1f}x，"
+          f"指數 {new_result[0]}、選擇權 {len(new_result[1])} 筆一致")
+
+
+if __name__ == '__main__':
+    main()
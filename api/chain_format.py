@@ -0,0 +1,128 @@
+"""
+選擇權鏈回應格式
+預設為原本的巢狀 JSON (每個履約價的買權 / 賣權各自重複 strike、type、symbol... 等欄位)；
+可選的精簡格式改為欄式 (columnar)：履約價一個陣列，買權、賣權各欄位各一個平行陣列，
+以 ?format= 或 Accept 標頭協商，並依 Accept-Encoding 壓縮 (gzip，有安裝 brotli 時優先 br)
+
+欄式內容:
+    {"format": "columnar", "center_price": ..., "center": ..., "range": ..., "step": ..., "source": ...,
+     "timestamp": ..., "strikes": [...],
+     "call": {"symbol": [...], "price": [...], "bid": [...], "ask": [...], "source": [...]},
+     "put": {...}}
+可選的 MessagePack 編碼 (需安裝 msgpack) 內容與欄式 JSON 相同
+"""
+import gzip
+import json
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+SIDE_COLUMNS = ('symbol', 'price', 'bid', 'ask', 'source')
+
+CONTENT_TYPES = {
+    'json': 'application/json',
+    'columnar': 'application/vnd.option-chain.columnar+json',
+    'msgpack': 'application/msgpack',
+}
+# Accept 標頭中可辨識的媒體類型 -> 格式
+MEDIA_TYPES = {
+    'application/json': 'json',
+    'application/vnd.option-chain.columnar+json': 'columnar',
+    'application/msgpack': 'msgpack',
+    'application/x-msgpack': 'msgpack',
+    'application/vnd.msgpack': 'msgpack',
+}
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def available_formats() -> list:
+    return [fmt for fmt in CONTENT_TYPES if fmt != 'msgpack' or msgpack is not None]
+
+
+def _parse_qvalues(header: str) -> list:
+    """解析 Accept / Accept-Encoding 標頭為 [(值, q)]，依 q 由高到低 (同 q 保持原順序)"""
+    items = []
+    for order, part in enumerate((header or '').split(',')):
+        fields = [f.strip() for f in part.split(';')]
+        if not fields[0]:
+            continue
+        q = 1.0
+        for param in fields[1:]:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        items.append((fields[0].lower(), q, order))
+    items.sort(key=lambda item: (-item[1], item[2]))
+    return [(value, q) for value, q, _ in items]
+
+
+def negotiate(format_param: str = None, accept: str = None) -> str:
+    """
+    決定回應格式：?format= 優先 (不支援時拋出 ValueError)，其次依 Accept 選 q 最高且可用的格式，
+    都沒有指定時為巢狀 JSON
+    """
+    if format_param:
+        fmt = format_param.lower()
+        if fmt not in CONTENT_TYPES:
+            raise ValueError(f"format 必須是 {' / '.join(CONTENT_TYPES)} 其中之一")
+        if fmt == 'msgpack' and msgpack is None:
+            raise ValueError("伺服器未安裝 msgpack，請改用 format=columnar")
+        return fmt
+    available = available_formats()
+    for media_type, q in _parse_qvalues(accept):
+        fmt = MEDIA_TYPES.get(media_type)
+        if q > 0 and fmt in available:
+            return fmt
+    return 'json'
+
+
+def accept_encoding(header: str = None) -> str:
+    """依 Accept-Encoding 選擇壓縮方式 (br / gzip)，不壓縮時回傳 None"""
+    accepted = {value: q for value, q in _parse_qvalues(header)}
+    wildcard = accepted.get('*', 0)
+    if brotli is not None and accepted.get('br', wildcard) > 0:
+        return 'br'
+    if accepted.get('gzip', wildcard) > 0:
+        return 'gzip'
+    return None
+
+
+def to_columnar(payload: dict) -> dict:
+    """巢狀的選擇權鏈回應轉為欄式 (缺少的欄位為 null)"""
+    chain = payload['chain']
+    result = {'format': 'columnar'}
+    result.update((k, v) for k, v in payload.items() if k != 'chain')
+    result['strikes'] = [row['strike'] for row in chain]
+    for side in ('call', 'put'):
+        quotes = [row[side] or {} for row in chain]
+        result[side] = {column: [quote.get(column) for quote in quotes] for column in SIDE_COLUMNS}
+    return result
+
+
+def compress(body: bytes, encoding: str = None) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=GZIP_LEVEL)
+    return body
+
+
+def encode(payload: dict, fmt: str, encoding: str = None) -> bytes:
+    """將選擇權鏈回應編碼為欄式 JSON 或 MessagePack 並壓縮"""
+    columnar = to_columnar(payload)
+    if fmt == 'msgpack':
+        body = msgpack.packb(columnar, use_bin_type=True)
+    else:
+        body = json.dumps(columnar, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return compress(body, encoding)
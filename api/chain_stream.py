@@ -0,0 +1,190 @@
+"""
+選擇權鏈推播 (Server-Sent Events)
+同一組查詢參數的所有連線共用一個更新執行緒：每個週期只組一次選擇權鏈、只編碼一次訊息，
+再分送到各連線的佇列，連線數增加時伺服器負擔幾乎不變
+"""
+import json
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SIDES = ('call', 'put')
+DELTA_FIELDS = ('price', 'bid', 'ask')
+
+
+def encode_event(event: str, data: dict, event_id: int = None) -> str:
+    """編碼為 SSE 訊息格式"""
+    body = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+    head = f"id: {event_id}\n" if event_id is not None else ''
+    return f"{head}event: {event}\ndata: {body}\n\n"
+
+
+def diff_chain(old: dict, new: dict) -> list:
+    """比較兩次選擇權鏈，回傳有變動的 {strike, side, price, bid, ask} 清單"""
+    old_rows = {row['strike']: row for row in (old or {}).get('chain', [])}
+    changes = []
+    for row in new.get('chain', []):
+        prev = old_rows.get(row['strike']) or {}
+        for side in SIDES:
+            cur = row.get(side) or {}
+            before = prev.get(side) or {}
+            if any(cur.get(f) != before.get(f) for f in DELTA_FIELDS):
+                changes.append({
+                    'strike': row['strike'],
+                    'side': side,
+                    'price': cur.get('price'),
+                    'bid': cur.get('bid'),
+                    'ask': cur.get('ask')
+                })
+    return changes
+
+
+class ChainSubscription:
+    """
+    單一連線的訊息佇列
+    notify 為有新訊息時的回呼 (例如喚醒 asyncio 連線)，會在推播執行緒上呼叫
+    """
+
+    def __init__(self, topic, max_queue: int, notify=None):
+        self.topic = topic
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.notify = notify
+        self.synced = False     # 是否已送出 snapshot (之後才可送 delta)
+
+    def push(self, message: str):
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            # 連線太慢跟不上：丟棄積壓的 delta，改送最新 snapshot 重新同步
+            while True:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            self.queue.put_nowait(self.topic.snapshot_message)
+        if self.notify:
+            self.notify()
+
+    def next_message(self, timeout: float = None):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def poll(self):
+        """不等待地取出下一則訊息，沒有時回傳 None"""
+        try:
+            return self.queue.get_nowait()
+        except queue.Empty:
+            return None
+
+
+class _Topic:
+    def __init__(self, key):
+        self.key = key
+        self.payload = None
+        self.snapshot_message = None
+        self.seq = 0
+        self.subscribers = set()
+        # 更新 snapshot、推送訊息與加入新連線都在此鎖內進行，
+        # 新連線收到的 snapshot 一定不會比之後收到的 delta 舊
+        self.lock = threading.Lock()
+
+
+class ChainBroadcaster:
+    """
+    依查詢參數分組的選擇權鏈推播器
+
+    build_fn(*key) 回傳與 /api/option-chain 相同格式的 dict
+    """
+
+    def __init__(self, build_fn, interval: float = 5.0, max_queue: int = 64):
+        self.build_fn = build_fn
+        self.interval = interval
+        self.max_queue = max_queue
+        self._topics = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, key: tuple, notify=None) -> ChainSubscription:
+        """
+        加入推播；已有 snapshot 時立即送出，否則在第一次組鏈完成時送出
+        第一個訂閱者會同步組第一次選擇權鏈 (可能阻塞在上游)
+        """
+        with self._lock:
+            topic = self._topics.get(key)
+            created = topic is None
+            if created:
+                topic = _Topic(key)
+                self._topics[key] = topic
+            subscription = ChainSubscription(topic, self.max_queue, notify)
+            with topic.lock:
+                topic.subscribers.add(subscription)
+                if topic.snapshot_message:
+                    subscription.push(topic.snapshot_message)
+                    subscription.synced = True
+
+        if created:
+            self._publish(topic)
+            threading.Thread(
+                target=self._run, args=(topic,), daemon=True, name=f"chain-stream-{key}"
+            ).start()
+        return subscription
+
+    def unsubscribe(self, subscription: ChainSubscription):
+        with self._lock, subscription.topic.lock:
+            subscription.topic.subscribers.discard(subscription)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {str(key): len(t.subscribers) for key, t in self._topics.items()}
+
+    def _publish(self, topic: _Topic):
+        """
+        重新組選擇權鏈並推送：尚未同步的連線送 snapshot，其餘連線送 delta (有變動時)
+        組鏈在鎖外進行，更新 snapshot 與推送在同一個鎖內完成
+        """
+        try:
+            payload = self.build_fn(*topic.key)
+        except Exception as e:
+            logger.error(f"❌ 選擇權鏈推播更新失敗 {topic.key}: {e}")
+            return
+
+        with topic.lock:
+            delta = self._apply(topic, payload)
+            for subscription in list(topic.subscribers):
+                if not subscription.synced:
+                    subscription.push(topic.snapshot_message)
+                    subscription.synced = True
+                elif delta:
+                    subscription.push(delta)
+
+    def _apply(self, topic: _Topic, payload: dict):
+        """更新 topic 的 snapshot，回傳 delta 訊息 (第一次或無變動時回傳 None)"""
+        changes = diff_chain(topic.payload, payload)
+        center_changed = topic.payload is not None and topic.payload.get('center_price') != payload.get('center_price')
+        first = topic.payload is None
+
+        topic.seq += 1
+        topic.payload = payload
+        topic.snapshot_message = encode_event('snapshot', payload, topic.seq)
+
+        if first or not (changes or center_changed):
+            return None
+        return encode_event('delta', {
+            'center_price': payload.get('center_price'),
+            'source': payload.get('source'),
+            'timestamp': payload.get('timestamp'),
+            'changes': changes
+        }, topic.seq)
+
+    def _run(self, topic: _Topic):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not topic.subscribers:
+                    self._topics.pop(topic.key, None)
+                    return
+            self._publish(topic)
@@ -0,0 +1,250 @@
+"""
+台指選擇權到期日曆
+一次預先算出當年與次年所有序列 (月選 TXO、週三週選 TX1/TX2/TX4/TX5、週五週選 TXU~TXZ) 的結算時間，
+結算日遇休市則順延至次一營業日 (休市日讀取本地表 market_holidays.json)；
+合約代稱 (current_week 等) 的解析結果與各序列的選擇權代號表都會快取，
+直到下一個結算時間 (換倉) 才重新計算，報價迴圈中不再重複做日期運算
+"""
+import bisect
+import calendar
+import json
+import logging
+import os
+import threading
+from datetime import date, datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+SETTLE_HOUR, SETTLE_MINUTE = 13, 30   # 到期日 13:30 結算
+HOLIDAYS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'market_holidays.json')
+
+WEDNESDAY_ROOTS = {1: 'TX1', 2: 'TX2', 3: 'TXO', 4: 'TX4', 5: 'TX5'}   # 第三個週三為月選
+FRIDAY_ROOTS = {1: 'TXU', 2: 'TXV', 3: 'TXX', 4: 'TXY', 5: 'TXZ'}
+CALL_MONTH_CODES = "ABCDEFGHIJKL"   # 買權 Call (A-L)
+PUT_MONTH_CODES = "MNOPQRSTUVWX"    # 賣權 Put (M-X)
+
+# 合約代稱 -> (序列類型, 第幾近)
+CONTRACT_ALIASES = {
+    'current_week': ('wednesday', 0),
+    'next_week': ('wednesday', 1),
+    'current_fri': ('friday', 0),
+    'next_fri': ('friday', 1),
+    'current_month': ('monthly', 0),
+    'next_month': ('monthly', 1),
+}
+
+
+def nth_weekday(year: int, month: int, weekday: int, n: int):
+    """當月第 n 個星期 weekday (0=Mon) 的日期；超出當月回傳 None"""
+    first = date(year, month, 1).weekday()
+    day = 1 + (weekday - first + 7) % 7 + (n - 1) * 7
+    return day if day <= calendar.monthrange(year, month)[1] else None
+
+
+def load_holidays(path: str = None) -> set:
+    """讀取休市日表 (JSON：YYYYMMDD 字串清單，或 {"YYYY": [...]} 依年份分組)"""
+    path = path or os.getenv('MARKET_HOLIDAYS_FILE') or HOLIDAYS_FILE
+    try:
+        with open(path, encoding='utf-8') as f:
+            table = json.load(f)
+    except FileNotFoundError:
+        logger.warning(f"⚠️ 找不到休市日表 ({path})，結算日不做假日順延")
+        return set()
+    except (OSError, ValueError) as e:
+        logger.warning(f"⚠️ 無法讀取休市日表 ({path}): {e}")
+        return set()
+    if isinstance(table, dict):
+        table = [day for key, days in table.items() if not key.startswith('_') for day in days]
+    return {datetime.strptime(str(day).replace('-', ''), '%Y%m%d').date() for day in table}
+
+
+class Series:
+    """單一到期序列"""
+    __slots__ = ('code', 'root', 'year', 'month', 'kind', 'week', 'settle')
+
+    def __init__(self, code: str, root: str, year: int, month: int, kind: str, week: int, settle: datetime):
+        self.code = code          # 期交所到期代碼 YYYYMM / YYYYMMW{n} / YYYYMMF{n}
+        self.root = root          # 選擇權代號前綴
+        self.year = year
+        self.month = month
+        self.kind = kind          # monthly / weekly / friday
+        self.week = week
+        self.settle = settle      # 結算時間 (已含假日順延)
+
+    def __repr__(self):
+        return f"Series({self.code}, {self.root}, {self.settle:%Y-%m-%d %H:%M})"
+
+
+class ExpiryCalendar:
+    """到期序列表與代號快取"""
+
+    def __init__(self, holidays: set = None, clock=datetime.now):
+        self._holidays = None if holidays is None else set(holidays)
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._years = None
+        self._series = []          # 依結算時間排序
+        self._settles = []
+        self._by_code = {}
+        self._aliases = {}
+        self._valid_until = None   # 代稱解析結果有效到下一個結算時間
+        self._symbols = {}         # 到期代碼 -> {(履約價, C/P): 代號}
+
+    @property
+    def holidays(self) -> set:
+        """休市日 (未指定時第一次使用才讀取休市日表，此時 .env 已載入)"""
+        if self._holidays is None:
+            self._holidays = load_holidays()
+        return self._holidays
+
+    # ---------- 序列表 ----------
+
+    def _settle_date(self, day: date) -> date:
+        """結算日遇週末或休市日順延至次一營業日"""
+        while day.weekday() >= 5 or day in self.holidays:
+            day += timedelta(days=1)
+        return day
+
+    def _build_year(self, year: int) -> list:
+        series = []
+        for month in range(1, 13):
+            prefix = f"{year}{month:02d}"
+            for weekday, roots, kind in ((2, WEDNESDAY_ROOTS, 'weekly'), (4, FRIDAY_ROOTS, 'friday')):
+                for week, root in roots.items():
+                    day = nth_weekday(year, month, weekday, week)
+                    if day is None:
+                        continue
+                    if root == 'TXO':
+                        code, series_kind = prefix, 'monthly'
+                    else:
+                        code = f"{prefix}{'W' if weekday == 2 else 'F'}{week}"
+                        series_kind = kind
+                    settle = self._settle_date(date(year, month, day))
+                    series.append(Series(code, root, year, month, series_kind, week,
+                                         datetime(settle.year, settle.month, settle.day, SETTLE_HOUR, SETTLE_MINUTE)))
+        return series
+
+    def _ensure(self, now: datetime):
+        """依目前時間建立 (當年 + 次年) 序列表；跨過結算時間後清除代稱與代號快取"""
+        years = (now.year, now.year + 1)
+        if self._years != years:
+            series = sorted(self._build_year(years[0]) + self._build_year(years[1]), key=lambda s: (s.settle, s.code))
+            self._series = series
+            self._settles = [s.settle for s in series]
+            self._by_code = {s.code: s for s in series}
+            self._years = years
+            self._valid_until = None
+        if self._valid_until is None or now >= self._valid_until:
+            self._aliases = {}
+            start = bisect.bisect_right(self._settles, now)
+            self._valid_until = self._settles[start] if start < len(self._settles) else None
+            # 已結算序列的代號表不再需要
+            live = {s.code for s in self._series[start:]}
+            self._symbols = {code: table for code, table in self._symbols.items() if code in live}
+
+    def _table(self, now: datetime) -> tuple:
+        """
+        指定時間 (例如回測的歷史日期) 所需的 (序列表, 結算時間表)
+        與目前使用中的年份相同時直接讀取共用表，否則另外計算，不更動共用的序列表與快取
+        """
+        with self._lock:
+            if self._years == (now.year, now.year + 1):
+                return self._series, self._settles
+        series = sorted(self._build_year(now.year) + self._build_year(now.year + 1), key=lambda s: (s.settle, s.code))
+        return series, [s.settle for s in series]
+
+    def active(self, now: datetime = None) -> list:
+        """尚未結算的序列 (依結算時間排序)；指定 now 時不使用也不更新快取"""
+        if now is not None:
+            series, settles = self._table(now)
+            return series[bisect.bisect_right(settles, now):]
+        now = self.clock()
+        with self._lock:
+            self._ensure(now)
+            return self._series[bisect.bisect_right(self._settles, now):]
+
+    def series(self, code: str) -> Series:
+        """到期代碼對應的序列；不在預先建立的年份內時即時計算"""
+        with self._lock:
+            if self._years is None:
+                self._ensure(self.clock())
+            found = self._by_code.get(code)
+        if found is not None:
+            return found
+        try:
+            year, month = int(code[:4]), int(code[4:6])
+        except ValueError:
+            raise ValueError(f"無效的到期代碼: {code}")
+        for s in self._build_year(year):
+            if s.code == code and s.month == month:
+                return s
+        raise ValueError(f"無效的到期代碼: {code}")
+
+    def settlement(self, code: str) -> datetime:
+        return self.series(code).settle
+
+    # ---------- 合約代稱 ----------
+
+    def resolve(self, contract: str = None, now: datetime = None) -> Series:
+        """
+        合約代稱對應的序列 (未指定為 current_month)
+        結算時間過後 (13:30) 即換到下一個序列，不會在結算日當天仍指向已結算的合約
+        指定 now 時 (例如回測歷史日期) 另外計算，不使用也不更動共用的序列表與快取
+        """
+        contract = contract if contract in CONTRACT_ALIASES else 'current_month'
+        if now is not None:
+            return _pick(*self._table(now), now, contract)
+        now = self.clock()
+        with self._lock:
+            self._ensure(now)
+            found = self._aliases.get(contract)
+            if found is None:
+                found = self._aliases[contract] = _pick(self._series, self._settles, now, contract)
+            return found
+
+    # ---------- 選擇權代號 ----------
+
+    def symbols(self, series: Series, strikes, option_type: str = None) -> dict:
+        """
+        一組履約價的選擇權代號 {(strike, 'call'/'put'): symbol}
+        同一序列已產生過的代號直接取用快取
+        """
+        sides = ('call', 'put') if option_type is None else (_side(option_type),)
+        with self._lock:
+            table = self._symbols.setdefault(series.code, {})
+        year_digit = str(series.year)[-1]
+        result = {}
+        for strike in strikes:
+            for side in sides:
+                key = (strike, side)
+                symbol = table.get(key)
+                if symbol is None:
+                    codes = CALL_MONTH_CODES if side == 'call' else PUT_MONTH_CODES
+                    symbol = table[key] = f"{series.root}{strike}{codes[series.month - 1]}{year_digit}"
+                result[key] = symbol
+        return result
+
+    def symbol(self, series: Series, strike: int, option_type: str) -> str:
+        side = _side(option_type)
+        return self.symbols(series, (strike,), side)[(strike, side)]
+
+
+def _pick(series: list, settles: list, now: datetime, contract: str) -> Series:
+    """從依結算時間排序的序列表中找出合約代稱在 now 時對應的序列"""
+    kind, rank = CONTRACT_ALIASES[contract]
+    start = bisect.bisect_right(settles, now)
+    matches = (s for s in series[start:]
+               if (s.kind == kind) or (kind == 'wednesday' and s.kind in ('weekly', 'monthly')))
+    for _ in range(rank):
+        next(matches, None)
+    found = next(matches, None)
+    if found is None:
+        raise ValueError(f"無法解析合約: {contract}")
+    return found
+
+
+def _side(option_type: str) -> str:
+    return 'call' if option_type.lower() in ('call', 'c', 'buy') else 'put'
+
+
+default_calendar = ExpiryCalendar()
@@ -0,0 +1,117 @@
+"""
+蒙地卡羅避險結果模擬
+以幾何布朗運動產生指數每日路徑，沿路徑逐日以 2 倍槓桿複利追蹤 00631L (每日再平衡，含波動耗損)，
+到期時以 payoff 引擎評估選擇權/期貨避險部位，統計合併部位的 VaR / CVaR
+各路徑批次在 NumPy 中向量化，批次之間分散到 process pool 平行計算
+"""
+import numpy as np
+
+import payoff
+import process_pool
+
+TRADING_DAYS = 252
+CHUNK_PATHS = 50000          # 每個工作批次的路徑數 (限制每批暫存陣列大小)
+CONFIDENCE_LEVELS = (0.95, 0.99)
+HISTOGRAM_BINS = 50
+
+def simulate_paths(seed, paths: int, index: float, days: int, vol: float, drift: float = 0.0,
+                   leverage: float = payoff.LEVERAGE_00631L, fee: float = 0.0) -> tuple:
+    """
+    產生一批路徑，回傳 (到期指數, 00631L 到期價格 / 目前價格)
+    ETF 每日報酬 = 槓桿 × 指數每日報酬 - 每日費用，逐日連乘 (每日再平衡)
+    """
+    rng = np.random.default_rng(seed)
+    dt = 1.0 / TRADING_DAYS
+    log_ret = rng.standard_normal((paths, days))
+    log_ret *= vol * np.sqrt(dt)
+    log_ret += (drift - 0.5 * vol * vol) * dt
+
+    terminal = index * np.exp(log_ret.sum(axis=1))
+    # 就地轉為 ETF 每日毛報酬 1 + L·(e^r - 1) - fee，槓桿 ETF 單日最多歸零
+    np.expm1(log_ret, out=log_ret)
+    log_ret *= leverage
+    log_ret += 1.0 - fee * dt
+    np.maximum(log_ret, 0.0, out=log_ret)
+    etf_ratio = log_ret.prod(axis=1)
+    return terminal, etf_ratio
+
+
+def simulate_chunk(seed, paths: int, params: dict) -> tuple:
+    """單一工作批次 (在子行程執行)：回傳 (合併損益, 未避險 ETF 損益, 到期指數)"""
+    terminal, etf_ratio = simulate_paths(
+        seed, paths, params['index'], params['days'], params['vol'], params['drift'],
+        params['leverage'], params['fee']
+    )
+    etf = (params['etf_current'] * etf_ratio - params['etf_cost']) * params['etf_lots'] * payoff.ETF_SHARES_PER_LOT
+    hedge = payoff.position_payoffs(terminal, payoff.position_arrays(params['positions'])).sum(axis=1)
+    return (etf + hedge).astype(np.float32), etf.astype(np.float32), terminal.astype(np.float32)
+
+
+def risk_metrics(pnl: np.ndarray, levels=CONFIDENCE_LEVELS) -> dict:
+    """VaR / CVaR (以正數表示損失金額)"""
+    metrics = {}
+    for level in levels:
+        cutoff = np.quantile(pnl, 1 - level)
+        tail = pnl[pnl <= cutoff]
+        metrics[f"{level:.0%}"] = {
+            'var': float(-cutoff),
+            'cvar': float(-tail.mean()) if tail.size else float(-cutoff)
+        }
+    return metrics
+
+
+def summarize(pnl: np.ndarray) -> dict:
+    qs = np.quantile(pnl, [0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99])
+    counts, edges = np.histogram(pnl, bins=HISTOGRAM_BINS)
+    return {
+        'mean': float(pnl.mean()),
+        'std': float(pnl.std()),
+        'min': float(pnl.min()),
+        'max': float(pnl.max()),
+        'probLoss': float((pnl < 0).mean()),
+        'percentiles': dict(zip(('p1', 'p5', 'p25', 'p50', 'p75', 'p95', 'p99'), map(float, qs))),
+        'risk': risk_metrics(pnl),
+        'histogram': {'counts': counts.tolist(), 'edges': edges.tolist()}
+    }
+
+
+def run(index: float, days: int, vol: float, etf_lots: float, etf_cost: float, etf_current: float,
+        positions: list, paths: int = 100000, drift: float = 0.0, fee: float = 0.0,
+        seed: int = None, parallel: bool = True) -> dict:
+    """
+    執行模擬並回傳合併部位與未避險部位的統計
+    路徑數超過一個批次時分散到 process pool，否則直接在目前行程計算
+    """
+    params = {
+        'index': float(index), 'days': int(days), 'vol': float(vol), 'drift': float(drift),
+        'leverage': payoff.LEVERAGE_00631L, 'fee': float(fee),
+        'etf_lots': float(etf_lots), 'etf_cost': float(etf_cost), 'etf_current': float(etf_current),
+        'positions': list(positions or []),
+    }
+    sizes = [CHUNK_PATHS] * (paths // CHUNK_PATHS)
+    if paths % CHUNK_PATHS:
+        sizes.append(paths % CHUNK_PATHS)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    if parallel and len(sizes) > 1:
+        pool = process_pool.get_pool()
+        results = list(pool.map(simulate_chunk, seeds, sizes, [params] * len(sizes)))
+    else:
+        results = [simulate_chunk(s, n, params) for s, n in zip(seeds, sizes)]
+
+    combined = np.concatenate([r[0] for r in results])
+    unhedged = np.concatenate([r[1] for r in results])
+    terminal = np.concatenate([r[2] for r in results])
+
+    # 靜態 Power Law 模型 (calcETFPnL) 在相同到期指數下的平均損益，用來比較每日再平衡的波動耗損
+    static = payoff.etf_pnl(terminal.astype(float), index, etf_lots, etf_cost, etf_current)
+    return {
+        'paths': int(paths),
+        'combined': summarize(combined),
+        'unhedged': summarize(unhedged),
+        'index': {
+            'mean': float(terminal.mean()),
+            'percentiles': dict(zip(('p5', 'p50', 'p95'), map(float, np.quantile(terminal, [0.05, 0.5, 0.95]))))
+        },
+        'volatilityDrag': float(static.mean() - unhedged.mean())
+    }
@@ -0,0 +1,174 @@
+"""
+到期損益曲線引擎 (NumPy)
+移植自前端 js/calculator.js 的 calculatePnLCurve / calcETFPnL / calcPositionPnL / findBreakeven，
+所有倉位在所有結算價下的損益以一次陣列廣播計算，多組策略也可一次批次評估
+"""
+import numpy as np
+
+# ======== 常數設定 (與 js/calculator.js 相同) ========
+OPTION_MULTIPLIER = 50        # 台指選擇權每點 50 元
+MICRO_OPTION_MULTIPLIER = 10  # 微台期貨每點 10 元
+ETF_SHARES_PER_LOT = 1000     # 1張 = 1000股
+LEVERAGE_00631L = 2           # 00631L 為 2 倍槓桿 ETF
+PRICE_STEP = 100              # 價格步進
+
+KIND_CALL, KIND_PUT, KIND_FUTURES = 0, 1, 2
+
+
+def num(value, default: float = 0.0) -> float:
+    """轉為 float；缺值、無法轉換或 NaN 時回傳 default (部位欄位解析共用)"""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return default
+    return default if np.isnan(value) else value
+
+
+def price_grid(center: float, price_range: float, step: float = PRICE_STEP) -> np.ndarray:
+    """結算價格點：center - range 到 center + range (含端點)，間距 step"""
+    count = int(np.floor(price_range * 2 / step + 1e-9)) + 1
+    return center - price_range + np.arange(count) * step
+
+
+def etf_pnl(prices: np.ndarray, base_index: float, etf_lots: float, etf_cost: float, etf_current: float) -> np.ndarray:
+    """
+    00631L 在各指數價位的損益 (Power Law 槓桿模型)
+    P_new = P_current * (Index_new / Index_base) ^ Leverage
+    """
+    prices = np.asarray(prices, dtype=float)
+    if etf_lots <= 0 or base_index <= 0:
+        return np.zeros_like(prices)
+    new_price = etf_current * (prices / base_index) ** LEVERAGE_00631L
+    return (new_price - etf_cost) * etf_lots * ETF_SHARES_PER_LOT
+
+
+def position_arrays(positions: list) -> dict:
+    """將倉位清單轉為欄式陣列 (每個倉位一個元素)"""
+    n = len(positions)
+    strike = np.zeros(n)
+    lots = np.zeros(n)
+    premium = np.zeros(n)
+    multiplier = np.zeros(n)
+    kind = np.zeros(n, dtype=np.int8)
+    sign = np.ones(n)
+    closed = np.zeros(n, dtype=bool)
+    close_price = np.zeros(n)
+
+    for i, pos in enumerate(positions):
+        product = pos.get('product', '台指')
+        strike[i] = num(pos.get('strike'))
+        lots[i] = num(pos.get('lots'))
+        premium[i] = num(pos.get('premium'))
+        if product == '微台期貨' or pos.get('type') == 'Futures':
+            kind[i] = KIND_FUTURES
+            multiplier[i] = MICRO_OPTION_MULTIPLIER
+        else:
+            kind[i] = KIND_CALL if pos.get('type') == 'Call' else KIND_PUT
+            multiplier[i] = MICRO_OPTION_MULTIPLIER if product == '微台' else OPTION_MULTIPLIER
+            sign[i] = 1.0 if pos.get('direction') == '買進' else -1.0
+        if pos.get('isClosed') and 'closePrice' in pos:
+            closed[i] = True
+            close_price[i] = num(pos.get('closePrice'))
+
+    return {
+        'strike': strike, 'lots': lots, 'premium': premium, 'multiplier': multiplier,
+        'kind': kind, 'sign': sign, 'closed': closed, 'close_price': close_price
+    }
+
+
+def position_payoffs(prices: np.ndarray, arrays: dict) -> np.ndarray:
+    """
+    各倉位在各結算價的損益矩陣 (價格數 × 倉位數)
+    已平倉倉位為常數 (已實現損益)，未平倉且口數為 0 的倉位為 0
+    """
+    s = np.asarray(prices, dtype=float)[:, None]
+    strike = arrays['strike'][None, :]
+    kind = arrays['kind'][None, :]
+    scale = (arrays['lots'] * arrays['multiplier'])[None, :]
+
+    intrinsic = np.where(kind == KIND_CALL, np.maximum(s - strike, 0.0), np.maximum(strike - s, 0.0))
+    option = arrays['sign'][None, :] * (intrinsic - arrays['premium'][None, :])
+    # 微台期貨 (做空)：(進場價 - 結算價)
+    futures = strike - s
+    payoff = np.where(kind == KIND_FUTURES, futures, option) * scale
+
+    # 已平倉：(平倉價 - 權利金) 或期貨 (進場價 - 平倉價)，平倉價為 0 視為無效
+    close_price = arrays['close_price']
+    realized_unit = np.where(
+        arrays['kind'] == KIND_FUTURES,
+        arrays['strike'] - close_price,
+        arrays['sign'] * (close_price - arrays['premium'])
+    )
+    realized = np.where(close_price > 0, realized_unit, 0.0) * arrays['lots'] * arrays['multiplier']
+
+    open_mask = (~arrays['closed'] & (arrays['lots'] > 0))[None, :]
+    return np.where(arrays['closed'][None, :], realized[None, :], np.where(open_mask, payoff, 0.0))
+
+
+def find_breakevens(prices: np.ndarray, profits: np.ndarray) -> list:
+    """找出損益兩平點 (跨越零點處線性內插)，profits 可為一維或 (策略數 × 價格數)"""
+    prices = np.asarray(prices, dtype=float)
+    profits = np.atleast_2d(np.asarray(profits, dtype=float))
+    prev, curr = profits[:, :-1], profits[:, 1:]
+    cross = ((prev <= 0) & (curr >= 0)) | ((prev >= 0) & (curr <= 0))
+    denom = np.abs(prev) + np.abs(curr)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ratio = np.where(denom > 0, np.abs(prev) / denom, 0.0)
+    points = np.round(prices[:-1] + ratio * np.diff(prices)).astype(int)
+    return [points[row][cross[row]].tolist() for row in range(profits.shape[0])]
+
+
+def calculate_pnl_curve(center: float, price_range: float, etf_lots: float, etf_cost: float, etf_current: float,
+                        positions: list, reference_index: float = None, step: float = PRICE_STEP) -> dict:
+    """計算整個組合在價格範圍內的損益曲線 (對應 calculatePnLCurve) 與兩平點"""
+    prices = price_grid(center, price_range, step)
+    etf = etf_pnl(prices, reference_index or center, etf_lots, etf_cost, etf_current)
+    options = position_payoffs(prices, position_arrays(positions)).sum(axis=1)
+    combined = etf + options
+    return {
+        'prices': prices,
+        'etfProfits': etf,
+        'optionProfits': options,
+        'combinedProfits': combined,
+        'breakevens': find_breakevens(prices, combined)[0]
+    }
+
+
+def evaluate_strategies(prices: np.ndarray, strategies: list, etf_profits: np.ndarray) -> np.ndarray:
+    """
+    批次評估多組策略，回傳組合損益矩陣 (策略數 × 價格數)
+    所有策略的倉位攤平成一個陣列一次計算，再以成員矩陣加總回各策略
+    """
+    flat = []
+    owner = []
+    for idx, strategy in enumerate(strategies):
+        for pos in strategy.get('positions') or []:
+            flat.append(pos)
+            owner.append(idx)
+
+    combined = np.tile(np.asarray(etf_profits, dtype=float), (len(strategies), 1))
+    if not flat:
+        return combined
+
+    payoffs = position_payoffs(prices, position_arrays(flat))          # 價格數 × 倉位數
+    membership = np.zeros((len(flat), len(strategies)))
+    membership[np.arange(len(flat)), owner] = 1.0
+    return combined + (payoffs @ membership).T
+
+
+def analyze(prices: np.ndarray, combined: np.ndarray) -> list:
+    """各策略的關鍵指標 (對應 compareStrategies 的 analyzeStrategy)"""
+    combined = np.atleast_2d(combined)
+    breakevens = find_breakevens(prices, combined)
+    mid = combined.shape[1] // 2
+    max_profit = combined.max(axis=1)
+    max_loss = combined.min(axis=1)
+    return [
+        {
+            'maxProfit': float(max_profit[i]),
+            'maxLoss': float(max_loss[i]),
+            'breakeven': breakevens[i],
+            'profitAtCurrent': float(combined[i, mid])
+        }
+        for i in range(combined.shape[0])
+    ]
@@ -0,0 +1,262 @@
+"""
+伺服器端投資組合風險
+持有 00631L 部位與選擇權/期貨倉位，維護淨 Delta / Gamma / Vega / Theta 與避險比例；
+單一合約報價跳動時只重新評價持有該合約的倉位，總和以差額遞增更新；
+到期年數由各倉位的結算時間在每次評價時重新計算 (到期後為 0)
+
+投資組合只存在建立它的行程記憶體中，多個 gunicorn worker 之間不共用，部署時需維持單一 worker
+(以多執行緒處理並行請求)；組合代號為無法猜測的隨機字串，持有代號即可讀取或取代該組合
+"""
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+import payoff
+import pricing
+
+# 每個倉位的貢獻欄位 (皆以新台幣計)
+RISK_FIELDS = ('pnl', 'delta', 'gamma', 'vega', 'theta')
+SECONDS_PER_YEAR = pricing.DAYS_PER_YEAR * 86400
+FULL_REFRESH_EVERY = 1000   # 遞增更新累積誤差：每 N 次遞增更新後整體重算一次
+
+
+class Portfolio:
+    """
+    單一投資組合
+    positions 格式同前端 (product / type / direction / strike / lots / premium / isClosed / closePrice)，
+    另可帶 contract (合約代稱) 與 markPrice (目前市價)；resolve(pos) 回傳 (symbol, 結算時間 datetime)，
+    到期年數於每次評價時由結算時間重新計算
+    """
+
+    def __init__(self, portfolio_id: str, positions: list, resolve, etf_lots: float = 0.0, etf_cost: float = 0.0,
+                 etf_current: float = 0.0, index: float = 0.0, vol: float = 0.2, rate: float = 0.015):
+        self.id = portfolio_id
+        self.etf_lots = etf_lots
+        self.etf_cost = etf_cost
+        self.etf_current = etf_current
+        self.base_index = index        # 00631L 現價對應的指數
+        self.index = index
+        self.vol = vol
+        self.rate = rate
+        self.positions = list(positions)
+        self.updated_at = time.time()
+        self._lock = threading.Lock()
+        self._updates = 0
+
+        self.arrays = payoff.position_arrays(self.positions)
+        n = len(self.positions)
+        self.is_option = (self.arrays['kind'] != payoff.KIND_FUTURES) & ~self.arrays['closed'] & (self.arrays['lots'] > 0)
+        self.symbols = []
+        self.expiry = np.zeros(n)        # 結算時間 (epoch 秒)
+        self.T = np.zeros(n)
+        self.mark = np.full(n, np.nan)
+        self.iv = np.full(n, np.nan)     # 上一次反推的 IV，作為下一次的起始值
+        resolved = {}
+        for i, pos in enumerate(self.positions):
+            key = (pos.get('product'), pos.get('type'), pos.get('strike'), pos.get('contract'))
+            if key not in resolved:
+                resolved[key] = resolve(pos)
+            symbol, expiry = resolved[key]
+            # 只有未平倉的選擇權需要追蹤報價
+            self.symbols.append(symbol if self.is_option[i] else None)
+            self.expiry[i] = expiry.timestamp()
+            self.mark[i] = payoff.num(pos.get('markPrice'), np.nan)
+        self.by_symbol = {}
+        for i, symbol in enumerate(self.symbols):
+            if symbol:
+                self.by_symbol.setdefault(symbol, []).append(i)
+
+        self.contrib = np.zeros((n, len(RISK_FIELDS)))
+        self.totals = np.zeros(len(RISK_FIELDS))
+        self.refresh()
+
+    # ---------- 評價 ----------
+
+    def _update_T(self, rows):
+        """依結算時間重新計算指定倉位的到期年數 (已到期為 0)"""
+        self.T[rows] = np.maximum(self.expiry[rows] - time.time(), 0.0) / SECONDS_PER_YEAR
+
+    def _reprice(self, rows: np.ndarray) -> np.ndarray:
+        """計算指定倉位的貢獻 (列數 × RISK_FIELDS)"""
+        a = self.arrays
+        out = np.zeros((len(rows), len(RISK_FIELDS)))
+        if not len(rows):
+            return out
+        scale = (a['lots'] * a['multiplier'])[rows]
+        kind = a['kind'][rows]
+
+        # 已平倉：只有已實現損益
+        closed = a['closed'][rows]
+        realized = payoff.position_payoffs(np.array([self.index]), {k: v[rows] for k, v in a.items()})[0]
+        out[:, 0] = np.where(closed, realized, 0.0)
+
+        # 期貨 (做空)：線性，Delta = -口數 × 10
+        futures = (kind == payoff.KIND_FUTURES) & ~closed
+        out[futures, 0] = ((a['strike'][rows] - self.index) * scale)[futures]
+        out[futures, 1] = -scale[futures]
+
+        options = self.is_option[rows]
+        if options.any():
+            idx = rows[options]
+            sign = a['sign'][idx] * a['lots'][idx] * a['multiplier'][idx]
+            is_call = a['kind'][idx] == payoff.KIND_CALL
+            mark = self.mark[idx]
+            # 有市價時由市價反推 IV，否則用組合預設波動率
+            iv = pricing.implied_vol(mark, self.index, a['strike'][idx], self.T[idx], self.rate, is_call,
+                                     guess=self.iv[idx])
+            self.iv[idx] = iv
+            iv = np.where(np.isnan(iv), self.vol, iv)
+            g = pricing.black_scholes(self.index, a['strike'][idx], self.T[idx], iv, self.rate, is_call)
+            value = np.where(np.isnan(mark), g['price'], mark)
+            out[options] = np.column_stack([
+                sign * (value - a['premium'][idx]),
+                sign * g['delta'],
+                sign * g['gamma'],
+                sign * g['vega'],
+                sign * g['theta'],
+            ])
+        return out
+
+    def etf_risk(self) -> tuple:
+        """00631L 損益與 Delta (新台幣 / 指數點)"""
+        if self.etf_lots <= 0 or self.base_index <= 0:
+            return 0.0, 0.0
+        shares = self.etf_lots * payoff.ETF_SHARES_PER_LOT
+        ratio = self.index / self.base_index
+        price = self.etf_current * ratio ** payoff.LEVERAGE_00631L
+        delta = self.etf_current * payoff.LEVERAGE_00631L * ratio / self.base_index * shares
+        return (price - self.etf_cost) * shares, delta
+
+    def refresh(self):
+        """全部倉位重新評價 (指數變動、建立時或定期校正累積誤差)"""
+        rows = np.arange(len(self.positions))
+        self._update_T(rows)
+        self.contrib = self._reprice(rows)
+        self.totals = self.contrib.sum(axis=0)
+        self._updates = 0
+        self.updated_at = time.time()
+
+    # ---------- 更新 ----------
+
+    def on_quote(self, symbol: str, price: float) -> int:
+        """單一合約報價跳動，只重新評價持有該合約的倉位；回傳受影響的倉位數"""
+        rows = self.by_symbol.get(symbol)
+        if not rows:
+            return 0
+        with self._lock:
+            rows = np.asarray(rows)
+            self.mark[rows] = price if price and price > 0 else np.nan
+            self._update_T(rows)
+            new = self._reprice(rows)
+            self.totals += (new - self.contrib[rows]).sum(axis=0)
+            self.contrib[rows] = new
+            self._updates += 1
+            if self._updates >= FULL_REFRESH_EVERY:
+                self.refresh()
+            self.updated_at = time.time()
+        return len(rows)
+
+    def set_index(self, index: float):
+        """指數變動會影響所有選擇權的 Greeks，整體重新評價 (仍為單次向量運算)"""
+        with self._lock:
+            self.index = float(index)
+            self.refresh()
+
+    # ---------- 輸出 ----------
+
+    def risk(self, detail: bool = False) -> dict:
+        with self._lock:
+            etf_pnl, etf_delta = self.etf_risk()
+            totals = dict(zip(RISK_FIELDS, self.totals.tolist()))
+            hedge_delta = totals['delta']
+            result = {
+                'id': self.id,
+                'index': self.index,
+                'etf': {'pnl': etf_pnl, 'delta': etf_delta},
+                'hedge': totals,
+                'net': dict(totals, pnl=totals['pnl'] + etf_pnl, delta=hedge_delta + etf_delta),
+                # 避險比例：選擇權/期貨部位抵銷的 00631L Delta 比例
+                'hedgeRatio': (-hedge_delta / etf_delta) if etf_delta else None,
+                'updated_at': self.updated_at,
+            }
+            if detail:
+                result['positions'] = [
+                    dict(zip(RISK_FIELDS, row), symbol=symbol, mark=None if np.isnan(m) else float(m))
+                    for row, symbol, m in zip(self.contrib.tolist(), self.symbols, self.mark.tolist())
+                ]
+            return result
+
+
+class PortfolioStore:
+    """
+    多投資組合管理
+    以合約代號建立反向索引 (symbol -> 持有的組合)，報價跳動只通知相關的組合
+    超過 max_portfolios 時移除最久未更新的組合
+    """
+
+    def __init__(self, max_portfolios: int = 1000):
+        self.max_portfolios = max_portfolios
+        self._portfolios = OrderedDict()
+        self._holders = {}
+        self._lock = threading.Lock()
+        self.index_symbol = None   # 指數 (台指期) 報價代號，跳動時更新所有組合的指數
+
+    def put(self, portfolio: Portfolio):
+        with self._lock:
+            if portfolio.id in self._portfolios:
+                self._unindex(self._portfolios.pop(portfolio.id))
+            self._portfolios[portfolio.id] = portfolio
+            for symbol in portfolio.by_symbol:
+                self._holders.setdefault(symbol, set()).add(portfolio.id)
+            while len(self._portfolios) > self.max_portfolios:
+                _, oldest = self._portfolios.popitem(last=False)
+                self._unindex(oldest)
+
+    def _unindex(self, portfolio: Portfolio):
+        for symbol in portfolio.by_symbol:
+            holders = self._holders.get(symbol)
+            if holders:
+                holders.discard(portfolio.id)
+                if not holders:
+                    del self._holders[symbol]
+
+    def new_id(self) -> str:
+        """無法猜測的組合代號"""
+        return secrets.token_urlsafe(16)
+
+    def get(self, portfolio_id: str) -> Portfolio:
+        with self._lock:
+            portfolio = self._portfolios.get(portfolio_id)
+            if portfolio is not None:
+                self._portfolios.move_to_end(portfolio_id)
+            return portfolio
+
+    def on_quote(self, symbol: str, quote: dict) -> int:
+        """
+        報價跳動 (可直接註冊為 QuoteBook 的 listener)
+        回傳被重新評價的倉位總數
+        """
+        price = quote.get('lastPrice') or 0
+        bid, ask = quote.get('bidPrice') or 0, quote.get('askPrice') or 0
+        if bid > 0 and ask > 0:
+            price = (bid + ask) / 2
+
+        if symbol == self.index_symbol:
+            if price > 0:
+                for portfolio in self._snapshot():
+                    portfolio.set_index(price)
+            return 0
+
+        with self._lock:
+            targets = [self._portfolios[pid] for pid in self._holders.get(symbol, ())]
+        return sum(p.on_quote(symbol, price) for p in targets)
+
+    def _snapshot(self) -> list:
+        with self._lock:
+            return list(self._portfolios.values())
+
+    def __len__(self):
+        return len(self._portfolios)
@@ -0,0 +1,168 @@
+"""
+Black-Scholes 批次定價與 Greeks (NumPy)
+取代前端 js/simulation.js 與 calculateBSTheta 各自的純量實作，
+履約價 × 到期序列整個網格以一次陣列運算求出價格、Delta、Gamma、Vega、Theta
+"""
+from datetime import datetime
+
+import numpy as np
+
+import expiry_calendar
+
+DAYS_PER_YEAR = 365.0
+MIN_T = 1.0 / (DAYS_PER_YEAR * 24 * 60)  # 最短剩餘時間 (1 分鐘)，避免除以 0
+
+_SQRT_2PI = np.sqrt(2 * np.pi)
+
+
+def norm_pdf(x):
+    return np.exp(-0.5 * np.square(x)) / _SQRT_2PI
+
+
+def norm_cdf(x):
+    """標準常態累積分佈 (Abramowitz & Stegun 26.2.17，與 js/simulation.js 相同，誤差 < 7.5e-8)"""
+    x = np.asarray(x, dtype=float)
+    t = 1.0 / (1.0 + 0.2316419 * np.abs(x))
+    poly = t * (0.319381530 + t * (-0.356563782 + t * (1.781477937 + t * (-1.821255978 + t * 1.330274429))))
+    tail = norm_pdf(x) * poly
+    return np.where(x > 0, 1.0 - tail, tail)
+
+
+def black_scholes(spot, strike, T, vol, r: float = 0.0, is_call=True, greeks: bool = True) -> dict:
+    """
+    Black-Scholes 價格與 Greeks，所有參數皆可為純量或可廣播的陣列
+    例如 strike 形狀 (1, K)、T 形狀 (E, 1) 即得到 E × K 的網格
+
+    回傳 dict: price, delta, gamma, vega (每 1% 波動率), theta (每日)；greeks=False 時只回傳 price
+    到期 (T <= 0) 的合約回傳內含價值，Greeks 只保留 Delta
+    """
+    spot = np.asarray(spot, dtype=float)
+    strike = np.asarray(strike, dtype=float)
+    T = np.asarray(T, dtype=float)
+    vol = np.asarray(vol, dtype=float)
+    is_call = np.asarray(is_call, dtype=bool)
+
+    expired = T <= 0
+    t = np.maximum(T, MIN_T)
+    sigma = np.maximum(vol, 1e-8)
+    sqrt_t = np.sqrt(t)
+    sig_sqrt_t = sigma * sqrt_t
+    with np.errstate(divide='ignore', invalid='ignore'):
+        d1 = (np.log(spot / strike) + (r + 0.5 * sigma * sigma) * t) / sig_sqrt_t
+    d2 = d1 - sig_sqrt_t
+
+    discount = np.exp(-r * t)
+    cdf_d1, cdf_d2 = norm_cdf(d1), norm_cdf(d2)
+
+    call = spot * cdf_d1 - strike * discount * cdf_d2
+    put = call - spot + strike * discount           # put-call parity
+    price = np.where(is_call, call, put)
+    intrinsic = np.where(is_call, np.maximum(spot - strike, 0.0), np.maximum(strike - spot, 0.0))
+    if not greeks:
+        return {'price': np.where(expired, intrinsic, np.maximum(price, 0.0))}
+
+    pdf_d1 = norm_pdf(d1)
+    delta = np.where(is_call, cdf_d1, cdf_d1 - 1.0)
+    gamma = pdf_d1 / (spot * sig_sqrt_t)
+    vega = spot * pdf_d1 * sqrt_t / 100.0
+    decay = -(spot * pdf_d1 * sigma) / (2 * sqrt_t)
+    carry = r * strike * discount
+    theta = np.where(is_call, decay - carry * cdf_d2, decay + carry * (1.0 - cdf_d2)) / DAYS_PER_YEAR
+
+    itm = np.where(is_call, spot > strike, spot < strike)
+    return {
+        'price': np.where(expired, intrinsic, np.maximum(price, 0.0)),
+        'delta': np.where(expired, np.where(itm, np.where(is_call, 1.0, -1.0), 0.0), delta),
+        'gamma': np.where(expired, 0.0, gamma),
+        'vega': np.where(expired, 0.0, vega),
+        'theta': np.where(expired, 0.0, theta),
+    }
+
+
+def expiry_datetime(code: str) -> datetime:
+    """
+    期交所到期代碼對應的結算時間 (由到期日曆查表，已含休市順延)
+    YYYYMM (第三個週三)、YYYYMMW{n} (第 n 個週三)、YYYYMMF{n} (第 n 個週五)
+    """
+    return expiry_calendar.default_calendar.settlement(code)
+
+
+def years_to_expiry(codes, now: datetime = None) -> np.ndarray:
+    """各到期代碼距今的年數 (已到期為 0)"""
+    now = now or datetime.now()
+    seconds = [(expiry_datetime(code) - now).total_seconds() for code in codes]
+    return np.maximum(np.asarray(seconds, dtype=float), 0.0) / (DAYS_PER_YEAR * 86400)
+
+
+def price_chain(spot: float, strikes, expiries, vol: float, r: float = 0.0, now: datetime = None) -> dict:
+    """
+    整條選擇權鏈 (所有到期序列 × 所有履約價 × 買賣權) 一次定價
+    回傳 {'expiries', 'strikes', 'call': {...}, 'put': {...}}，每個欄位為 (到期數 × 履約價數) 陣列
+    """
+    strikes = np.asarray(strikes, dtype=float)
+    T = years_to_expiry(expiries, now)[:, None]
+    K = strikes[None, :]
+    return {
+        'expiries': list(expiries),
+        'strikes': strikes,
+        'call': black_scholes(spot, K, T, vol, r, True),
+        'put': black_scholes(spot, K, T, vol, r, False),
+    }
+
+
+def implied_vol(price, spot, strike, T, r: float = 0.0, is_call=True,
+                tol: float = 1e-6, max_iter: int = 50, lo: float = 1e-4, hi: float = 5.0, guess=None) -> np.ndarray:
+    """
+    批次反推隱含波動率，所有參數可廣播
+    以 Newton 法收斂 (tol 為價格點數誤差)，更新點跑出目前的上下界 (或 Vega 過小) 時改用二分法，保證落在 [lo, hi] 內
+    guess 可提供起始值 (例如上一次的 IV，報價小幅跳動時通常一兩步即收斂)，NaN 的元素改用近似起始值
+    價格違反無套利邊界、已到期或無報價的合約回傳 NaN
+    """
+    price, spot, strike, T, is_call, start = np.broadcast_arrays(
+        np.asarray(price, dtype=float), np.asarray(spot, dtype=float), np.asarray(strike, dtype=float),
+        np.asarray(T, dtype=float), np.asarray(is_call, dtype=bool),
+        np.asarray(np.nan if guess is None else guess, dtype=float)
+    )
+    shape = price.shape
+    price, spot, strike, T, is_call, start = (a.ravel() for a in (price, spot, strike, T, is_call, start))
+
+    discounted = strike * np.exp(-r * np.maximum(T, 0.0))
+    lower = np.where(is_call, np.maximum(spot - discounted, 0.0), np.maximum(discounted - spot, 0.0))
+    upper = np.where(is_call, spot, discounted)
+    valid = (T > 0) & (price > 0) & (price > lower) & (price < upper) & (spot > 0) & (strike > 0)
+
+    sigma = np.full(price.shape, np.nan)
+    idx = np.flatnonzero(valid)
+    if not idx.size:
+        return sigma.reshape(shape)
+
+    # Brenner-Subrahmanyam 近似作為起始值
+    s, k, t, p, c = spot[idx], strike[idx], T[idx], price[idx], is_call[idx]
+    guess = np.clip(np.sqrt(2 * np.pi / t) * p / s, 0.05, 2.0)
+    given = start[idx]
+    guess = np.where(np.isfinite(given) & (given > lo) & (given < hi), given, guess)
+    low = np.full(idx.size, lo)
+    high = np.full(idx.size, hi)
+    active = np.arange(idx.size)
+
+    for _ in range(max_iter):
+        g = black_scholes(s[active], k[active], t[active], guess[active], r, c[active])
+        diff = g['price'] - p[active]
+        done = np.abs(diff) < tol
+        # 價格隨波動率遞增：高估時上界收斂，低估時下界收斂
+        high[active] = np.where(diff > 0, guess[active], high[active])
+        low[active] = np.where(diff < 0, guess[active], low[active])
+
+        vega = g['vega'] * 100.0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            newton = guess[active] - diff / vega
+        bisect = 0.5 * (low[active] + high[active])
+        inside = (vega > 1e-8) & (newton > low[active]) & (newton < high[active])
+        guess[active] = np.where(done, guess[active], np.where(inside, newton, bisect))
+
+        active = active[~done & (high[active] - low[active] > 1e-10)]
+        if not active.size:
+            break
+
+    sigma[idx] = guess
+    return sigma.reshape(shape)
@@ -0,0 +1,37 @@
+"""
+共用 process pool
+蒙地卡羅模擬與回測參數掃描共用同一組子行程，延遲到第一次使用時才建立
+使用 spawn 啟動子行程，避免在多執行緒的 gunicorn worker 中 fork
+"""
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_lock = threading.Lock()
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """取得共用的 process pool (大小由 MC_WORKERS 設定，0 為 CPU 核心數)"""
+    global _pool
+    with _lock:
+        if _pool is None:
+            try:
+                workers = int(os.getenv('MC_WORKERS', '0')) or os.cpu_count() or 1
+            except ValueError:
+                workers = os.cpu_count() or 1
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            logger.info(f"🧮 process pool 已啟動 ({workers} workers)")
+        return _pool
+
+
+def shutdown():
+    global _pool
+    with _lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
@@ -0,0 +1,139 @@
+"""
+資料來源健康狀態與斷路器
+記錄每個資料來源最近一次成功/失敗、延遲與斷路器狀態 (closed / open / half_open)；
+健康檢查、來源列表與路由只讀取這份狀態 (O(1))，不會因此觸發上游下載。
+連續失敗達門檻時斷路器打開，冷卻期間直接略過該來源；冷卻結束後只放行一次試探 (half_open)，
+成功即關閉、失敗則重新打開
+"""
+import threading
+import time
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+LATENCY_ALPHA = 0.3   # 延遲的指數移動平均權重
+
+
+class ProviderStatus:
+    """單一資料來源的狀態"""
+
+    def __init__(self, name: str, failure_threshold: int = 3, reset_timeout: float = 60.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.available = False      # 目前是否有可用的資料 (快照或登入狀態)
+        self.failures = 0           # 連續失敗次數
+        self.last_success = None
+        self.last_failure = None
+        self.last_error = None
+        self.latency = None         # 最近一次耗時 (秒)
+        self.avg_latency = None
+        self.opened_at = None
+        self._trial = False         # half_open 時是否已有試探在進行
+        self._lock = threading.Lock()
+
+    def _observe(self, latency):
+        if latency is None:
+            return
+        self.latency = latency
+        self.avg_latency = latency if self.avg_latency is None else \
+            LATENCY_ALPHA * latency + (1 - LATENCY_ALPHA) * self.avg_latency
+
+    def allow(self) -> bool:
+        """是否允許向上游發出請求；冷卻結束時轉為 half_open 並只放行一個試探"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if time.time() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = HALF_OPEN
+                self._trial = False
+            if self._trial:
+                return False
+            self._trial = True
+            return True
+
+    def record_success(self, latency: float = None, available: bool = True):
+        with self._lock:
+            self._observe(latency)
+            self.last_success = time.time()
+            self.available = available
+            self.failures = 0
+            self.state = CLOSED
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self, error: str = None, latency: float = None, available: bool = None):
+        """
+        記錄失敗；available 為 None 時維持原本的可用狀態 (例如沿用上一份成功的快照)
+        half_open 的試探失敗或連續失敗達門檻時打開斷路器
+        """
+        with self._lock:
+            self._observe(latency)
+            self.last_failure = time.time()
+            self.last_error = error
+            self.failures += 1
+            if available is not None:
+                self.available = available
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = OPEN
+                self.opened_at = self.last_failure
+            self._trial = False
+
+    def record_skipped(self):
+        """本次未實際向上游發出請求 (例如仍在本地退避期限內)：不計入成功或失敗，只釋放 half_open 的試探名額"""
+        with self._lock:
+            self._trial = False
+
+    def is_available(self) -> bool:
+        """可用於路由：有可用資料且斷路器未打開"""
+        return self.available and self.state != OPEN
+
+    def to_dict(self) -> dict:
+        return {
+            'state': self.state,
+            'available': self.is_available(),
+            'failures': self.failures,
+            'last_success': self.last_success,
+            'last_failure': self.last_failure,
+            'last_error': self.last_error,
+            'latency': round(self.latency, 3) if self.latency is not None else None,
+            'avg_latency': round(self.avg_latency, 3) if self.avg_latency is not None else None,
+            'retry_in': max(0.0, round(self.opened_at + self.reset_timeout - time.time(), 1))
+            if self.state == OPEN else None,
+        }
+
+
+class HealthRegistry:
+    """所有資料來源的狀態表"""
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._statuses = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> ProviderStatus:
+        status = self._statuses.get(name)
+        if status is None:
+            with self._lock:
+                status = self._statuses.setdefault(
+                    name, ProviderStatus(name, self.failure_threshold, self.reset_timeout)
+                )
+        return status
+
+    def allow(self, name: str) -> bool:
+        return self.get(name).allow()
+
+    def is_available(self, name: str) -> bool:
+        status = self._statuses.get(name)
+        return status is not None and status.is_available()
+
+    def record_success(self, name: str, latency: float = None, available: bool = True):
+        self.get(name).record_success(latency, available)
+
+    def record_failure(self, name: str, error: str = None, latency: float = None, available: bool = None):
+        self.get(name).record_failure(error, latency, available)
+
+    def snapshot(self) -> dict:
+        return {name: status.to_dict() for name, status in list(self._statuses.items())}
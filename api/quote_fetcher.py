@@ -0,0 +1,91 @@
+"""
+富邦報價並行查詢層
+以有上限的執行緒池同時向日盤/夜盤發出查詢，先取得有效 lastPrice 的盤別勝出，
+另一盤別尚未執行的查詢會被取消；每次請求都有整體期限，
+避免單一慢速代號拖住整條選擇權鏈
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+logger = logging.getLogger(__name__)
+
+
+def is_valid_quote(quote) -> bool:
+    """報價需有大於 0 的 lastPrice 才視為有效"""
+    try:
+        return bool(quote) and 'lastPrice' in quote and quote['lastPrice'] > 0
+    except TypeError:
+        return False
+
+
+class QuoteFetcher:
+    """
+    並行報價查詢器
+
+    quote_fn(symbol, session) 負責實際查詢單一盤別，session 為 None (一般盤) 或 'afterhours' (夜盤)
+    """
+
+    def __init__(self, quote_fn, max_workers: int = 16, timeout: float = 3.0):
+        self.quote_fn = quote_fn
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='fubon-quote')
+
+    def _attempt(self, symbol: str, session):
+        try:
+            return self.quote_fn(symbol, session)
+        except Exception as e:
+            logger.debug(f"報價查詢失敗 {symbol} session={session}: {e}")
+            return None
+
+    def fetch(self, symbol: str, sessions: tuple, timeout: float = None) -> dict:
+        """查詢單一代號，回傳有效報價或空 dict"""
+        return self.fetch_many([symbol], sessions, timeout).get(symbol, {})
+
+    def fetch_many(self, symbols: list, sessions: tuple, timeout: float = None) -> dict:
+        """
+        同時查詢多個代號的所有盤別
+        回傳 {symbol: quote}，逾時或無有效報價的代號回傳空 dict
+        """
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+
+        pending = {}
+        by_symbol = {}
+        for symbol in dict.fromkeys(symbols):
+            futures = []
+            for session in sessions:
+                future = self._executor.submit(self._attempt, symbol, session)
+                pending[future] = symbol
+                futures.append(future)
+            by_symbol[symbol] = futures
+
+        results = {}
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, _ = wait(list(pending), timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                symbol = pending.pop(future, None)
+                if symbol is None or symbol in results:
+                    continue
+                quote = future.result()
+                if is_valid_quote(quote):
+                    results[symbol] = quote
+                    # 取消落後的盤別查詢
+                    for other in by_symbol[symbol]:
+                        if other in pending:
+                            other.cancel()
+                            pending.pop(other)
+
+        if pending:
+            timed_out = set(pending.values())
+            logger.warning(f"⚠️ 報價查詢逾時 ({len(timed_out)} 檔): {sorted(timed_out)[:5]}")
+            for future in pending:
+                future.cancel()
+
+        return {symbol: results.get(symbol, {}) for symbol in by_symbol}
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
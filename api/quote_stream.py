@@ -0,0 +1,172 @@
+"""
+富邦即時行情串流
+透過 SDK 的 websocket 行情通道訂閱 TXO/TXF 代號，將成交與五檔推播寫入記憶體報價簿 (QuoteBook)，
+API 路由直接讀取報價簿，不再對每個履約價發出 REST 查詢
+"""
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class QuoteBook:
+    """執行緒安全的記憶體報價簿，欄位名稱與 REST intraday.quote 相同 (lastPrice / bidPrice / askPrice)"""
+
+    def __init__(self):
+        self._quotes = {}
+        self._lock = threading.Lock()
+        self._listeners = []
+        self.version = 0
+        self.updated_at = None
+
+    def add_listener(self, fn):
+        """註冊報價更新通知 fn(symbol, quote)，在寫入報價的執行緒上呼叫"""
+        self._listeners.append(fn)
+
+    def update(self, symbol: str, **fields):
+        with self._lock:
+            quote = self._quotes.setdefault(symbol, {'symbol': symbol})
+            quote.update(fields)
+            self.version += 1
+            self.updated_at = time.time()
+            snapshot = dict(quote) if self._listeners else None
+        for fn in self._listeners:
+            try:
+                fn(symbol, snapshot)
+            except Exception as e:
+                logger.error(f"❌ 報價更新通知失敗 ({symbol}): {e}")
+
+    def get(self, symbol: str) -> dict:
+        with self._lock:
+            quote = self._quotes.get(symbol)
+            return dict(quote) if quote else {}
+
+    def get_many(self, symbols) -> dict:
+        with self._lock:
+            return {s: dict(self._quotes[s]) for s in symbols if s in self._quotes}
+
+    def clear(self):
+        with self._lock:
+            self._quotes.clear()
+            self.version += 1
+
+    def __len__(self):
+        return len(self._quotes)
+
+
+class FubonQuoteStream:
+    """
+    富邦 websocket 行情訂閱管理
+
+    client 為 SDK 的 marketdata.websocket_client.futopt (需提供 on / connect / subscribe)，
+    測試時可替換為任何具相同介面的本地假行情來源
+    """
+
+    CHANNELS = ('trades', 'books')
+
+    def __init__(self, client, book: QuoteBook = None, after_hours: bool = False, reconnect_delay: float = 5.0):
+        self.client = client
+        self.book = book or QuoteBook()
+        self.after_hours = after_hours
+        self.reconnect_delay = reconnect_delay
+        self.subscribed = set()
+        self.connected = False
+        self._lock = threading.Lock()
+
+        client.on('message', self._on_message)
+        client.on('disconnect', self._on_disconnect)
+        client.on('error', self._on_error)
+
+    def start(self):
+        self.client.connect()
+        self.connected = True
+        logger.info("✅ 富邦即時行情串流已連線")
+
+    def subscribe(self, symbols):
+        """訂閱尚未訂閱的代號 (重複呼叫不會重複訂閱)"""
+        with self._lock:
+            new = [s for s in dict.fromkeys(symbols) if s not in self.subscribed]
+            if not new:
+                return
+            self.subscribed.update(new)
+        self._send_subscribe(new)
+
+    def _send_subscribe(self, symbols):
+        for channel in self.CHANNELS:
+            params = {'channel': channel, 'symbols': list(symbols)}
+            if self.after_hours:
+                params['afterHours'] = True
+            try:
+                self.client.subscribe(params)
+            except Exception as e:
+                logger.error(f"❌ 訂閱行情失敗 ({channel}, {len(symbols)} 檔): {e}")
+
+    def switch_session(self, after_hours: bool):
+        """日夜盤切換：清空報價簿並以新盤別重新訂閱"""
+        if after_hours == self.after_hours:
+            return
+        self.after_hours = after_hours
+        self.book.clear()
+        with self._lock:
+            symbols = list(self.subscribed)
+        logger.info(f"🔄 切換至{'夜盤' if after_hours else '日盤'}，重新訂閱 {len(symbols)} 檔")
+        if symbols:
+            self._send_subscribe(symbols)
+
+    def _on_message(self, message):
+        try:
+            msg = json.loads(message) if isinstance(message, (str, bytes)) else message
+        except ValueError:
+            return
+        if not isinstance(msg, dict) or msg.get('event') not in ('data', 'snapshot'):
+            return
+
+        data = msg.get('data') or {}
+        symbol = data.get('symbol')
+        if not symbol:
+            return
+
+        channel = msg.get('channel')
+        if channel == 'trades':
+            trades = data.get('trades') or []
+            if not trades:
+                return
+            last = trades[0]
+            fields = {'lastPrice': last.get('price', 0)}
+            if last.get('bid'):
+                fields['bidPrice'] = last['bid']
+            if last.get('ask'):
+                fields['askPrice'] = last['ask']
+            self.book.update(symbol, **fields)
+        elif channel == 'books':
+            bids = data.get('bids') or []
+            asks = data.get('asks') or []
+            self.book.update(
+                symbol,
+                bidPrice=bids[0].get('price', 0) if bids else 0,
+                askPrice=asks[0].get('price', 0) if asks else 0
+            )
+
+    def _on_error(self, error):
+        logger.error(f"❌ 富邦行情串流錯誤: {error}")
+
+    def _on_disconnect(self, *args):
+        self.connected = False
+        logger.warning("⚠️ 富邦行情串流中斷，準備重新連線")
+        threading.Thread(target=self._reconnect, daemon=True, name='fubon-stream-reconnect').start()
+
+    def _reconnect(self):
+        while not self.connected:
+            time.sleep(self.reconnect_delay)
+            try:
+                self.client.connect()
+                self.connected = True
+                with self._lock:
+                    symbols = list(self.subscribed)
+                if symbols:
+                    self._send_subscribe(symbols)
+                logger.info(f"✅ 富邦行情串流重新連線，恢復訂閱 {len(symbols)} 檔")
+            except Exception as e:
+                logger.error(f"❌ 富邦行情串流重新連線失敗: {e}")
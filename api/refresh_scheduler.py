@@ -0,0 +1,123 @@
+"""
+背景快取更新排程
+在快取到期前由背景執行緒預先更新各資料來源的快照 (stale-while-revalidate)，
+更新期間請求一律取得上一份成功的快照，不會因為上游下載而阻塞
+"""
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class _Job:
+    def __init__(self, name, provider):
+        self.name = name
+        self.provider = provider
+        self.wake = threading.Event()
+        self.triggered = False
+        self.running = False
+        self.last_attempt = 0.0
+        self.last_failed = False
+        self.failures = 0          # 連續失敗次數 (決定重試間隔的指數退避)
+
+
+class RefreshScheduler:
+    """
+    每個資料來源各有一條背景執行緒負責更新
+
+    provider 需提供:
+        refresh() -> bool            實際下載並更新快取
+        fresh_time() -> float        快照最近一次被確認為最新的時間 (epoch 秒)，尚無快照時回傳 None
+        cache['ttl']                 快取有效秒數
+        last_access                  最後一次被讀取的時間 (epoch 秒)
+    """
+
+    def __init__(self, lead: float = 0.8, retry_interval: float = 30.0, idle_after: float = 600.0):
+        self.lead = lead                      # 在 ttl * lead 時提前更新
+        self.retry_interval = retry_interval  # 更新失敗後的重試間隔 (連續失敗時加倍，最長為快取 ttl)
+        self.idle_after = idle_after          # 超過此秒數無人讀取即停止預先更新
+        self._jobs = {}
+        self._started = False
+
+    def register(self, name: str, provider):
+        job = _Job(name, provider)
+        self._jobs[name] = job
+        provider.scheduler = self
+        provider.name = name
+        if self._started:
+            self._start_job(job)
+
+    def start(self):
+        if self._started:
+            return
+        self._started = True
+        for job in self._jobs.values():
+            self._start_job(job)
+
+    def _start_job(self, job: _Job):
+        threading.Thread(target=self._run, args=(job,), daemon=True, name=f"refresh-{job.name}").start()
+
+    def trigger(self, name: str):
+        """要求立即更新 (不等待結果)"""
+        job = self._jobs.get(name)
+        if job and not job.running:
+            job.triggered = True
+            job.wake.set()
+
+    def status(self) -> dict:
+        return {
+            name: {
+                'running': job.running,
+                'last_attempt': job.last_attempt or None,
+                'last_failed': job.last_failed,
+                'failures': job.failures,
+            }
+            for name, job in self._jobs.items()
+        }
+
+    def _retry_delay(self, job: _Job) -> float:
+        """失敗後的重試間隔：retry_interval 起每次連續失敗加倍，最長為正常的更新間隔 (快取 ttl)"""
+        limit = max(self.retry_interval, job.provider.cache['ttl'])
+        return min(self.retry_interval * 2 ** min(job.failures - 1, 16), limit)
+
+    def _next_delay(self, job: _Job):
+        """
+        距離下一次更新的秒數；None 表示等待觸發
+        上次更新失敗時一律等到重試間隔結束 (觸發只會縮短正常的提前更新等待，不會讓失敗後立即重試)
+        """
+        now = time.time()
+        # 沒人使用的資料來源不預先更新 (失敗後也不持續重試上游)，等下次讀取時再觸發
+        idle = now - (job.provider.last_access or 0) > self.idle_after
+        if job.last_failed:
+            if idle and not job.triggered:
+                return None
+            return max(0.0, job.last_attempt + self._retry_delay(job) - now)
+        if job.triggered:
+            return 0
+
+        fresh_time = job.provider.fresh_time()
+        if fresh_time is None or idle:
+            return None
+        return max(0.0, fresh_time + job.provider.cache['ttl'] * self.lead - now)
+
+    def _run(self, job: _Job):
+        while True:
+            delay = self._next_delay(job)
+            if delay is None or delay > 0:
+                job.wake.wait(delay)
+                job.wake.clear()
+                if self._next_delay(job) != 0:
+                    continue
+
+            job.triggered = False
+            job.running = True
+            job.last_attempt = time.time()
+            try:
+                job.last_failed = not job.provider.refresh()
+            except Exception as e:
+                job.last_failed = True
+                logger.error(f"❌ 背景更新 {job.name} 失敗: {e}")
+            finally:
+                job.failures = job.failures + 1 if job.last_failed else 0
+                job.running = False
@@ -0,0 +1,134 @@
+"""
+API 回應快取
+依 (資料來源, 快照版本, 查詢參數) 快取已序列化的回應內容與 ETag；
+同一份快照的重複查詢直接回傳快取的位元組，用戶端帶 If-None-Match 且快照未變時只回 304。
+以 LRU 淘汰，並限制筆數與總位元組數；回應內含的 timestamp / data_age 為建立當下的值，
+因此每筆最多保留 ttl 秒。ETag 由快取 key 與行程啟動時的隨機值產生 (弱 ETag)，過期重建時只有這兩個欄位不同，
+ETag 不變，快照更新前用戶端都能拿到 304；行程重啟後 ETag 一律改變
+"""
+import hashlib
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from singleflight import SingleFlight
+
+# 行程啟動時產生的隨機值：快照版本可能是行程內的計數器 (例如富邦串流報價簿)，重啟後從 0 重算，
+# ETag 加入此值才不會讓重啟前後相同的 key 對應到不同內容 (用戶端因此收到錯誤的 304)
+_BOOT_NONCE = secrets.token_hex(8)
+
+
+def make_etag(body: bytes) -> str:
+    """內容雜湊的強 ETag"""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def key_etag(key) -> str:
+    """快取 key (含快照版本與查詢參數) 與行程啟動值雜湊的弱 ETag：同一行程內同一份快照重建的回應 ETag 相同"""
+    digest = hashlib.blake2b(repr((_BOOT_NONCE, key)).encode('utf-8'), digest_size=16).hexdigest()
+    return 'W/"' + digest + '"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match 標頭是否符合 ETag (支援多個值與 *；依 RFC 9110 以弱比較判斷)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    opaque = etag[2:] if etag.startswith('W/') else etag
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+class CachedResponse:
+    """一筆已序列化的回應"""
+    __slots__ = ('body', 'etag', 'content_type', 'content_encoding', 'created')
+
+    def __init__(self, body: bytes, content_type: str = 'application/json', content_encoding: str = None,
+                 etag: str = None):
+        self.body = body
+        self.etag = etag or make_etag(body)
+        self.content_type = content_type
+        self.content_encoding = content_encoding   # gzip / br (body 已壓縮)
+        self.created = time.time()
+
+
+class ResponseCache:
+    """
+    回應內容 LRU 快取
+    同一 key 的並行請求只建立一次；key 為 None (資料來源無快照版本) 時不快取
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 16 * 1024 * 1024, ttl: float = 30.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._flight = SingleFlight()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def peek(self, key) -> CachedResponse:
+        """取得未過期的快取 (不存在時回傳 None)"""
+        if key is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry.created >= self.ttl:
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, body: bytes, content_type: str = 'application/json',
+            content_encoding: str = None) -> CachedResponse:
+        """存入一筆回應並回傳；超過單筆上限 (max_bytes) 的內容不快取 (key 為 None 時以內容雜湊作為 ETag)"""
+        entry = CachedResponse(body, content_type, content_encoding, key_etag(key) if key is not None else None)
+        if key is None or len(body) > self.max_bytes:
+            return entry
+        with self._lock:
+            self.misses += 1
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self.size += len(body)
+            while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+        return entry
+
+    def get(self, key, build, content_type: str = 'application/json',
+            content_encoding: str = None) -> CachedResponse:
+        """取得快取；不存在時以 build() 產生回應位元組"""
+        entry = self.peek(key)
+        if entry is not None:
+            return entry
+        if key is None:
+            return CachedResponse(build(), content_type, content_encoding)
+        return self._flight.do(key, lambda: self.put(key, build(), content_type, content_encoding))
+
+    def _remove(self, key):
+        self.size -= len(self._entries.pop(key).body)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self) -> dict:
+        return {
+            'entries': len(self._entries),
+            'bytes': self.size,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
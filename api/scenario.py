@@ -0,0 +1,96 @@
+"""
+情境網格引擎
+以 Black-Scholes 重新評價未平倉選擇權，計算組合在 (指數 × 剩餘天數 × 波動率平移) 三維網格上的損益，
+整個網格為一次陣列廣播運算，結果以 float32 欄式 / 二進位格式回傳
+"""
+import base64
+
+import numpy as np
+
+import payoff
+import pricing
+
+DEFAULT_VOL_SHIFTS = tuple(np.round(np.arange(-0.10, 0.1001, 0.02), 4))   # -10% ~ +10%，共 11 格
+MIN_VOL = 0.01
+# 每批定價的元素數上限 (倉位 × 網格格數)；倉位分批累加到立方體，暫存陣列大小不隨倉位數成長
+CHUNK_ELEMENTS = 2000000
+
+
+def day_axis(days_to_expiry: float, day_step: float = 1.0) -> np.ndarray:
+    """剩餘天數軸：由 days_to_expiry 遞減到 0 (含)"""
+    count = int(np.floor(days_to_expiry / day_step + 1e-9)) + 1
+    axis = days_to_expiry - np.arange(count) * day_step
+    return axis if axis[-1] <= 1e-9 else np.append(axis, 0.0)
+
+
+def scenario_grid(prices: np.ndarray, days: np.ndarray, vol_shifts: np.ndarray, positions: list,
+                  etf_lots: float = 0.0, etf_cost: float = 0.0, etf_current: float = 0.0,
+                  reference_index: float = None, days_to_expiry: float = None,
+                  vol: float = 0.2, rate: float = 0.015) -> np.ndarray:
+    """
+    組合損益立方體，形狀 (指數數, 天數數, 波動率平移數)
+
+    days 為主要到期日的剩餘天數軸；倉位可用 daysToExpiry 指定自己的剩餘天數，
+    網格上的剩餘天數為 pos_days - (days_to_expiry - days)，到期後以內含價值計算
+    倉位可用 iv 指定自己的波動率，否則使用 vol；各格波動率為 iv + 平移 (下限 1%)
+    """
+    prices = np.asarray(prices, dtype=float)
+    days = np.asarray(days, dtype=float)
+    vol_shifts = np.asarray(vol_shifts, dtype=float)
+    days_to_expiry = float(days[0]) if days_to_expiry is None else days_to_expiry
+    shape = (len(prices), len(days), len(vol_shifts))
+
+    # 00631L 與期貨、已平倉倉位與時間、波動率無關，只沿指數軸計算一次
+    etf = payoff.etf_pnl(prices, reference_index or prices[len(prices) // 2], etf_lots, etf_cost, etf_current)
+    arrays = payoff.position_arrays(positions)
+    static = arrays['closed'] | (arrays['kind'] == payoff.KIND_FUTURES) | (arrays['lots'] <= 0)
+    linear = etf + payoff.position_payoffs(prices, arrays)[:, static].sum(axis=1)
+
+    cube = np.broadcast_to(linear[:, None, None], shape).copy()
+    live = np.flatnonzero(~static)
+    if not live.size:
+        return cube
+
+    elapsed = days_to_expiry - days
+    pos_days = np.array([payoff.num(positions[i].get('daysToExpiry'), days_to_expiry) for i in live])
+    pos_vol = np.array([payoff.num(positions[i].get('iv'), vol) or vol for i in live])
+
+    # 倉位 × 指數 × 天數 × 波動率 廣播定價，依 CHUNK_ELEMENTS 分批累加
+    S = prices[None, :, None, None]
+    T_all = np.maximum(pos_days[:, None] - elapsed[None, :], 0.0)[:, None, :, None] / pricing.DAYS_PER_YEAR
+    sigma_all = np.maximum(pos_vol[:, None] + vol_shifts[None, :], MIN_VOL)[:, None, None, :]
+    scale_all = (arrays['sign'] * arrays['lots'] * arrays['multiplier'])[live]
+    chunk = max(1, CHUNK_ELEMENTS // cube.size)
+    for start in range(0, live.size, chunk):
+        part = slice(start, start + chunk)
+        index = live[part]
+        K = arrays['strike'][index][:, None, None, None]
+        is_call = (arrays['kind'][index] == payoff.KIND_CALL)[:, None, None, None]
+        value = pricing.black_scholes(S, K, T_all[part], sigma_all[part], rate, is_call, greeks=False)['price']
+        value -= arrays['premium'][index][:, None, None, None]
+        cube += np.tensordot(scale_all[part], value, axes=1)
+    return cube
+
+
+def encode(prices: np.ndarray, days: np.ndarray, vol_shifts: np.ndarray, cube: np.ndarray, fmt: str = 'base64'):
+    """
+    json：巢狀 list (除錯用)
+    base64：各軸為 list，損益為 little-endian float32 (C order，形狀 [指數, 天數, 波動率]) 的 base64
+    binary：回傳 bytes = float32 [指數軸, 天數軸, 波動率軸, 損益]，形狀另由呼叫端以 header 提供
+    """
+    axes = {
+        'prices': np.asarray(prices, dtype=float).tolist(),
+        'days': np.round(days, 4).tolist(),
+        'volShifts': np.round(vol_shifts, 4).tolist(),
+        'shape': list(cube.shape),
+    }
+    if fmt == 'json':
+        return dict(axes, pnl=np.round(cube, 0).tolist())
+
+    if fmt == 'binary':
+        return np.concatenate([
+            np.asarray(prices, dtype='<f4'), np.asarray(days, dtype='<f4'), np.asarray(vol_shifts, dtype='<f4'),
+            cube.astype('<f4').ravel()
+        ]).tobytes()
+    body = cube.astype('<f4').tobytes()
+    return dict(axes, dtype='float32', encoding='base64', pnl=base64.b64encode(body).decode('ascii'))
@@ -0,0 +1,141 @@
+"""
+跨 worker 共用快照快取
+以本機 SQLite 檔案 (WAL 模式) 儲存各資料來源的最新快照，
+gunicorn 的多個 worker 中只有取得租約 (lease) 的那一個會向上游下載，其餘 worker 直接讀取同一份快照
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    updated_at REAL NOT NULL,
+    payload BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS freshness (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    checked_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+class SharedSnapshotCache:
+    """多行程共用的快照儲存 (每個執行緒各自持有 SQLite 連線)"""
+
+    def __init__(self, path: str, lease_seconds: float = 120.0):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.owner = f"{os.getpid()}"
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def version(self, name: str) -> tuple:
+        """回傳 (version, updated_at)，尚無快照時回傳 (0, None)"""
+        row = self._conn().execute(
+            'SELECT version, updated_at FROM snapshots WHERE name = ?', (name,)
+        ).fetchone()
+        return (row[0], row[1]) if row else (0, None)
+
+    def get(self, name: str, newer_than: int = 0):
+        """回傳 (payload, updated_at, version)；版本未超過 newer_than 時回傳 None"""
+        row = self._conn().execute(
+            'SELECT version, updated_at, payload FROM snapshots WHERE name = ? AND version > ?',
+            (name, newer_than)
+        ).fetchone()
+        if not row:
+            return None
+        return json.loads(row[2]), row[1], row[0]
+
+    def put(self, name: str, payload: dict, updated_at: float = None) -> int:
+        """寫入新快照並回傳新版本號"""
+        body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            version = self.version(name)[0] + 1
+            conn.execute(
+                'INSERT OR REPLACE INTO snapshots (name, version, updated_at, payload) VALUES (?, ?, ?, ?)',
+                (name, version, updated_at or time.time(), body)
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return version
+
+    def touch(self, name: str, version: int, checked_at: float = None):
+        """記錄某版本快照已向上游確認未變 (例如 304)：只延長新鮮度，不改版本也不重寫內容"""
+        self._conn().execute(
+            'INSERT OR REPLACE INTO freshness (name, version, checked_at) VALUES (?, ?, ?)',
+            (name, version, checked_at or time.time())
+        )
+
+    def checked_at(self, name: str, version: int):
+        """該版本快照最近一次向上游確認的時間，未確認過時回傳 None"""
+        row = self._conn().execute(
+            'SELECT checked_at FROM freshness WHERE name = ? AND version = ?', (name, version)
+        ).fetchone()
+        return row[0] if row else None
+
+    def acquire(self, name: str) -> bool:
+        """嘗試取得更新租約；其他行程持有未過期租約時回傳 False"""
+        now = time.time()
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT owner, expires_at FROM leases WHERE name = ?', (name,)).fetchone()
+            if row and row[0] != self.owner and row[1] > now:
+                conn.execute('COMMIT')
+                return False
+            conn.execute(
+                'INSERT OR REPLACE INTO leases (name, owner, expires_at) VALUES (?, ?, ?)',
+                (name, self.owner, now + self.lease_seconds)
+            )
+            conn.execute('COMMIT')
+            return True
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def release(self, name: str):
+        self._conn().execute('DELETE FROM leases WHERE name = ? AND owner = ?', (name, self.owner))
+
+    def wait_for_newer(self, name: str, version: int, timeout: float, poll: float = 0.5, checked_after: float = None):
+        """
+        等待其他行程寫入新版本 (只在背景更新執行緒中使用)，回傳 (payload, updated_at, version)
+        指定 checked_after 時，目前版本在該時間之後被確認未變 (touch) 也算完成，回傳 (None, checked_at, version)
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            entry = self.get(name, newer_than=version)
+            if entry:
+                return entry
+            if checked_after is not None:
+                checked = self.checked_at(name, version)
+                if checked is not None and checked > checked_after:
+                    return None, checked, version
+            time.sleep(poll)
+        return None
@@ -0,0 +1,59 @@
+"""
+Single-flight 請求合併
+同一個 key 同時只會有一個執行中的呼叫，其餘並行呼叫者等待並共用同一份結果，
+避免快取失效瞬間多條執行緒同時向上游下載 (thundering herd)
+"""
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """執行緒安全的 single-flight 群組"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, *args, **kwargs):
+        """
+        執行 fn(*args, **kwargs)；若相同 key 已有呼叫進行中，則等待其結果
+        fn 拋出的例外會同時傳遞給所有等待者
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def in_flight(self) -> list:
+        """目前執行中的 key"""
+        with self._lock:
+            return list(self._calls)
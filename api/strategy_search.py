@@ -0,0 +1,219 @@
+"""
+避險策略搜尋 (伺服器端版 recommendStrategies)
+列舉整條選擇權鏈上所有的 買賣權 / 賣權價差 / 領口 / 掩護性買權 組合，
+以 payoff 引擎批次計算每個候選與 00631L 部位合併後的損益，回傳 Pareto 最適的避險組合
+"""
+import math
+
+import numpy as np
+
+import payoff
+
+PROTECTION_MOVES = (-0.10, -0.20)   # 計算保護效果的指數跌幅
+UPSIDE_MOVE = 0.10                  # 計算上漲空間的指數漲幅
+PUT_MONEYNESS = (0.70, 1.05)        # 納入搜尋的賣權履約價 / 指數 範圍
+CALL_MONEYNESS = (0.98, 1.25)       # 納入搜尋的買權履約價 / 指數 範圍
+LEGS = 2                            # 每個候選最多兩隻腳，不足以 0 口補齊
+
+STRATEGY_NAMES = {
+    'protective_put': '保護性賣權 (Protective Put)',
+    'bear_put_spread': '熊市價差 (Bear Put Spread)',
+    'collar': '領口策略 (Collar)',
+    'covered_call': '掩護性買權 (Covered Call)',
+}
+
+
+def _quotes(chain: list, side: str, lo: float, hi: float) -> tuple:
+    """
+    取出單邊報價 (strikes, buy_price, sell_price)，買進用賣價、賣出用買價，缺報價時用成交價
+    剔除無報價的履約價，以及違反單調性 (履約價較差但權利金不比較好的合約便宜) 的過時報價
+    """
+    rows = []
+    for row in chain:
+        strike, quote = row['strike'], row.get(side)
+        if not quote or not lo <= strike <= hi:
+            continue
+        price = quote.get('price') or 0
+        ask = quote.get('ask') or price
+        bid = quote.get('bid') or price
+        if price > 0 and ask > 0 and bid > 0:
+            rows.append((strike, ask, bid))
+    if not rows:
+        return np.zeros(0), np.zeros(0), np.zeros(0)
+
+    strikes, asks, bids = (np.array(col, dtype=float) for col in zip(*rows))
+    # 賣權履約價愈高愈值錢、買權愈低愈值錢；依「愈值錢」排序後，權利金必須嚴格遞增
+    order = np.argsort(-strikes if side == 'put' else strikes)
+    strikes, asks, bids = strikes[order], asks[order], bids[order]
+    cheapest_better = np.minimum.accumulate(asks)
+    keep = np.ones(len(strikes), dtype=bool)
+    keep[1:] = asks[1:] < cheapest_better[:-1]
+    return strikes[keep], asks[keep], bids[keep]
+
+
+def enumerate_candidates(chain: list, index: float) -> dict:
+    """
+    列舉候選組合，回傳欄式 legs (候選數 × LEGS) 與策略類型
+    - 保護性賣權：買進任一賣權
+    - 熊市價差：買進高履約價賣權 + 賣出低履約價賣權 (賣出腳權利金須較低)
+    - 領口：買進賣權 + 賣出較高履約價的買權
+    - 掩護性買權：賣出任一價外買權
+    """
+    put_k, put_ask, put_bid = _quotes(chain, 'put', index * PUT_MONEYNESS[0], index * PUT_MONEYNESS[1])
+    call_k, call_ask, call_bid = _quotes(chain, 'call', index * CALL_MONEYNESS[0], index * CALL_MONEYNESS[1])
+
+    kinds, strikes, premiums, signs, types = [], [], [], [], []
+
+    def add(kind, leg_kinds, leg_strikes, leg_premiums, leg_signs):
+        n = len(leg_strikes[0])
+        if not n:
+            return
+        pad = LEGS - len(leg_kinds)
+        kinds.append(np.column_stack([np.full(n, k) for k in leg_kinds] + [np.full(n, payoff.KIND_PUT)] * pad))
+        strikes.append(np.column_stack(list(leg_strikes) + [np.zeros(n)] * pad))
+        premiums.append(np.column_stack(list(leg_premiums) + [np.zeros(n)] * pad))
+        signs.append(np.column_stack([np.full(n, s) for s in leg_signs] + [np.zeros(n)] * pad))
+        types.extend([kind] * n)
+
+    add('protective_put', [payoff.KIND_PUT], [put_k], [put_ask], [1.0])
+    add('covered_call', [payoff.KIND_CALL], [call_k], [call_bid], [-1.0])
+
+    # 熊市價差：i 為買進腳 (較高履約價)，j 為賣出腳
+    hi, lo = np.meshgrid(np.arange(len(put_k)), np.arange(len(put_k)), indexing='ij')
+    mask = (put_k[lo] < put_k[hi]) & (put_bid[lo] < put_ask[hi])
+    hi, lo = hi[mask], lo[mask]
+    add('bear_put_spread', [payoff.KIND_PUT, payoff.KIND_PUT],
+        [put_k[hi], put_k[lo]], [put_ask[hi], put_bid[lo]], [1.0, -1.0])
+
+    p, c = np.meshgrid(np.arange(len(put_k)), np.arange(len(call_k)), indexing='ij')
+    mask = put_k[p] < call_k[c]
+    p, c = p[mask], c[mask]
+    add('collar', [payoff.KIND_PUT, payoff.KIND_CALL],
+        [put_k[p], call_k[c]], [put_ask[p], call_bid[c]], [1.0, -1.0])
+
+    if not types:
+        return {'type': [], 'kind': np.zeros((0, LEGS), dtype=np.int8), 'strike': np.zeros((0, LEGS)),
+                'premium': np.zeros((0, LEGS)), 'sign': np.zeros((0, LEGS))}
+    return {
+        'type': types,
+        'kind': np.vstack(kinds).astype(np.int8),
+        'strike': np.vstack(strikes),
+        'premium': np.vstack(premiums),
+        'sign': np.vstack(signs),
+    }
+
+
+def _leg_arrays(candidates: dict, lots: float) -> dict:
+    """轉為 payoff.position_payoffs 使用的欄式格式 (候選 × 腳 攤平)，補齊用的空腳口數為 0"""
+    sign = candidates['sign'].ravel()
+    n = sign.size
+    return {
+        'strike': candidates['strike'].ravel(),
+        'lots': np.where(sign != 0, float(lots), 0.0),
+        'premium': candidates['premium'].ravel(),
+        'multiplier': np.full(n, float(payoff.OPTION_MULTIPLIER)),
+        'kind': candidates['kind'].ravel(),
+        'sign': np.where(sign != 0, sign, 1.0),
+        'closed': np.zeros(n, dtype=bool),
+        'close_price': np.zeros(n),
+    }
+
+
+def hedge_payoffs(prices: np.ndarray, candidates: dict, lots: float, chunk: int = 4096) -> np.ndarray:
+    """所有候選的選擇權損益 (候選數 × 價格數)，分批計算以限制暫存陣列大小"""
+    arrays = _leg_arrays(candidates, lots)
+    total = len(candidates['type'])
+    out = np.empty((total, len(prices)))
+    for start in range(0, total, chunk):
+        stop = min(start + chunk, total)
+        part = {k: v[start * LEGS:stop * LEGS] for k, v in arrays.items()}
+        legs = payoff.position_payoffs(prices, part)                   # 價格數 × (候選 × 腳)
+        out[start:stop] = legs.reshape(len(prices), stop - start, LEGS).sum(axis=2).T
+    return out
+
+
+def pareto_front(objectives: np.ndarray) -> np.ndarray:
+    """
+    非支配解的索引 (所有目標皆為愈大愈好)
+    依序取出目前仍存活的候選，一次剔除所有被它支配 (或完全相同) 的候選，
+    複雜度為 O(候選數 × 前緣大小)，而非兩兩比較的 O(候選數²)
+    """
+    # 先依目標總和排序，較好的候選先出場可以更早剔除大量被支配者
+    order = np.argsort(-objectives.sum(axis=1), kind='stable')
+    remaining = order
+    points = objectives[order]
+    i = 0
+    while i < len(points):
+        keep = (points > points[i]).any(axis=1)
+        keep[i] = True
+        remaining, points = remaining[keep], points[keep]
+        i = int(keep[:i].sum()) + 1
+    return np.sort(remaining)
+
+
+def search(chain: list, index: float, etf_lots: float, etf_cost: float, etf_current: float,
+           hedge_ratio: float, price_range: float = None, step: float = 50, limit: int = 20) -> dict:
+    """
+    搜尋 Pareto 最適避險組合
+    目標：成本愈低、最大損失愈小、跌 10% / 20% 時保護愈多、漲 10% 時獲利愈多
+    """
+    # 與前端 recommendStrategies 的 Math.round 相同 (0.5 進位、不設下限)；0 口時沒有可評估的避險組合
+    lots = math.floor(etf_lots * hedge_ratio + 0.5)
+    if lots <= 0:
+        return {'lots': lots, 'evaluated': 0, 'pareto': 0, 'strategies': []}
+    candidates = enumerate_candidates(chain, index)
+    total = len(candidates['type'])
+    if not total:
+        return {'lots': lots, 'evaluated': 0, 'pareto': 0, 'strategies': []}
+
+    price_range = price_range or index * 0.25
+    prices = payoff.price_grid(index, price_range, step)
+    etf = payoff.etf_pnl(prices, index, etf_lots, etf_cost, etf_current)
+    hedge = hedge_payoffs(prices, candidates, lots)
+    combined = hedge + etf[None, :]
+
+    moves = np.array(PROTECTION_MOVES + (UPSIDE_MOVE,))
+    at_moves = hedge_payoffs(index * (1 + moves), candidates, lots)    # 候選數 × 情境數
+    protection = at_moves[:, :len(PROTECTION_MOVES)]
+    upside = at_moves[:, -1]
+    cost = (candidates['sign'] * candidates['premium']).sum(axis=1) * lots * payoff.OPTION_MULTIPLIER
+    max_loss = combined.min(axis=1)
+
+    objectives = np.column_stack([-cost, max_loss, protection, upside])
+    front = pareto_front(objectives)
+    pareto_size = len(front)
+    # 依最大損失由小到大、成本由低到高排序
+    front = front[np.lexsort((cost[front], -max_loss[front]))][:limit]
+    breakevens = payoff.find_breakevens(prices, combined[front])
+
+    strategies = []
+    for rank, i in enumerate(front):
+        positions = [
+            {
+                'product': '台指',
+                'type': 'Call' if candidates['kind'][i, leg] == payoff.KIND_CALL else 'Put',
+                'direction': '買進' if candidates['sign'][i, leg] > 0 else '賣出',
+                'strike': int(candidates['strike'][i, leg]),
+                'lots': lots,
+                'premium': float(candidates['premium'][i, leg])
+            }
+            for leg in range(LEGS) if candidates['sign'][i, leg] != 0
+        ]
+        strategies.append({
+            'name': STRATEGY_NAMES[candidates['type'][i]],
+            'type': candidates['type'][i],
+            'positions': positions,
+            'cost': float(cost[i]),
+            'maxLoss': float(max_loss[i]),
+            'breakeven': breakevens[rank],
+            'protection': {f"{int(m * 100)}%": float(v) for m, v in zip(PROTECTION_MOVES, protection[i])},
+            'upside': {f"+{int(UPSIDE_MOVE * 100)}%": float(upside[i])},
+        })
+
+    return {
+        'lots': lots,
+        'evaluated': total,
+        'pareto': pareto_size,
+        'range': [float(prices[0]), float(prices[-1])],
+        'strategies': strategies
+    }
@@ -0,0 +1,180 @@
+"""
+期交所每日行情歷史封存
+每份解析後的 ChainIndex 依交易日存成一個目錄，每個欄位一個 .npy 檔 (欄式儲存)：
+
+    <root>/2026/10/20261016/
+        meta.json      到期代碼表、來源、筆數
+        expiry.npy     uint16 (到期代碼表位置)
+        strike.npy     int32
+        is_call.npy    int8
+        price.npy / bid.npy / ask.npy / settle.npy   float32
+
+查詢時以 np.load(mmap_mode='r') 記憶體映射，多個月的歷史可直接以布林遮罩篩選，不需重新解析 CSV；
+未使用 npz 壓縮是因為壓縮檔無法記憶體映射，改以緊湊的 dtype 控制檔案大小
+"""
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+
+from taifex_parser import ChainIndex
+
+logger = logging.getLogger(__name__)
+
+COLUMN_DTYPES = {
+    'expiry': np.uint16,
+    'strike': np.int32,
+    'is_call': np.int8,
+    'price': np.float32,
+    'bid': np.float32,
+    'ask': np.float32,
+    'settle': np.float32,
+}
+
+
+class ArchivedDay:
+    """單一交易日的封存資料 (各欄位為唯讀的記憶體映射陣列)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        self.date = meta['date']
+        self.source = meta.get('source', 'taifex')
+        self.expiries = meta['expiries']
+        self.columns = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r')
+            for name in COLUMN_DTYPES
+        }
+
+    def __len__(self):
+        return len(self.columns['strike'])
+
+    def mask(self, expiry: str = None, strike: int = None, call_put: str = None) -> np.ndarray:
+        """篩選條件的布林遮罩 (只讀取用到的欄位頁面)"""
+        keep = np.ones(len(self), dtype=bool)
+        if expiry is not None:
+            if expiry not in self.expiries:
+                return np.zeros(len(self), dtype=bool)
+            keep &= self.columns['expiry'] == self.expiries.index(expiry)
+        if strike is not None:
+            keep &= self.columns['strike'] == strike
+        if call_put is not None:
+            keep &= self.columns['is_call'] == (1 if call_put == 'C' else 0)
+        return keep
+
+    def to_chain_index(self) -> ChainIndex:
+        """還原為 ChainIndex (例如回放歷史行情)"""
+        payload = {name: np.asarray(col).tolist() for name, col in self.columns.items()}
+        payload.update(source=self.source, trade_date=self.date, expiries=self.expiries)
+        return ChainIndex.from_dict(payload)
+
+
+class TaifexArchive:
+    """依交易日分割的欄式封存"""
+
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _day_path(self, date: str) -> str:
+        return os.path.join(self.root, date[:4], date[4:6], date)
+
+    def store(self, index: ChainIndex, date: str = None) -> str:
+        """
+        寫入一份行情快照；同一交易日再次寫入時整份取代
+        先寫到暫存目錄再改名，查詢端不會讀到寫到一半的檔案
+        """
+        date = date or index.trade_date
+        if not date:
+            raise ValueError("行情缺少交易日期，無法封存")
+        path = self._day_path(date)
+        parent = os.path.dirname(path)
+        os.makedirs(parent, exist_ok=True)
+
+        staging = tempfile.mkdtemp(prefix=f".{date}-", dir=parent)
+        try:
+            for name, dtype in COLUMN_DTYPES.items():
+                np.save(os.path.join(staging, f"{name}.npy"), np.asarray(getattr(index, name), dtype=dtype))
+            with open(os.path.join(staging, 'meta.json'), 'w', encoding='utf-8') as f:
+                json.dump({'date': date, 'source': index.source, 'expiries': index.expiries, 'rows': len(index)},
+                          f, ensure_ascii=False)
+            with self._lock:
+                if os.path.isdir(path):
+                    retired = f"{staging}.old"
+                    os.rename(path, retired)
+                    os.rename(staging, path)
+                    shutil.rmtree(retired, ignore_errors=True)
+                else:
+                    os.rename(staging, path)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        logger.info(f"🗄️ 已封存期交所行情 {date}，共 {len(index)} 筆")
+        return path
+
+    def dates(self, start: str = None, end: str = None) -> list:
+        """已封存的交易日 (YYYYMMDD，遞增)，可指定起訖 (含)"""
+        found = []
+        for year in sorted(os.listdir(self.root)):
+            if not year.isdigit() or (start and year < start[:4]) or (end and year > end[:4]):
+                continue
+            year_dir = os.path.join(self.root, year)
+            if not os.path.isdir(year_dir):
+                continue
+            for month in sorted(os.listdir(year_dir)):
+                month_dir = os.path.join(year_dir, month)
+                if not os.path.isdir(month_dir):
+                    continue
+                for day in sorted(os.listdir(month_dir)):
+                    if len(day) != 8 or not day.isdigit():
+                        continue
+                    if (start and day < start) or (end and day > end):
+                        continue
+                    if os.path.exists(os.path.join(month_dir, day, 'meta.json')):
+                        found.append(day)
+        return found
+
+    def load(self, date: str) -> ArchivedDay:
+        path = self._day_path(date)
+        if not os.path.exists(os.path.join(path, 'meta.json')):
+            return None
+        return ArchivedDay(path)
+
+    def query(self, start: str = None, end: str = None, expiry: str = None, strike: int = None,
+              call_put: str = None) -> dict:
+        """
+        跨交易日篩選，回傳欄式結果 {date, expiry, strike, is_call, price, bid, ask, settle}
+        date 為 int32 YYYYMMDD，expiry 為到期代碼字串清單
+        """
+        parts = {name: [] for name in ('date', 'expiry') + tuple(n for n in COLUMN_DTYPES if n != 'expiry')}
+        for date in self.dates(start, end):
+            day = self.load(date)
+            keep = day.mask(expiry, strike, call_put)
+            rows = np.flatnonzero(keep)
+            if not rows.size:
+                continue
+            parts['date'].append(np.full(rows.size, int(date), dtype=np.int32))
+            parts['expiry'].extend(day.expiries[e] for e in day.columns['expiry'][rows])
+            for name in COLUMN_DTYPES:
+                if name != 'expiry':
+                    parts[name].append(np.asarray(day.columns[name][rows]))
+
+        result = {'expiry': parts.pop('expiry')}
+        for name, chunks in parts.items():
+            dtype = np.int32 if name == 'date' else COLUMN_DTYPES[name]
+            result[name] = np.concatenate(chunks) if chunks else np.zeros(0, dtype=dtype)
+        return result
+
+    def settlement(self, date: str, expiry: str, strike: int, call_put: str):
+        """單一合約在某交易日的結算價；查無資料回傳 None"""
+        day = self.load(date)
+        if day is None:
+            return None
+        rows = np.flatnonzero(day.mask(expiry, strike, call_put))
+        return float(day.columns['settle'][rows[-1]]) if rows.size else None
@@ -0,0 +1,300 @@
+"""
+期交所 DailyMarketReportOpt 解析器
+欄位位置在讀到標頭時只解析一次，非 TXO 的資料列在做任何欄位轉換前就略過，
+單次走訪即建立涵蓋所有到期序列 (月選 / 週三週選 / 週五週選) 的 ChainIndex
+"""
+import csv
+from array import array
+import io
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 標準欄位 -> 可能的欄位名稱 (中文 CSV / 英文 CSV / OpenAPI JSON)
+FIELD_ALIASES = {
+    'date': ('交易日期', 'Date', 'TradeDate'),
+    'contract': ('契約', 'Contract', 'ContractName'),
+    'month': ('到期月份(週別)', '到期月份', 'ContractMonth(Week)', 'ContractMonth', 'ContractMonthWeek', 'Contract Month'),
+    'strike': ('履約價', 'StrikePrice', 'Strike'),
+    'callput': ('買賣權', 'CallPut', 'Call/Put', 'Type', 'BuySell'),
+    'close': ('最後成交價', '收盤價', 'Close', 'ClosingPrice', 'Last'),
+    'settle': ('結算價', 'SettlementPrice', 'Settlement', 'Settle'),
+    'bid': ('買價', '最後最佳買價', 'BestBid', 'Bid'),
+    'ask': ('賣價', '最後最佳賣價', 'BestAsk', 'Ask'),
+}
+
+# 偵測 CSV 標頭的關鍵字（中文或英文）
+CSV_INDICATORS = ('履約價', '到期', 'Contract', 'StrikePrice', '買賣權', 'CallPut')
+
+CALL_VALUES = frozenset(('c', 'call', '買權', 'buy'))
+
+
+def resolve_columns(headers, by_index: bool = False) -> dict:
+    """
+    將標頭對應到標準欄位，回傳 {標準欄位: 位置 (by_index，CSV 用) 或鍵名 (JSON 用)}
+    先比對完全相同的名稱，再比對不分大小寫的名稱
+    """
+    stripped = [str(h).strip() if h is not None else '' for h in headers]
+    refs = range(len(headers)) if by_index else headers
+    exact = {}
+    lower = {}
+    for h, name in zip(refs, stripped):
+        exact.setdefault(name, h)
+        lower.setdefault(name.lower(), h)
+
+    columns = {}
+    for field, aliases in FIELD_ALIASES.items():
+        for alias in aliases:
+            if alias in exact:
+                columns[field] = exact[alias]
+                break
+        else:
+            for alias in aliases:
+                if alias.lower() in lower:
+                    columns[field] = lower[alias.lower()]
+                    break
+    return columns
+
+
+def to_number(value) -> float:
+    """將報價欄位轉為數字，空值或 '-' 視為 0"""
+    if value is None:
+        return 0.0
+    if isinstance(value, (int, float)):
+        return float(value)
+    value = value.strip()
+    if not value or value == '-':
+        return 0.0
+    try:
+        return float(value)
+    except ValueError:
+        try:
+            return float(value.replace(',', ''))
+        except ValueError:
+            return 0.0
+
+
+def pick_price(close: float, bid: float, ask: float, settle: float) -> float:
+    """價格優先順序: 最新成交 > (買+賣)/2 > 買價 > 賣價 > 結算價"""
+    if close > 0:
+        return close
+    if bid > 0 and ask > 0:
+        return (bid + ask) / 2
+    if bid > 0:
+        return bid
+    if ask > 0:
+        return ask
+    return settle
+
+
+def _cell(row, col):
+    """取出 CSV 列 (以位置) 或 JSON 物件 (以鍵名) 的欄位值"""
+    if col is None:
+        return None
+    try:
+        return row[col]
+    except (IndexError, KeyError):
+        return None
+
+
+def iter_txo_records(rows, columns):
+    """
+    走訪資料列，只對 TXO 資料列取值
+    rows 為 list (CSV 列) 或 dict (JSON 物件)，columns 為 resolve_columns() 的結果
+    產出 (contract_month, strike, is_call, close, bid, ask, settle, trade_date)
+    """
+    c_contract = columns.get('contract')
+    c_month = columns.get('month')
+    c_strike = columns.get('strike')
+    c_callput = columns.get('callput')
+    c_close = columns.get('close')
+    c_settle = columns.get('settle')
+    c_bid = columns.get('bid')
+    c_ask = columns.get('ask')
+    c_date = columns.get('date')
+    if c_contract is None or c_strike is None or c_callput is None:
+        return
+
+    for row in rows:
+        contract = _cell(row, c_contract)
+        if not contract or not str(contract).strip().upper().startswith('TXO'):
+            continue
+
+        strike = to_number(_cell(row, c_strike))
+        callput = _cell(row, c_callput)
+        if not strike or not callput:
+            continue
+        callput = str(callput).strip()
+        if not callput:
+            continue
+
+        lowered = callput.lower()
+        is_call = lowered in CALL_VALUES or lowered.startswith('c')
+        month = _cell(row, c_month)
+        yield (
+            str(month).replace(' ', '') if month is not None else '',
+            int(strike),
+            is_call,
+            to_number(_cell(row, c_close)),
+            to_number(_cell(row, c_bid)),
+            to_number(_cell(row, c_ask)),
+            to_number(_cell(row, c_settle)),
+            _cell(row, c_date),
+        )
+
+
+def normalize_date(value) -> str:
+    """交易日期轉為 YYYYMMDD (接受 2026/10/16、2026-10-16、20261016)；無法辨識回傳 None"""
+    digits = ''.join(ch for ch in str(value or '') if ch.isdigit())
+    return digits if len(digits) == 8 else None
+
+
+def load_rows(text: str):
+    """
+    判斷回應格式並回傳 (rows, columns)
+    CSV 以 csv.reader 逐列讀取 (list)，JSON 回傳物件清單 (dict)；無法解析時回傳 (None, None)
+    """
+    sample_head = text.strip()[:200]
+    if any(ind in sample_head for ind in CSV_INDICATORS) and not sample_head.startswith(('[', '{')):
+        lines = io.StringIO(text)
+        try:
+            headers = next(csv.reader([next(lines)]))
+        except StopIteration:
+            return None, None
+        # 原始文字中不含 TXO 的資料列連 CSV 切欄都不做
+        reader = csv.reader(line for line in lines if 'TXO' in line)
+        return reader, resolve_columns(headers, by_index=True)
+
+    try:
+        data = json.loads(text)
+    except ValueError as e:
+        logger.error(f"❌ 解析 Taifex JSON 失敗: {e} / response text snippet: {text[:2000]}")
+        return None, None
+
+    # 如果回傳是一個物件（dict），嘗試取出內層 list
+    if isinstance(data, dict):
+        for candidate in ('data', 'Data', 'result', 'items'):
+            if candidate in data and isinstance(data[candidate], list):
+                data = data[candidate]
+                break
+
+    if not isinstance(data, list):
+        logger.error(f"❌ Taifex 回傳格式非清單，keys={list(data.keys()) if isinstance(data, dict) else type(data)}")
+        return None, None
+    if not data:
+        return data, {}
+    return data, resolve_columns(list(data[0].keys()))
+
+
+class ChainIndex:
+    """
+    整份行情的欄式 (columnar) 索引
+    每個欄位以 array 緊密儲存，(到期代碼, 履約價, C/P) 對應到列號，任一合約查詢皆為 O(1)
+    到期代碼沿用期交所格式：月選 YYYYMM、週三週選 YYYYMMW1、週五週選 YYYYMMF1
+    """
+
+    COLUMNS = ('strike', 'is_call', 'price', 'bid', 'ask', 'settle')
+
+    def __init__(self, source: str = 'taifex', trade_date: str = None):
+        self.source = source
+        self.trade_date = trade_date  # 行情交易日 YYYYMMDD
+        self.expiries = []          # 到期代碼表，expiry 欄位存其位置
+        self._expiry_pos = {}
+        self.expiry = array('H')
+        self.strike = array('i')
+        self.is_call = array('b')
+        self.price = array('d')
+        self.bid = array('d')
+        self.ask = array('d')
+        self.settle = array('d')
+        self._rows = {}
+
+    def add(self, expiry: str, strike: int, is_call: bool, price: float, bid: float, ask: float, settle: float = 0.0):
+        """新增或覆寫 (同一合約後出現者為準，例如盤後時段覆寫一般時段)"""
+        key = (expiry, strike, 'C' if is_call else 'P')
+        row = self._rows.get(key)
+        if row is not None:
+            self.price[row] = price
+            self.bid[row] = bid
+            self.ask[row] = ask
+            self.settle[row] = settle
+            return
+
+        pos = self._expiry_pos.get(expiry)
+        if pos is None:
+            pos = self._expiry_pos[expiry] = len(self.expiries)
+            self.expiries.append(expiry)
+        self._rows[key] = len(self.strike)
+        self.expiry.append(pos)
+        self.strike.append(strike)
+        self.is_call.append(1 if is_call else 0)
+        self.price.append(price)
+        self.bid.append(bid)
+        self.ask.append(ask)
+        self.settle.append(settle)
+
+    def get(self, expiry: str, strike: int, call_put: str) -> dict:
+        """查詢單一合約，call_put 為 'C' 或 'P'；查無資料回傳 None"""
+        row = self._rows.get((expiry, strike, call_put))
+        if row is None:
+            return None
+        return self.item(row)
+
+    def item(self, row: int) -> dict:
+        is_call = bool(self.is_call[row])
+        return {
+            'expiry': self.expiries[self.expiry[row]],
+            'strike': self.strike[row],
+            'type': 'Call' if is_call else 'Put',
+            'price': self.price[row],
+            'bid': self.bid[row],
+            'ask': self.ask[row],
+            'settle': self.settle[row],
+            'source': self.source
+        }
+
+    def __len__(self):
+        return len(self.strike)
+
+    def to_dict(self) -> dict:
+        """轉為可 JSON 序列化的欄式格式 (跨 worker 共用快取用)"""
+        payload = {'source': self.source, 'trade_date': self.trade_date,
+                   'expiries': self.expiries, 'expiry': self.expiry.tolist()}
+        for name in self.COLUMNS:
+            payload[name] = getattr(self, name).tolist()
+        return payload
+
+    @classmethod
+    def from_dict(cls, payload: dict) -> 'ChainIndex':
+        index = cls(payload.get('source', 'taifex'), payload.get('trade_date'))
+        index.expiries = list(payload['expiries'])
+        index._expiry_pos = {e: i for i, e in enumerate(index.expiries)}
+        index.expiry = array('H', payload['expiry'])
+        for name in cls.COLUMNS:
+            setattr(index, name, array(getattr(index, name).typecode, payload[name]))
+        index._rows = {
+            (index.expiries[e], k, 'C' if c else 'P'): row
+            for row, (e, k, c) in enumerate(zip(index.expiry, index.strike, index.is_call))
+        }
+        return index
+
+
+def parse_daily_report(text: str) -> ChainIndex:
+    """
+    解析每日行情，建立涵蓋所有 TXO 到期序列的 ChainIndex
+    無法解析時回傳 None
+    """
+    rows, columns = load_rows(text)
+    if rows is None:
+        return None
+
+    index = ChainIndex()
+    for month, strike, is_call, close, bid, ask, settle, trade_date in iter_txo_records(rows, columns):
+        if index.trade_date is None:
+            index.trade_date = normalize_date(trade_date)
+        index.add(month, strike, is_call, pick_price(close, bid, ask, settle), bid, ask, settle)
+
+    if not len(index):
+        logger.warning(f"⚠️ 未找到 TXO 資料，欄位對應: {columns}")
+    return index
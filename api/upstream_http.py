@@ -0,0 +1,145 @@
+"""
+上游 HTTP 用戶端
+所有上游請求 (期交所 OpenAPI、Yahoo 頁面) 共用 keep-alive 連線池，不再每次請求重新做 TCP + TLS 交握；
+失敗後依主機記錄帶隨機抖動的指數退避期限，期限內的請求直接失敗返回 (由背景排程稍後重試)，
+不會在請求執行緒上 sleep；可選擇以 ETag / Last-Modified 做條件式請求，內容未變時只收到 304
+"""
+import logging
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+
+class UpstreamBackoff(requests.exceptions.RequestException):
+    """主機仍在退避期間，未發出請求"""
+
+
+class UpstreamClient:
+    def __init__(self, pool_size: int = 10, timeout: float = 10.0, backoff_base: float = 1.0,
+                 backoff_max: float = 300.0, user_agent: str = None):
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.session = requests.Session()
+        # 連線錯誤立即重試一次 (連線池中的 keep-alive 連線可能已被對方關閉)，不做 urllib3 內建的 sleep 退避
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                              max_retries=Retry(total=1, connect=1, read=0, status=0, backoff_factor=0))
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        if user_agent:
+            self.session.headers['User-Agent'] = user_agent
+        self._lock = threading.Lock()
+        self._validators = {}   # url -> {'ETag': ..., 'Last-Modified': ...}
+        self._backoff = {}      # host -> (連續失敗次數, 可再請求的時間)
+
+    # ---------- 退避 ----------
+
+    def retry_after(self, url: str) -> float:
+        """距離該主機可再請求的秒數 (0 表示可立即請求)"""
+        entry = self._backoff.get(urlsplit(url).netloc)
+        return max(0.0, entry[1] - time.time()) if entry else 0.0
+
+    def _record_failure(self, host: str) -> float:
+        with self._lock:
+            failures = self._backoff.get(host, (0, 0))[0] + 1
+            # full jitter：在 [0, min(max, base·2^n)] 之間隨機，避免多個 worker 同時重試
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (failures - 1)))
+            self._backoff[host] = (failures, time.time() + delay)
+            return delay
+
+    def _record_success(self, host: str):
+        if host in self._backoff:
+            with self._lock:
+                self._backoff.pop(host, None)
+
+    # ---------- 請求 ----------
+
+    def get(self, url: str, headers: dict = None, timeout: float = None, revalidate: bool = False,
+            honor_backoff: bool = True) -> requests.Response:
+        """
+        GET 請求
+        200 回應的 ETag / Last-Modified 一律記錄；revalidate=True 時帶上這些驗證資訊，內容未變時回傳 status_code 304 的回應
+        主機在退避期間時拋出 UpstreamBackoff；連線錯誤與 5xx 會延長退避期限
+        """
+        host = urlsplit(url).netloc
+        if honor_backoff:
+            wait = self.retry_after(url)
+            if wait > 0:
+                raise UpstreamBackoff(f"{host} 退避中，{wait:.1f} 秒後再試")
+
+        headers = dict(headers or {})
+        if revalidate:
+            validators = self._validators.get(url) or {}
+            if validators.get('ETag'):
+                headers['If-None-Match'] = validators['ETag']
+            if validators.get('Last-Modified'):
+                headers['If-Modified-Since'] = validators['Last-Modified']
+
+        try:
+            response = self.session.get(url, headers=headers, timeout=timeout or self.timeout)
+        except requests.exceptions.RequestException:
+            delay = self._record_failure(host)
+            logger.warning(f"⚠️ 上游請求失敗 ({host})，{delay:.1f} 秒內不再重試")
+            raise
+
+        if response.status_code >= 500 or response.status_code == 429:
+            delay = self._record_failure(host)
+            logger.warning(f"⚠️ 上游回應 {response.status_code} ({host})，{delay:.1f} 秒內不再重試")
+        else:
+            self._record_success(host)
+
+        # 每次 200 都記錄驗證資訊 (第一次完整下載後，下一次即可做條件式請求)；revalidate 只決定是否送出
+        if response.status_code == 200:
+            validators = {k: response.headers[k] for k in ('ETag', 'Last-Modified') if response.headers.get(k)}
+            with self._lock:
+                if validators:
+                    self._validators[url] = validators
+                else:
+                    self._validators.pop(url, None)
+        return response
+
+    def forget(self, url: str):
+        """清除條件式請求的驗證資訊 (例如本地快照已不可用，需要完整下載)"""
+        with self._lock:
+            self._validators.pop(url, None)
+
+    def status(self) -> dict:
+        now = time.time()
+        return {
+            host: {'failures': failures, 'retry_in': round(max(0.0, until - now), 1)}
+            for host, (failures, until) in list(self._backoff.items())
+        }
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+_default_client = None
+_default_lock = threading.Lock()
+
+
+def get_client() -> UpstreamClient:
+    """共用的上游用戶端 (第一次使用時依環境變數建立，此時 .env 已載入)"""
+    global _default_client
+    if _default_client is None:
+        with _default_lock:
+            if _default_client is None:
+                _default_client = UpstreamClient(
+                    pool_size=int(_env_float('UPSTREAM_POOL_SIZE', 10)),
+                    timeout=_env_float('UPSTREAM_TIMEOUT', 10.0),
+                    backoff_base=_env_float('UPSTREAM_BACKOFF_BASE', 1.0),
+                    backoff_max=_env_float('UPSTREAM_BACKOFF_MAX', 300.0),
+                )
+    return _default_client
@@ -0,0 +1,131 @@
+"""
+隱含波動率曲面
+將各到期序列的選擇權鏈報價一次反推為 (到期序列 × 履約價) 的 IV 曲面，
+並依資料來源的快照版本快取，報價未變動時直接回傳上次的結果
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+
+import pricing
+from singleflight import SingleFlight
+
+
+def quote_price(quote: dict) -> float:
+    """報價取用順序: 買賣價中價 > 成交價；無報價回傳 NaN"""
+    if not quote:
+        return np.nan
+    bid, ask = quote.get('bid') or 0, quote.get('ask') or 0
+    if bid > 0 and ask > 0:
+        return (bid + ask) / 2
+    price = quote.get('price') or 0
+    return price if price > 0 else np.nan
+
+
+def parity_spot(strikes: np.ndarray, calls: np.ndarray, puts: np.ndarray, T: np.ndarray, r: float) -> np.ndarray:
+    """
+    以買賣權平價 (C - P = S - K·e^{-rT}) 反推各到期序列的標的價格
+    取 |C - P| 最小 (最接近價平) 的履約價；整列無成對報價時回傳 NaN
+    """
+    diff = calls - puts
+    gap = np.where(np.isnan(diff), np.inf, np.abs(diff))
+    col = gap.argmin(axis=1)
+    rows = np.arange(len(col))
+    spot = diff[rows, col] + strikes[col] * np.exp(-r * T)
+    return np.where(np.isfinite(gap[rows, col]), spot, np.nan)
+
+
+def build_surface(strikes: list, expiries: list, chains: list, r: float = 0.0,
+                  spot: float = None, now: datetime = None) -> dict:
+    """
+    chains[e] 為第 e 個到期序列的 {strike: {"call": quote, "put": quote}}
+    spot 未提供時以買賣權平價逐到期序列反推；曲面 iv 取價外合約 (K < S 用賣權，K >= S 用買權)
+    """
+    K = np.asarray(strikes, dtype=float)
+    T = pricing.years_to_expiry(expiries, now)
+    calls = np.array([[quote_price((chain.get(k) or {}).get('call')) for k in strikes] for chain in chains])
+    puts = np.array([[quote_price((chain.get(k) or {}).get('put')) for k in strikes] for chain in chains])
+    calls = calls.reshape(len(expiries), len(strikes))
+    puts = puts.reshape(len(expiries), len(strikes))
+
+    if spot:
+        spots = np.full(len(expiries), float(spot))
+    else:
+        spots = parity_spot(K, calls, puts, T, r)
+
+    S, TT = spots[:, None], T[:, None]
+    call_iv = pricing.implied_vol(calls, S, K[None, :], TT, r, True)
+    put_iv = pricing.implied_vol(puts, S, K[None, :], TT, r, False)
+    iv = np.where(K[None, :] < S, put_iv, call_iv)
+    iv = np.where(np.isnan(iv), np.where(K[None, :] < S, call_iv, put_iv), iv)
+    return {
+        'expiries': list(expiries),
+        'days': T * pricing.DAYS_PER_YEAR,
+        'strikes': K,
+        'spot': spots,
+        'call_iv': call_iv,
+        'put_iv': put_iv,
+        'iv': iv,
+    }
+
+
+def to_json(surface: dict) -> dict:
+    """陣列轉為 JSON 可用的 list，NaN 轉為 None"""
+    def clean(a, digits):
+        a = np.round(np.asarray(a, dtype=float), digits)
+        return np.where(np.isnan(a), None, a).tolist()
+
+    return {
+        'expiries': surface['expiries'],
+        'days': clean(surface['days'], 3),
+        'strikes': surface['strikes'].astype(int).tolist(),
+        'spot': clean(surface['spot'], 2),
+        'iv': clean(surface['iv'], 6),
+        'call_iv': clean(surface['call_iv'], 6),
+        'put_iv': clean(surface['put_iv'], 6),
+    }
+
+
+class SurfaceCache:
+    """
+    依 (來源, 快照版本, 掛牌到期代碼, 查詢參數) 快取 IV 曲面
+    同一 key 的並行請求只計算一次；只保留最近 max_entries 筆，
+    曲面的剩餘天數隨時間遞減，快照未更新 (例如上游回 304) 時每筆最多保留 ttl 秒
+    """
+
+    def __init__(self, max_entries: int = 32, ttl: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._flight = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, build):
+        """key 為 None (資料來源無快照版本) 時不快取"""
+        if key is None:
+            return build()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                created, value = entry
+                if time.time() - created < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+        return self._flight.do(key, self._build, key, build)
+
+    def _build(self, key, build):
+        value = build()
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
@@ -1,11 +1,29 @@
-import requests
 from bs4 import BeautifulSoup
+import html
 import logging
 import re
 from datetime import datetime
 
+import upstream_http
+
 logger = logging.getLogger(__name__)
 
+# 單次掃描原始 HTML 用的預先編譯樣式 (不建立 DOM)
+# 選擇權連結: <a ... href="/future/WTX2F6;30700C" ...>1,234</a>，連結文字即成交價
+# 屬性值以引號為單位比對 (值內可含 >)，href 可不加引號；註解與 script / style 內容一併比對後略過，
+# 與 BeautifulSoup 只從實際元素中找連結的行為一致
+_ATTRS = r'(?:[^>"\']|"[^"]*"|\'[^\']*\')*?'
+_OPTION_LINK_PATTERN = re.compile(
+    r'<!--.*?-->'
+    r'|<(script|style)\b.*?</\1\s*>'
+    r'|<a\s' + _ATTRS + r'(?<![\w-])href\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>"\']+))' + _ATTRS + r'>(.*?)</a\s*>',
+    re.DOTALL | re.IGNORECASE
+)
+_OPTION_HREF_PATTERN = re.compile(r';(\d+)([CP])')
+_TAG_PATTERN = re.compile(r'<[^>]+>')
+_INDEX_PATTERN = re.compile(r'WTX(?:&|&amp;).*?([\d,]+\.\d{2})', re.DOTALL)
+_TSE_PATTERN = re.compile(r'加權指數.*?([\d,]+\.\d{2})', re.DOTALL)
+
 def fetch_yahoo_futures_page():
     """Fetch the raw HTML content from Yahoo Kimo Futures page."""
     url = "https://tw.stock.yahoo.com/future"
@@ -16,17 +34,76 @@ def fetch_yahoo_futures_page():
     }
     
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        response = upstream_http.get_client().get(url, headers=headers, timeout=10)
         response.raise_for_status()
         return response.text
+    except upstream_http.UpstreamBackoff:
+        # 仍在退避期限內，未發出請求：交由呼叫端區分於實際的抓取失敗
+        raise
     except Exception as e:
         logger.error(f"❌ Failed to fetch Yahoo Futures page: {e}")
         return None
 
+def parse_option_chain_fast(html_content):
+    """
+    單次掃描原始 HTML 解析選擇權鏈 (結果與 parse_option_chain 相同)
+    只以預先編譯的樣式找出 href 含 /future/WTX...;{履約價}{C/P} 的連結，不建立 BeautifulSoup DOM
+    """
+    if not html_content:
+        return {}
+
+    temp_chain = {}
+    for match in _OPTION_LINK_PATTERN.finditer(html_content):
+        href = match.group(2) or match.group(3) or match.group(4)
+        if href is None:
+            continue    # 註解或 script / style 區塊
+        if '&' in href:
+            href = html.unescape(href)
+        if '/future/WTX' not in href:
+            continue
+        option = _OPTION_HREF_PATTERN.search(href)
+        if not option:
+            continue
+
+        text = match.group(5)
+        if '<' in text:
+            text = _TAG_PATTERN.sub('', text)
+        if '&' in text:
+            text = html.unescape(text)
+        try:
+            price = float(text.strip().replace(',', ''))
+        except ValueError:
+            continue
+
+        strike = int(option.group(1))
+        option_type = 'Call' if option.group(2) == 'C' else 'Put'
+        # 同一履約價 + 買賣權只取第一個連結 (與 parse_option_chain 相同)
+        entry = temp_chain.setdefault(strike, {})
+        if option_type not in entry:
+            entry[option_type] = {
+                'strike': strike,
+                'type': option_type,
+                'price': price,
+                'bid': price,
+                'ask': price,
+                'source': 'yahoo'
+            }
+
+    result = []
+    for data in temp_chain.values():
+        if 'Call' in data:
+            result.append(data['Call'])
+        if 'Put' in data:
+            result.append(data['Put'])
+
+    logger.info(f"✅ Yahoo Scraper parsed {len(result)} option contracts")
+    return result
+
 def parse_option_chain(html_content):
     """
     Parse the Option Chain from Yahoo Kimo Futures page HTML.
     Targeting the table with Call/Put columns.
+    (BeautifulSoup 版本，頁面結構無法以樣式解析時的備援)
     """
     if not html_content:
         return {}
@@ -121,31 +198,12 @@ def get_yahoo_index_price(html_content):
     if not html_content:
         return None
         
-    soup = BeautifulSoup(html_content, 'html.parser')
-    
-    # 尋找 "台指期近一" 或類似的關鍵字
-    # 根據之前的 view_content_chunk，連結文字是 "台指期近一"
-    # 連結範例: https://tw.stock.yahoo.com/future/WTX%26
-    
-    target_link = soup.find('a', href=re.compile(r'WTX%26')) # %26 is & encoded
-    if not target_link:
-        target_link = soup.find('a', href=re.compile(r'WTX&'))
-
-    if target_link:
-        # 價格通常在連結後的某個兄弟元素或包含在同一個 row 內
-        # 結構: Link Name ... Price ...
-        # 我們嘗試找該 link 的 parent container (可能是一個 li 或 tr)
-        
-        # 簡易作法：在 HTML text 中搜尋 "台指期近一" 後的數字
-        # 因為 BeautifulSoup 定位相對複雜，且 Yahoo 結構常變
-        pass
-
-    # Regex Fallback for Index Price
+    # 直接以預先編譯的樣式掃描原始 HTML，不建立 BeautifulSoup DOM
     # 尋找 "台指期近一" 相關代號 (WTX&) ... 31,000.00
     # HTML Snippet: ... WTX&amp; ... 31,010.00 ...
     # 由於 "台指期近一" 可能會有編碼問題 (Big5 vs UTF-8)，改抓其代號 "WTX&" 或 "WTX&amp;"
     
-    match = re.search(r'WTX(?:&|&amp;).*?([\d,]+\.\d{2})', html_content, re.DOTALL)
+    match = _INDEX_PATTERN.search(html_content)
     if match:
         try:
             # 優先使用台指期近一 (Futures) 作為 Index Price，以支援夜盤
@@ -156,7 +214,7 @@ def get_yahoo_index_price(html_content):
             pass
 
     # 如果抓不到期貨，嘗試抓加權指數 (Day session fallback)
-    match_tse = re.search(r'加權指數.*?([\d,]+\.\d{2})', html_content, re.DOTALL)
+    match_tse = _TSE_PATTERN.search(html_content)
     if match_tse:
         try:
             price_str = match_tse.group(1).replace(',', '')
@@ -167,14 +225,19 @@ def get_yahoo_index_price(html_content):
             
     return None
 
-def scrape_yahoo_option_chain():
-    """Main entry point to scrape Yahoo data."""
-    html = fetch_yahoo_futures_page()
-    if not html:
+def scrape_yahoo_option_chain(fast: bool = True):
+    """
+    Main entry point to scrape Yahoo data.
+    fast=True 時以單次掃描解析；解析不到任何合約時改用 BeautifulSoup 備援 (頁面結構變動)
+    """
+    html_content = fetch_yahoo_futures_page()
+    if not html_content:
         return None, None
-        
-    index_price = get_yahoo_index_price(html)
-    chain_data = parse_option_chain(html)
+
+    index_price = get_yahoo_index_price(html_content)
+    chain_data = parse_option_chain_fast(html_content) if fast else []
+    if not chain_data:
+        chain_data = parse_option_chain(html_content)
     
     # 將 chain_data 轉為以 key 為 index 的 dict，方便 app.py 使用
     # key format: "{strike}_{C/P}"